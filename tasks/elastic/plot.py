@@ -2,37 +2,32 @@ from glob import glob
 from invoke import task
 from matplotlib.pyplot import subplots
 from os import makedirs
-from os.path import join
-from pandas import read_csv
+from os.path import basename, join
 from tasks.util.elastic import ELASTIC_PLOTS_DIR, ELASTIC_RESULTS_DIR
 from tasks.util.plot import (
     SINGLE_COL_FIGSIZE,
     get_color_for_baseline,
     save_plot,
 )
+from tasks.util.results_store import query_runs, sync_csv_results
+from tasks.util.stats import compare, summarise_by
 
 
 def _read_results():
-    result_dict = {}
-
+    # Import any results not recorded in the results store yet
     for csv in glob(join(ELASTIC_RESULTS_DIR, "openmp_*.csv")):
-        results = read_csv(csv)
-        baseline = csv.split("_")[1]
-
-        groupped_results = results.groupby("NumThreads", as_index=False)
-        if baseline not in result_dict:
-            result_dict[baseline] = {}
+        sync_csv_results(
+            csv,
+            "elastic",
+            basename(csv).split("_")[1],
+            ["ExecTimeSecs"],
+            size_col="NumThreads",
+        )
 
-        for nt in groupped_results.mean()["NumThreads"].to_list():
-            index = groupped_results.mean()["NumThreads"].to_list().index(nt)
-            result_dict[baseline][nt] = {
-                "mean": groupped_results.mean()["ExecTimeSecs"].to_list()[
-                    index
-                ],
-                "sem": groupped_results.sem()["ExecTimeSecs"].to_list()[index],
-            }
-
-    return result_dict
+    return {
+        baseline: summarise_by(runs, "size", "ExecTimeSecs")
+        for baseline, runs in query_runs("elastic").groupby("baseline")
+    }
 
 
 @task(default=True)
@@ -56,6 +51,23 @@ def plot(ctx):
         for x in xs
     ]
 
+    # Only report speed-ups that are not just noise across repeats
+    for x in xs:
+        comparison = compare(
+            results["no-elastic"][x]["samples"],
+            results["elastic"][x]["samples"],
+        )
+        print(
+            "{} threads: elastic - no-elastic = {:.2f}s (95% CI: [{:.2f}, "
+            "{:.2f}], p = {:.3f}){}".format(
+                x,
+                comparison["diff"],
+                *comparison["diff-ci"],
+                comparison["p-value"],
+                "" if comparison["significant"] else " - NOT significant",
+            )
+        )
+
     ax.bar(
         xs,
         ys,
@@ -4,6 +4,7 @@ from invoke import task
 from os import makedirs
 from os.path import join
 from tasks.util.faasm import (
+    get_faasm_exec_hosts_from_json,
     get_faasm_exec_time_from_json,
     post_async_msg_and_get_result_json,
 )
@@ -14,7 +15,9 @@ from tasks.util.elastic import (
     OPENMP_ELASTIC_USER,
     get_elastic_input_data,
 )
+from tasks.util.harness import run_benchmark
 from tasks.util.kernels import get_openmp_kernel_cmdline
+from tasks.util.results_store import init_results, record_run
 
 EXPECTED_NUM_VMS = 1
 TOTAL_NUM_THREADS = [1, 2, 3, 4, 5, 6, 7, 8]
@@ -27,12 +30,25 @@ def _init_csv_file(csv_name):
     with open(result_file, "w") as out_file:
         out_file.write("NumThreads,Run,ExecTimeSecs\n")
 
+    init_results(result_file)
 
-def _write_csv_line(csv_name, num_threads, run, exec_time):
+
+def _write_csv_line(
+    csv_name, baseline, num_threads, run, exec_time, params=None
+):
     result_file = join(ELASTIC_RESULTS_DIR, csv_name)
     with open(result_file, "a") as out_file:
         out_file.write("{},{},{}\n".format(num_threads, run, exec_time))
 
+    record_run(
+        "elastic",
+        baseline,
+        {"ExecTimeSecs": exec_time},
+        size=num_threads,
+        params={"Run": run, **(params or {})},
+        source=result_file,
+    )
+
 
 def has_execution_failed(results_json):
     for result in results_json:
@@ -49,7 +65,15 @@ def has_execution_failed(results_json):
 
 
 @task(default=True)
-def wasm(ctx, num_threads=None, elastic=False, repeats=1):
+def wasm(
+    ctx,
+    num_threads=None,
+    elastic=False,
+    repeats=1,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+):
     """
     Run the OpenMP Kernels
     """
@@ -70,19 +94,13 @@ def wasm(ctx, num_threads=None, elastic=False, repeats=1):
 
     reset_planner(num_vms)
 
-    csv_name = "openmp_{}_granny.csv".format(
-        "elastic" if elastic else "no-elastic"
-    )
+    baseline = "elastic" if elastic else "no-elastic"
+    csv_name = "openmp_{}_granny.csv".format(baseline)
     _init_csv_file(csv_name)
 
     for nthread in num_threads:
-        for r in range(int(repeats)):
-            print(
-                "Running OpenMP elastic experiment with {} threads"
-                " (elastic: {} - repeat: {}/{})".format(
-                    nthread, elastic, r + 1, repeats
-                )
-            )
+
+        def _run():
             user = OPENMP_ELASTIC_USER
             func = OPENMP_ELASTIC_FUNCTION
             cmdline = get_openmp_kernel_cmdline(ELASTIC_KERNEL, nthread)
@@ -108,6 +126,20 @@ def wasm(ctx, num_threads=None, elastic=False, repeats=1):
             actual_time = get_faasm_exec_time_from_json(
                 result_json, check=True
             )
-            _write_csv_line(csv_name, nthread, r, actual_time)
             # TODO: delete me
             print("Actual time: {}".format(actual_time))
+            return actual_time, get_faasm_exec_hosts_from_json(result_json)
+
+        run_benchmark(
+            _run,
+            lambda run_num, actual_time, params: _write_csv_line(
+                csv_name, baseline, nthread, run_num, actual_time, params
+            ),
+            repeats=repeats,
+            max_repeats=max_repeats,
+            num_warmup_runs=warmup_runs,
+            time_budget=time_budget,
+            label="OpenMP elastic experiment with {} threads (elastic: {})".format(
+                nthread, elastic
+            ),
+        )
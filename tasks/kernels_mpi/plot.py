@@ -2,8 +2,7 @@ from glob import glob
 from invoke import task
 from matplotlib.pyplot import subplots
 from os import makedirs
-from os.path import join
-from pandas import read_csv
+from os.path import basename, join
 from tasks.util.env import SYSTEM_NAME
 from tasks.util.kernels import (
     MPI_KERNELS_EXPERIMENT_NPROCS,
@@ -12,29 +11,33 @@ from tasks.util.kernels import (
     MPI_KERNELS_RESULTS_DIR,
 )
 from tasks.util.plot import UBENCH_PLOT_COLORS, SINGLE_COL_FIGSIZE, save_plot
+from tasks.util.results_store import query_runs, sync_csv_results
+from tasks.util.stats import summarise_by
 
 
 def _read_kernels_results():
-    result_dict = {}
-
+    # Import any results not recorded in the results store yet
     for csv in glob(join(MPI_KERNELS_RESULTS_DIR, "kernels_*.csv")):
-        results = read_csv(csv)
-
-        baseline = csv.split("_")[1]
-        kernel = csv.split("_")[-1].split(".")[0]
+        sync_csv_results(
+            csv,
+            "kernels_mpi",
+            basename(csv).split("_")[1],
+            ["ActualTime"],
+            workload=basename(csv).split("_")[-1].split(".")[0],
+            size_col="WorldSize",
+        )
 
-        groupped_results = results.groupby("WorldSize", as_index=False)
+    result_dict = {}
+    runs = query_runs("kernels_mpi")
+    for (baseline, kernel), kernel_runs in runs.groupby(
+        ["baseline", "workload"]
+    ):
         if baseline not in result_dict:
             result_dict[baseline] = {}
-        if kernel not in result_dict[baseline]:
-            result_dict[baseline][kernel] = {}
-
-        for np in groupped_results.mean()["WorldSize"].to_list():
-            index = groupped_results.mean()["WorldSize"].to_list().index(np)
-            result_dict[baseline][kernel][np] = {
-                "mean": groupped_results.mean()["ActualTime"].to_list()[index],
-                "sem": groupped_results.sem()["ActualTime"].to_list()[index],
-            }
+
+        result_dict[baseline][kernel] = summarise_by(
+            kernel_runs, "size", "ActualTime"
+        )
 
     return result_dict
 
@@ -4,6 +4,7 @@ from invoke import task
 from math import ceil, floor, log10
 from os import makedirs
 from os.path import join
+from tasks.util.harness import run_benchmark
 from tasks.util.kernels import (
     KERNELS_NATIVE_DIR,
     MPI_KERNELS_FAASM_FUNCS,
@@ -12,6 +13,7 @@ from tasks.util.kernels import (
     MPI_KERNELS_RESULTS_DIR,
 )
 from tasks.util.faasm import (
+    get_faasm_exec_hosts_from_json,
     get_faasm_exec_time_from_json,
     post_async_msg_and_get_result_json,
 )
@@ -19,6 +21,7 @@ from tasks.util.openmpi import (
     run_kubectl_cmd,
     get_native_mpi_pods,
 )
+from tasks.util.results_store import init_results, record_run
 from time import time
 
 EXPECTED_NUM_VMS = 2
@@ -97,14 +100,28 @@ def _init_csv_file(csv_name):
     with open(result_file, "w") as out_file:
         out_file.write("WorldSize,Run,ActualTime\n")
 
+    init_results(result_file)
 
-def _write_csv_line(csv_name, num_procs, run, exec_time):
+
+def _write_csv_line(
+    csv_name, baseline, kernel, num_procs, run, exec_time, params=None
+):
     result_file = join(MPI_KERNELS_RESULTS_DIR, csv_name)
     with open(result_file, "a") as out_file:
         out_file.write("{},{},{}\n".format(num_procs, run, exec_time))
 
+    record_run(
+        "kernels_mpi",
+        baseline,
+        {"ActualTime": exec_time},
+        workload=kernel,
+        size=num_procs,
+        params={"Run": run, **(params or {})},
+        source=result_file,
+    )
+
 
-def print_exp_status(
+def get_exp_label(
     baseline,
     kernel,
     np,
@@ -112,12 +129,10 @@ def print_exp_status(
     len_kernels,
     ind_np,
     len_nps,
-    run_num,
-    repeats,
 ):
-    print(
-        "Running MPI Kernel ({}) on {} with {} MPI processes"
-        " (kernel: {}/{}, MPI procs: {}/{}, repeat: {}/{})".format(
+    return (
+        "MPI Kernel ({}) on {} with {} MPI processes"
+        " (kernel: {}/{}, MPI procs: {}/{})".format(
             kernel,
             baseline,
             np,
@@ -125,14 +140,20 @@ def print_exp_status(
             len_kernels,
             ind_np + 1,
             len_nps,
-            run_num + 1,
-            repeats,
         )
     )
 
 
 @task
-def wasm(ctx, repeats=1, num_procs=None, kernel=None):
+def wasm(
+    ctx,
+    repeats=1,
+    num_procs=None,
+    kernel=None,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+):
     """
     Run the MPI Kernels (WASM)
     """
@@ -163,32 +184,19 @@ def wasm(ctx, repeats=1, num_procs=None, kernel=None):
         # Flush the cluster fist
         reset_planner(num_vms)
 
-        for run_num in range(repeats):
-            for ind_np, np in enumerate(num_procs):
-                try:
-                    cmdline = get_kernels_cmdline(kernel, np)
-                except RuntimeError as e:
-                    if kernel == "sparse":
-                        print("Skipping sparse kernel for np: {}".format(np))
-                        continue
-                    elif kernel == "transpose":
-                        print(
-                            "Skipping transpose kernel for np: {}".format(np)
-                        )
-                        continue
-                    raise e
-                print_exp_status(
-                    "Granny",
-                    kernel,
-                    np,
-                    ind_kernel,
-                    len(kernels),
-                    ind_np,
-                    len(num_procs),
-                    run_num,
-                    repeats,
-                )
-
+        for ind_np, np in enumerate(num_procs):
+            try:
+                cmdline = get_kernels_cmdline(kernel, np)
+            except RuntimeError as e:
+                if kernel == "sparse":
+                    print("Skipping sparse kernel for np: {}".format(np))
+                    continue
+                elif kernel == "transpose":
+                    print("Skipping transpose kernel for np: {}".format(np))
+                    continue
+                raise e
+
+            def _run():
                 user = MPI_KERNELS_FAASM_USER
                 func = kernel
                 msg = {
@@ -202,11 +210,45 @@ def wasm(ctx, repeats=1, num_procs=None, kernel=None):
                 actual_time = get_faasm_exec_time_from_json(
                     result_json, check=True
                 )
-                _write_csv_line(csv_name, np, run_num, actual_time)
+                return actual_time, get_faasm_exec_hosts_from_json(result_json)
+
+            run_benchmark(
+                _run,
+                lambda run_num, actual_time, params: _write_csv_line(
+                    csv_name,
+                    "granny",
+                    kernel,
+                    np,
+                    run_num,
+                    actual_time,
+                    params,
+                ),
+                repeats=repeats,
+                max_repeats=max_repeats,
+                num_warmup_runs=warmup_runs,
+                time_budget=time_budget,
+                label=get_exp_label(
+                    "Granny",
+                    kernel,
+                    np,
+                    ind_kernel,
+                    len(kernels),
+                    ind_np,
+                    len(num_procs),
+                ),
+            )
 
 
 @task
-def native(ctx, repeats=1, num_procs=None, kernel=None):
+def native(
+    ctx,
+    repeats=1,
+    num_procs=None,
+    kernel=None,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+):
     """
     Run Kernels benchmark with OpenMPI
     """
@@ -233,21 +275,72 @@ def native(ctx, repeats=1, num_procs=None, kernel=None):
         _init_csv_file(csv_name)
         binary = join(KERNELS_NATIVE_DIR, "mpi_{}.o".format(kernel))
 
-        for run_num in range(repeats):
-            for ind_np, np in enumerate(num_procs):
-                try:
-                    cmdline = get_kernels_cmdline(kernel, np)
-                except RuntimeError as e:
-                    if kernel == "sparse":
-                        print("Skipping sparse kernel for np: {}".format(np))
-                        continue
-                    elif kernel == "transpose":
-                        print(
-                            "Skipping transpose kernel for np: {}".format(np)
-                        )
-                        continue
-                    raise e
-                print_exp_status(
+        for ind_np, np in enumerate(num_procs):
+            try:
+                cmdline = get_kernels_cmdline(kernel, np)
+            except RuntimeError as e:
+                if kernel == "sparse":
+                    print("Skipping sparse kernel for np: {}".format(np))
+                    continue
+                elif kernel == "transpose":
+                    print("Skipping transpose kernel for np: {}".format(np))
+                    continue
+                raise e
+
+            # Work out an allocation list to avoid having to copy hostfiles
+            host_list = []
+            num_cpus_per_vm = 8
+            for i in range(int(np / num_cpus_per_vm)):
+                host_list += [vm_ips[i]] * num_cpus_per_vm
+            if len(host_list) != np:
+                host_list += [vm_ips[int(np / num_cpus_per_vm)]] * (
+                    np % num_cpus_per_vm
+                )
+            assert (
+                len(host_list) == np
+            ), "Host list different to num procs! ({} != {})".format(
+                len(host_list), np
+            )
+
+            mpirun_cmd = [
+                "mpirun",
+                "-np {}".format(np),
+                "-host {}".format(",".join(host_list)),
+                binary,
+                cmdline,
+            ]
+            mpirun_cmd = " ".join(mpirun_cmd)
+
+            exec_cmd = [
+                "exec",
+                master_vm,
+                "--",
+                "su mpirun -c '{}'".format(mpirun_cmd),
+            ]
+            exec_cmd = " ".join(exec_cmd)
+
+            def _run():
+                start_ts = time()
+                run_kubectl_cmd("kernels", exec_cmd)
+                return time() - start_ts
+
+            run_benchmark(
+                _run,
+                lambda run_num, actual_time, params: _write_csv_line(
+                    csv_name,
+                    "native",
+                    kernel,
+                    np,
+                    run_num,
+                    actual_time,
+                    params,
+                ),
+                repeats=repeats,
+                max_repeats=max_repeats,
+                num_warmup_runs=warmup_runs,
+                time_budget=time_budget,
+                hosts=host_list,
+                label=get_exp_label(
                     "OpenMPI",
                     kernel,
                     np,
@@ -255,43 +348,5 @@ def native(ctx, repeats=1, num_procs=None, kernel=None):
                     len(kernels),
                     ind_np,
                     len(num_procs),
-                    run_num,
-                    repeats,
-                )
-
-                # Work out an allocation list to avoid having to copy hostfiles
-                host_list = []
-                num_cpus_per_vm = 8
-                for i in range(int(np / num_cpus_per_vm)):
-                    host_list += [vm_ips[i]] * num_cpus_per_vm
-                if len(host_list) != np:
-                    host_list += [vm_ips[int(np / num_cpus_per_vm)]] * (
-                        np % num_cpus_per_vm
-                    )
-                assert (
-                    len(host_list) == np
-                ), "Host list different to num procs! ({} != {})".format(
-                    len(host_list), np
-                )
-
-                mpirun_cmd = [
-                    "mpirun",
-                    "-np {}".format(np),
-                    "-host {}".format(",".join(host_list)),
-                    binary,
-                    cmdline,
-                ]
-                mpirun_cmd = " ".join(mpirun_cmd)
-
-                exec_cmd = [
-                    "exec",
-                    master_vm,
-                    "--",
-                    "su mpirun -c '{}'".format(mpirun_cmd),
-                ]
-                exec_cmd = " ".join(exec_cmd)
-
-                start_ts = time()
-                run_kubectl_cmd("kernels", exec_cmd)
-                actual_time = time() - start_ts
-                _write_csv_line(csv_name, np, run_num, actual_time)
+                ),
+            )
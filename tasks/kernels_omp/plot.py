@@ -2,8 +2,7 @@ from glob import glob
 from invoke import task
 from matplotlib.pyplot import subplots
 from os import makedirs
-from os.path import join
-from pandas import read_csv
+from os.path import basename, join
 from tasks.util.env import SYSTEM_NAME
 from tasks.util.kernels import (
     OPENMP_KERNELS,
@@ -11,31 +10,33 @@ from tasks.util.kernels import (
     OPENMP_KERNELS_RESULTS_DIR,
 )
 from tasks.util.plot import UBENCH_PLOT_COLORS, SINGLE_COL_FIGSIZE, save_plot
+from tasks.util.results_store import query_runs, sync_csv_results
+from tasks.util.stats import summarise_by
 
 
 def _read_results():
-    result_dict = {}
-
+    # Import any results not recorded in the results store yet
     for csv in glob(join(OPENMP_KERNELS_RESULTS_DIR, "openmp_*.csv")):
-        results = read_csv(csv)
-
-        workload = csv.split("_")[1]
-        baseline = csv.split("_")[-1].split(".")[0]
+        sync_csv_results(
+            csv,
+            "kernels_omp",
+            basename(csv).split("_")[-1].split(".")[0],
+            ["ExecTimeSecs"],
+            workload=basename(csv).split("_")[1],
+            size_col="NumThreads",
+        )
 
-        groupped_results = results.groupby("NumThreads", as_index=False)
+    result_dict = {}
+    runs = query_runs("kernels_omp")
+    for (baseline, workload), wload_runs in runs.groupby(
+        ["baseline", "workload"]
+    ):
         if baseline not in result_dict:
             result_dict[baseline] = {}
-        if workload not in result_dict[baseline]:
-            result_dict[baseline][workload] = {}
-
-        for nt in groupped_results.mean()["NumThreads"].to_list():
-            index = groupped_results.mean()["NumThreads"].to_list().index(nt)
-            result_dict[baseline][workload][nt] = {
-                "mean": groupped_results.mean()["ExecTimeSecs"].to_list()[
-                    index
-                ],
-                "sem": groupped_results.sem()["ExecTimeSecs"].to_list()[index],
-            }
+
+        result_dict[baseline][workload] = summarise_by(
+            wload_runs, "size", "ExecTimeSecs"
+        )
 
     return result_dict
 
@@ -4,9 +4,11 @@ from invoke import task
 from os import makedirs
 from os.path import join
 from tasks.util.faasm import (
+    get_faasm_exec_hosts_from_json,
     get_faasm_exec_time_from_json,
     post_async_msg_and_get_result_json,
 )
+from tasks.util.harness import run_benchmark
 from tasks.util.kernels import (
     OPENMP_KERNELS,
     OPENMP_KERNELS_DOCKER_DIR,
@@ -18,6 +20,8 @@ from tasks.util.openmpi import (
     get_native_mpi_pods,
     run_kubectl_cmd,
 )
+from tasks.util.results_store import init_results, record_run
+from tasks.util.sweep import get_sweep_hosts, run_sweep
 from time import time
 
 EXPECTED_NUM_VMS = 1
@@ -31,12 +35,26 @@ def _init_csv_file(csv_name):
     with open(result_file, "w") as out_file:
         out_file.write("NumThreads,Run,ExecTimeSecs\n")
 
+    init_results(result_file)
 
-def _write_csv_line(csv_name, num_threads, run, exec_time):
+
+def _write_csv_line(
+    csv_name, baseline, kernel, num_threads, run, exec_time, params=None
+):
     result_file = join(OPENMP_KERNELS_RESULTS_DIR, csv_name)
     with open(result_file, "a") as out_file:
         out_file.write("{},{},{}\n".format(num_threads, run, exec_time))
 
+    record_run(
+        "kernels_omp",
+        baseline,
+        {"ExecTimeSecs": exec_time},
+        workload=kernel,
+        size=num_threads,
+        params={"Run": run, **(params or {})},
+        source=result_file,
+    )
+
 
 def get_kernel_binary(kernel):
     return join(
@@ -58,20 +76,94 @@ def has_execution_failed(results_json):
     return False
 
 
+def _run_wasm_point(
+    wload, nthread, repeats, max_repeats, time_budget, warmup_runs, host
+):
+    """
+    Run one kernel with a number of threads, in the given host (or wherever
+    the planner schedules it if None)
+    """
+    csv_name = "openmp_{}_granny.csv".format(wload)
+
+    def _run():
+        user = OPENMP_KERNELS_FAASM_USER
+        func = wload
+        cmdline = get_kernel_cmdline(wload, nthread)
+        msg = {
+            "user": user,
+            "function": func,
+            "cmdline": cmdline,
+            "isOmp": True,
+            "ompNumThreads": nthread,
+        }
+        req = {
+            "user": user,
+            "function": func,
+            "singleHostHint": True,
+        }
+
+        result_json = post_async_msg_and_get_result_json(
+            msg,
+            host_list=None if host is None else [host],
+            req_dict=req,
+        )
+        actual_time = get_faasm_exec_time_from_json(result_json, check=True)
+        print(
+            "Kernel: {} - Nthreads: {} - Actual time: {}".format(
+                wload, nthread, actual_time
+            )
+        )
+        return actual_time, get_faasm_exec_hosts_from_json(result_json)
+
+    run_benchmark(
+        _run,
+        lambda run_num, actual_time, params: _write_csv_line(
+            csv_name,
+            "granny",
+            wload,
+            nthread,
+            run_num,
+            actual_time,
+            params,
+        ),
+        repeats=repeats,
+        max_repeats=max_repeats,
+        num_warmup_runs=warmup_runs,
+        time_budget=time_budget,
+        hosts=None if host is None else [host],
+        label="OpenMP Kernel ({}) with {} threads{}".format(
+            wload, nthread, "" if host is None else " in {}".format(host)
+        ),
+    )
+
+
 @task()
-def wasm(ctx, kernel=None, num_threads=None, repeats=1):
+def wasm(
+    ctx,
+    kernel=None,
+    num_threads=None,
+    repeats=1,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+    concurrent=False,
+):
     """
     Run the OpenMP Kernels
+
+    With `--concurrent`, run each (kernel, number of threads) pair in a
+    different host of the cluster, as many at a time as registered hosts
     """
     set_planner_policy("bin-pack")
 
     num_vms = len(get_faasm_worker_ips())
-    assert num_vms == EXPECTED_NUM_VMS, "Expected {} VMs got: {}!".format(
-        EXPECTED_NUM_VMS, num_vms
-    )
+    if not concurrent:
+        assert num_vms == EXPECTED_NUM_VMS, "Expected {} VMs got: {}!".format(
+            EXPECTED_NUM_VMS, num_vms
+        )
 
     if num_threads is not None:
-        num_threads = [num_threads]
+        num_threads = [int(num_threads)]
     else:
         num_threads = TOTAL_NUM_THREADS
 
@@ -86,6 +178,21 @@ def wasm(ctx, kernel=None, num_threads=None, repeats=1):
     else:
         kernel = [kernel]
 
+    if concurrent:
+        hosts = get_sweep_hosts(min_slots=max(num_threads))
+        reset_planner(num_vms)
+        for wload in kernel:
+            _init_csv_file("openmp_{}_granny.csv".format(wload))
+
+        run_sweep(
+            [(wload, nthread) for wload in kernel for nthread in num_threads],
+            lambda point, host: _run_wasm_point(
+                *point, repeats, max_repeats, time_budget, warmup_runs, host
+            ),
+            hosts,
+        )
+        return
+
     for wload in kernel:
         reset_planner(num_vms)
 
@@ -93,44 +200,27 @@ def wasm(ctx, kernel=None, num_threads=None, repeats=1):
         _init_csv_file(csv_name)
 
         for nthread in num_threads:
-            for r in range(int(repeats)):
-                print(
-                    "Running OpenMP Kernel ({}) with {} threads (repeat: {}/{})".format(
-                        wload, nthread, r + 1, repeats
-                    )
-                )
-                user = OPENMP_KERNELS_FAASM_USER
-                func = wload
-                cmdline = get_kernel_cmdline(wload, nthread)
-                msg = {
-                    "user": user,
-                    "function": func,
-                    "cmdline": cmdline,
-                    "isOmp": True,
-                    "ompNumThreads": nthread,
-                }
-                req = {
-                    "user": user,
-                    "function": func,
-                    "singleHostHint": True,
-                }
-
-                result_json = post_async_msg_and_get_result_json(
-                    msg, req_dict=req
-                )
-                actual_time = get_faasm_exec_time_from_json(
-                    result_json, check=True
-                )
-                _write_csv_line(csv_name, nthread, r, actual_time)
-                print(
-                    "Kernel: {} - Nthreads: {} - Actual time: {}".format(
-                        wload, nthread, actual_time
-                    )
-                )
+            _run_wasm_point(
+                wload,
+                nthread,
+                repeats,
+                max_repeats,
+                time_budget,
+                warmup_runs,
+                None,
+            )
 
 
 @task
-def native(ctx, kernel=None, num_threads=None, repeats=1):
+def native(
+    ctx,
+    kernel=None,
+    num_threads=None,
+    repeats=1,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+):
     if num_threads is not None:
         num_threads = [num_threads]
     else:
@@ -154,13 +244,9 @@ def native(ctx, kernel=None, num_threads=None, repeats=1):
     for wload in kernel:
         csv_name = "openmp_{}_native.csv".format(wload)
         _init_csv_file(csv_name)
-        for r in range(int(repeats)):
-            for nthread in num_threads:
-                print(
-                    "Running OpenMP Kernel ({}) with {} threads (repeat: {}/{})".format(
-                        wload, nthread, r + 1, repeats
-                    )
-                )
+        for nthread in num_threads:
+
+            def _run():
                 binary = get_kernel_binary(wload)
                 cmdline = get_kernel_cmdline(wload, nthread)
                 openmp_cmd = "bash -c 'OPENMP_NUM_THREADS={} {} {}'".format(
@@ -187,5 +273,26 @@ def native(ctx, kernel=None, num_threads=None, repeats=1):
                 run_kubectl_cmd("openmp", exec_cmd)
                 # run(docker_cmd, shell=True, check=True)
                 actual_time = round(time() - start_ts, 2)
-                _write_csv_line(csv_name, nthread, r, actual_time)
                 print("Actual time: {} s".format(actual_time))
+                return actual_time
+
+            run_benchmark(
+                _run,
+                lambda run_num, actual_time, params: _write_csv_line(
+                    csv_name,
+                    "native",
+                    wload,
+                    nthread,
+                    run_num,
+                    actual_time,
+                    params,
+                ),
+                repeats=repeats,
+                max_repeats=max_repeats,
+                num_warmup_runs=warmup_runs,
+                time_budget=time_budget,
+                hosts=[master_vm],
+                label="OpenMP Kernel ({}) with {} threads".format(
+                    wload, nthread
+                ),
+            )
@@ -3,6 +3,7 @@ from invoke import Collection
 from . import native
 from . import plot
 from . import run
+from . import signature
 from . import wasm
 
-ns = Collection(native, plot, run, wasm)
+ns = Collection(native, plot, run, signature, wasm)
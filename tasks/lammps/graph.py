@@ -2,7 +2,28 @@ import json
 import matplotlib.pyplot as plt
 import networkx as nx
 
-from math import sqrt
+from math import ceil, sqrt
+from matplotlib.colors import LogNorm
+from numpy import (
+    arange,
+    argsort,
+    asarray,
+    bincount,
+    cumsum,
+    diff,
+    full,
+    repeat,
+    unique,
+    zeros,
+)
+from os import makedirs
+from os.path import exists, join
+from scipy.sparse import coo_matrix
+from tasks.util.lammps import LAMMPS_RESULTS_DIR, LAMMPS_SIM_WORKLOAD
+from tasks.util.traffic import (
+    get_cross_host_traffic,
+    get_lammps_workload_payload_model,
+)
 
 HOST_COLOURS = [
     "red",
@@ -14,6 +35,8 @@ HOST_COLOURS = [
 ]
 MPI_GRAPH_PATH = "/tmp/faasm_mpi_graph.png"
 MPI_XMSG_PATH = "/tmp/faasm_mpi_xmsg.png"
+MPI_HEATMAP_PATH = "/tmp/faasm_mpi_heatmap.png"
+MPI_HEATMAP_NUM_COLS = 4
 MIN_EDGE_WEIGHT = 10
 MPI_MSGCOUNT_PREFIX = "mpi-msgcount-torank-"
 MPI_MSGTYPE_PREFIX = "mpi-msgtype-torank-"
@@ -33,20 +56,24 @@ MPI_MSG_TYPE_MAP = {
 }
 
 
-def get_hosts_from_node(node):
+def _iter_nodes(root_node):
     """
-    Return the host set for an MPI node in the graph and its children
+    Iterate over all the nodes in the execution graph in pre-order (i.e. each
+    node before its children, and children in order) without recursing, so
+    that deep graphs do not hit the recursion limit
     """
-    node_hosts = set()
-    node_host = node["msg"].get("exec_host", "")
-    node_hosts.add(node_host)
+    stack = [root_node]
+    while len(stack) > 0:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.get("chained", list())))
 
-    children = node.get("chained", list())
-    for c in children:
-        child_hosts = get_hosts_from_node(c)
-        node_hosts = node_hosts.union(child_hosts)
 
-    return node_hosts
+def get_hosts_from_node(node):
+    """
+    Return the host set for an MPI node in the graph and its children
+    """
+    return set(n["msg"].get("exec_host", "") for n in _iter_nodes(node))
 
 
 def get_hosts_colour_map(root_node):
@@ -62,24 +89,38 @@ def get_hosts_colour_map(root_node):
     return cmp
 
 
+def _parse_exec_graph_detail(msg):
+    """
+    Parse the MPI entries of a message's exec-graph detail in one pass.
+    Entries look like `mpi-msgcount-torank-<rank>:<count>` and
+    `mpi-msgtype-torank-<type>-<rank>:<count>`. Returns two lists with the
+    (recv_rank, count) and (msg_type, recv_rank, count) entries
+    """
+    msg_counts = []
+    msg_types = []
+    for entry in msg.get("int_exec_graph_detail", "").split(","):
+        key, _, count = entry.partition(":")
+        if key.startswith(MPI_MSGCOUNT_PREFIX):
+            msg_counts.append(
+                (int(key[len(MPI_MSGCOUNT_PREFIX) :]), int(count))
+            )
+        elif key.startswith(MPI_MSGTYPE_PREFIX):
+            m_type, _, rank = key[len(MPI_MSGTYPE_PREFIX) :].partition("-")
+            msg_types.append((int(m_type), int(rank), int(count)))
+
+    return msg_counts, msg_types
+
+
 def get_mpi_messages_from_msg(msg):
     """
     Return a list with the message count per rank from a faabric message. The
     list contains tuples of the form [(origin_rank, destination_rank),
     msg_count)]
     """
-    all_msg = msg.get("int_exec_graph_detail", "").split(",")
-    all_mpi_msg = [
-        m for m in all_msg if MPI_MSGCOUNT_PREFIX in m.split(":")[0]
-    ]
-    recv_ranks = [int(m.split(":")[0].split("-")[-1]) for m in all_mpi_msg]
-    num_msg = [int(m.split(":")[1]) for m in all_mpi_msg]
-
-    ret_list = []
     my_rank = msg.get("mpi_rank", 0)
-    for rank, count in zip(recv_ranks, num_msg):
-        ret_list.append([(my_rank, rank), count])
-    return ret_list
+    msg_counts, _ = _parse_exec_graph_detail(msg)
+
+    return [[(my_rank, rank), count] for rank, count in msg_counts]
 
 
 def get_mpi_message_breakdown_from_msg(msg):
@@ -89,15 +130,11 @@ def get_mpi_message_breakdown_from_msg(msg):
     This way we know, for each message type, what ranks have sent messages of
     this type, and the number of this messages.
     """
-    all_msg = msg.get("int_exec_graph_detail", "").split(",")
-    all_mpi_msg = [m for m in all_msg if MPI_MSGTYPE_PREFIX in m.split(":")[0]]
-    msg_type = [int(m.split(":")[0].split("-")[-2]) for m in all_mpi_msg]
-    recv_ranks = [int(m.split(":")[0].split("-")[-1]) for m in all_mpi_msg]
-    num_msg = [int(m.split(":")[1]) for m in all_mpi_msg]
+    my_rank = msg.get("mpi_rank", 0)
+    _, msg_types = _parse_exec_graph_detail(msg)
 
     ret_dict = {}
-    my_rank = msg.get("mpi_rank", 0)
-    for m_type, rank, count in zip(msg_type, recv_ranks, num_msg):
+    for m_type, rank, count in msg_types:
         if m_type not in ret_dict:
             ret_dict[m_type] = []
         ret_dict[m_type].append([(my_rank, rank), count])
@@ -108,27 +145,136 @@ def get_mpi_message_breakdown_from_msg(msg):
 def get_mpi_details_from_node(node):
     """
     Given a node in the graph, return a dict with the node's most relevant
-    properties parsed.
+    properties parsed (for it and all its children). If a rank appears more
+    than once, the last node in pre-order wins
     """
     mpi_nodes = {}
-    node_rank = node["msg"].get("mpi_rank", 0)
-    node_host = node["msg"].get("exec_host", "")
-    node_world_size = node["msg"].get("mpi_world_size", "")
-    mpi_msg_count = get_mpi_messages_from_msg(node["msg"])
-    mpi_msg_type_bdwon = get_mpi_message_breakdown_from_msg(node["msg"])
-    mpi_nodes[node_rank] = {
-        "host": node_host,
-        "world_size": node_world_size,
-        "msg_count": mpi_msg_count,
-        "msg_type_breakdown": mpi_msg_type_bdwon,
+    for n in _iter_nodes(node):
+        msg = n["msg"]
+        my_rank = msg.get("mpi_rank", 0)
+        msg_counts, msg_types = _parse_exec_graph_detail(msg)
+
+        msg_type_bdown = {}
+        for m_type, rank, count in msg_types:
+            if m_type not in msg_type_bdown:
+                msg_type_bdown[m_type] = []
+            msg_type_bdown[m_type].append([(my_rank, rank), count])
+
+        mpi_nodes[my_rank] = {
+            "host": msg.get("exec_host", ""),
+            "world_size": msg.get("mpi_world_size", ""),
+            "msg_count": [
+                [(my_rank, rank), count] for rank, count in msg_counts
+            ],
+            "msg_type_breakdown": msg_type_bdown,
+        }
+
+    return mpi_nodes
+
+
+def get_mpi_comm_matrices(exec_graph):
+    """
+    Parse an execution graph (as a JSON string or an already-loaded dict) in
+    one pass into sparse communication matrices. Returns a dictionary with:
+    - world_size: the MPI world size
+    - hosts: the list of hosts, in order of appearance
+    - rank_to_host: array with the index (in `hosts`) of each rank's host
+    - msg_count: world_size x world_size sparse matrix where [i, j] is the
+        number of messages rank i sent to rank j
+    - msg_type: dictionary of <msg_type, sparse matrix> with the same counts
+        broken down per message type
+    As in `get_mpi_details_from_node`, if a rank appears more than once, the
+    last node in pre-order wins
+    """
+    if isinstance(exec_graph, str):
+        exec_graph = json.loads(exec_graph)
+    root_node = exec_graph["root"] if "root" in exec_graph else exec_graph
+
+    # Per-rank entries, as (recv_ranks, counts) and (types, recv_ranks, counts)
+    rank_entries = {}
+    rank_hosts = {}
+    hosts = {}
+    for n in _iter_nodes(root_node):
+        msg = n["msg"]
+        my_rank = msg.get("mpi_rank", 0)
+        host = msg.get("exec_host", "")
+        if host not in hosts:
+            hosts[host] = len(hosts)
+        rank_hosts[my_rank] = hosts[host]
+        rank_entries[my_rank] = _parse_exec_graph_detail(msg)
+
+    world_size = root_node["msg"].get("mpi_world_size")
+    if not world_size:
+        world_size = len(rank_entries)
+    max_rank = max(
+        [max(rank_entries.keys())]
+        + [rank for entries, _ in rank_entries.values() for rank, _ in entries]
+        + [
+            rank
+            for _, entries in rank_entries.values()
+            for _, rank, _ in entries
+        ]
+    )
+    world_size = max(int(world_size), max_rank + 1)
+
+    rank_to_host = full(world_size, -1, dtype=int)
+    for rank, host_idx in rank_hosts.items():
+        rank_to_host[rank] = host_idx
+
+    def _to_csr(send_ranks, recv_ranks, counts):
+        # Duplicate (send, recv) entries are summed
+        return coo_matrix(
+            (
+                asarray(counts, dtype=int),
+                (
+                    asarray(send_ranks, dtype=int),
+                    asarray(recv_ranks, dtype=int),
+                ),
+            ),
+            shape=(world_size, world_size),
+        ).tocsr()
+
+    count_send, count_recv, count_vals = [], [], []
+    type_send, type_recv, type_vals, type_ids = [], [], [], []
+    for my_rank, (msg_counts, msg_types) in rank_entries.items():
+        for rank, count in msg_counts:
+            count_send.append(my_rank)
+            count_recv.append(rank)
+            count_vals.append(count)
+        for m_type, rank, count in msg_types:
+            type_send.append(my_rank)
+            type_recv.append(rank)
+            type_vals.append(count)
+            type_ids.append(m_type)
+
+    type_ids = asarray(type_ids, dtype=int)
+    type_send = asarray(type_send, dtype=int)
+    type_recv = asarray(type_recv, dtype=int)
+    type_vals = asarray(type_vals, dtype=int)
+    msg_type = {}
+    for m_type in unique(type_ids).tolist():
+        is_type = type_ids == m_type
+        msg_type[m_type] = _to_csr(
+            type_send[is_type], type_recv[is_type], type_vals[is_type]
+        )
+
+    return {
+        "world_size": world_size,
+        "hosts": list(hosts.keys()),
+        "rank_to_host": rank_to_host,
+        "msg_count": _to_csr(count_send, count_recv, count_vals),
+        "msg_type": msg_type,
     }
 
-    children = node.get("chained", list())
-    for c in children:
-        child_details = get_mpi_details_from_node(c)
-        mpi_nodes = {**mpi_nodes, **child_details}
 
-    return mpi_nodes
+def get_cross_host_mask(comm_matrices, matrix):
+    """
+    Return a boolean array with whether each stored entry of a (CSR) matrix
+    in `comm_matrices` is between ranks in different hosts
+    """
+    rank_to_host = comm_matrices["rank_to_host"]
+    send_ranks = repeat(arange(matrix.shape[0]), diff(matrix.indptr))
+    return rank_to_host[send_ranks] != rank_to_host[matrix.indices]
 
 
 def get_grid_size(world_size):
@@ -437,14 +583,14 @@ def is_cross_host(mpi_nodes, edge):
     return mpi_nodes[out_node_key]["host"] != mpi_nodes[in_node_key]["host"]
 
 
-def plot_mpi_cross_host_msg(json_str):
+def plot_mpi_cross_host_msg(json_str, workload=LAMMPS_SIM_WORKLOAD):
     """
-    Plot the breakdown of cross-host messaging by message type
+    Plot the breakdown of cross-host messaging by message type, and append
+    the estimated cross-host traffic (for the given LAMMPS workload) to a CSV
+    file in the results directory
     """
-    json_obj = json.loads(json_str)
-    root_node = json_obj["root"]
-    world_size = root_node["msg"].get("mpi_world_size")
-    mpi_nodes = get_mpi_details_from_node(root_node)
+    comm_matrices = get_mpi_comm_matrices(json_str)
+    world_size = comm_matrices["world_size"]
 
     # ----- Plot bar chart's values -----
 
@@ -452,29 +598,24 @@ def plot_mpi_cross_host_msg(json_str):
 
     labels = MPI_MSG_TYPE_MAP.keys()
     prev_values = [0 for _ in labels]
-    abs_values = [0 for _ in labels]
-
-    # We iterate through all MPI ranks. For each rank we query the message type
-    # breakdown property; it indicates the number of messages of each type
-    # this rank has sent.
-    for node_rank in mpi_nodes:
-        values = [0 for _ in labels]
-        for m_type in mpi_nodes[node_rank]["msg_type_breakdown"]:
-            edge_list = mpi_nodes[node_rank]["msg_type_breakdown"][m_type]
-            # We need to count all messages of this type that are cross-host.
-            # Being cross-host depends on the send and recv rank that are
-            # included in the dict (see `get_mpi_message_breakdown_from_msg`
-            # for more details).
-            values[m_type] += sum(
-                [e[1] for e in edge_list if is_cross_host(mpi_nodes, e)]
-            )
-            # Also record the total number of messages sent
-            abs_values[m_type] += sum([e[1] for e in edge_list])
 
-        # To plot a stacked bar chart, we need to keep track of the `bottom`
-        # value, which is the Y-value where we stack the next bar. We keep
-        # track of the bottom values by adding (after plotting) the newly
-        # plotted bars.
+    # For each message type, count the cross-host messages each rank has
+    # sent. Rows in the matrices are sending ranks
+    xhost_per_rank = zeros((world_size, len(labels)), dtype=int)
+    for m_type, matrix in comm_matrices["msg_type"].items():
+        is_xhost = get_cross_host_mask(comm_matrices, matrix)
+        send_ranks = repeat(arange(world_size), diff(matrix.indptr))
+        xhost_per_rank[:, m_type] = bincount(
+            send_ranks[is_xhost],
+            weights=matrix.data[is_xhost],
+            minlength=world_size,
+        )
+
+    # To plot a stacked bar chart, we need to keep track of the `bottom`
+    # value, which is the Y-value where we stack the next bar. We keep track
+    # of the bottom values by adding (after plotting) the newly plotted bars.
+    for node_rank in range(world_size):
+        values = xhost_per_rank[node_rank].tolist()
         ax.bar(
             labels,
             values,
@@ -483,19 +624,29 @@ def plot_mpi_cross_host_msg(json_str):
         )
         prev_values = [sum(x) for x in zip(values, prev_values)]
 
-    # ----- Print total of cross-host messages to file -----
-    XHOST_MSG_FILE = "./xhost_msg.csv"
-    with open(XHOST_MSG_FILE, "a+") as f:
-        print(
-            "{},{},{}".format(
-                world_size,
-                sum(prev_values),
-                sum(abs_values),
+    # ----- Print total of cross-host traffic to file -----
+    traffic = get_cross_host_traffic(
+        comm_matrices, get_lammps_workload_payload_model(workload)
+    )
+    makedirs(LAMMPS_RESULTS_DIR, exist_ok=True)
+    xhost_msg_file = join(
+        LAMMPS_RESULTS_DIR, "xhost_msg_{}.csv".format(workload)
+    )
+    if not exists(xhost_msg_file):
+        with open(xhost_msg_file, "w") as f:
+            f.write(
+                "WorldSize,CrossHostMsgs,TotalMsgs,CrossHostBytes,NetworkTime\n"
             )
-        )
-        f.write(
-            "{},{},{}\n".format(world_size, sum(prev_values), sum(abs_values))
-        )
+    xhost_msg_line = "{},{},{},{},{:.4f}".format(
+        world_size,
+        traffic["total-xhost-msgs"],
+        traffic["total-msgs"],
+        traffic["total-xhost-bytes"],
+        traffic["network-time"],
+    )
+    print(xhost_msg_line)
+    with open(xhost_msg_file, "a") as f:
+        f.write("{}\n".format(xhost_msg_line))
 
     ax.legend()
 
@@ -517,3 +668,100 @@ def plot_mpi_cross_host_msg(json_str):
     plt.savefig(MPI_XMSG_PATH)
 
     print("Saved graph in file: {}".format(MPI_XMSG_PATH))
+
+
+def plot_mpi_comm_heatmap(
+    json_str, msg_types=None, plot_file=MPI_HEATMAP_PATH
+):
+    """
+    Plot the rank x rank communication matrix as a heatmap, with one facet
+    for all messages and one for each message type (all the types in the
+    graph, or the ones in `msg_types`). Ranks are grouped by host, so that
+    intra-host traffic shows as blocks along the diagonal and everything
+    outside them is cross-host. Colours are in log scale, shared by all
+    facets.
+
+    Unlike `plot_mpi_graph`, we draw straight from the sparse matrices, so it
+    scales to large world sizes
+    """
+    comm_matrices = get_mpi_comm_matrices(json_str)
+    world_size = comm_matrices["world_size"]
+    hosts = comm_matrices["hosts"]
+    rank_to_host = comm_matrices["rank_to_host"]
+
+    # Order ranks by host (ranks not in the graph, with host -1, go first)
+    order = argsort(rank_to_host, kind="stable")
+    host_idxs, host_sizes = unique(rank_to_host[order], return_counts=True)
+    host_ends = cumsum(host_sizes)
+
+    if msg_types is None:
+        msg_types = sorted(comm_matrices["msg_type"].keys())
+    facets = [("ALL", comm_matrices["msg_count"])] + [
+        (MPI_MSG_TYPE_MAP[m_type], comm_matrices["msg_type"][m_type])
+        for m_type in msg_types
+        if m_type in comm_matrices["msg_type"]
+    ]
+    max_count = max([max(matrix.max(), 1) for _, matrix in facets])
+    norm = LogNorm(vmin=1, vmax=max(max_count, 2))
+
+    num_cols = min(len(facets), MPI_HEATMAP_NUM_COLS)
+    num_rows = ceil(len(facets) / num_cols)
+    fig, axes = plt.subplots(
+        nrows=num_rows,
+        ncols=num_cols,
+        figsize=(5 * num_cols, 5 * num_rows),
+        squeeze=False,
+    )
+    fig.subplots_adjust(wspace=0.4, hspace=0.4)
+
+    for ind, (title, matrix) in enumerate(facets):
+        ax = axes[ind // num_cols][ind % num_cols]
+        # Draw the non-zero entries as squares, rather than rasterising the
+        # dense matrix, so that no rank pair gets lost when downsampling
+        coo = matrix[order][:, order].tocoo()
+        marker_size = max((250 / world_size) ** 2, 0.5)
+        image = ax.scatter(
+            coo.col,
+            coo.row,
+            c=coo.data,
+            norm=norm,
+            cmap="viridis",
+            marker="s",
+            s=marker_size,
+            linewidths=0,
+        )
+        ax.set_xlim(-0.5, world_size - 0.5)
+        ax.set_ylim(world_size - 0.5, -0.5)
+        ax.set_aspect("equal")
+
+        # Host boundaries
+        for end in host_ends[:-1]:
+            ax.axhline(end - 0.5, color="red", linewidth=0.5)
+            ax.axvline(end - 0.5, color="red", linewidth=0.5)
+
+        host_centers = host_ends - host_sizes / 2 - 0.5
+        host_labels = [
+            hosts[host_idx] if host_idx >= 0 else "unknown"
+            for host_idx in host_idxs
+        ]
+        ax.set_xticks(host_centers)
+        ax.set_xticklabels(host_labels, fontsize=6, rotation=45, ha="right")
+        ax.set_yticks(host_centers)
+        ax.set_yticklabels(host_labels, fontsize=6)
+        ax.set_xlabel("Receiving rank (by host)")
+        ax.set_ylabel("Sending rank (by host)")
+        ax.set_title("Msg type: {}".format(title))
+
+    for ind in range(len(facets), num_rows * num_cols):
+        axes[ind // num_cols][ind % num_cols].set_visible(False)
+
+    fig.colorbar(image, ax=axes, label="Number of messages")
+    fig.suptitle(
+        "MPI communication matrix (world size: {}, hosts: {})".format(
+            world_size, len(hosts)
+        )
+    )
+    fig.savefig(plot_file, bbox_inches="tight")
+    plt.close(fig)
+
+    print("Saved heatmap in file: {}".format(plot_file))
@@ -2,8 +2,7 @@ from glob import glob
 from invoke import task
 from matplotlib.pyplot import subplots
 from os import makedirs
-from os.path import join
-from pandas import read_csv
+from os.path import basename, join
 from tasks.util.env import SYSTEM_NAME
 from tasks.util.lammps import (
     LAMMPS_PLOTS_DIR,
@@ -11,29 +10,42 @@ from tasks.util.lammps import (
     LAMMPS_SIM_WORKLOAD_CONFIGS,
 )
 from tasks.util.plot import UBENCH_PLOT_COLORS, SINGLE_COL_FIGSIZE, save_plot
+from tasks.util.results_store import query_runs, sync_csv_results
+from tasks.util.stats import summarise_by
 
 
 def _read_results():
     glob_str = "lammps_*.csv"
-    result_dict = {}
 
+    # Import any results not recorded in the results store yet
     for csv in glob(join(LAMMPS_RESULTS_DIR, glob_str)):
-        baseline = csv.split("_")[1]
-        workload = csv.split("_")[-1][0:-4]
+        sync_csv_results(
+            csv,
+            "lammps",
+            basename(csv).split("_")[1],
+            ["Time"],
+            workload=basename(csv).split("_")[-1][0:-4],
+            size_col="WorldSize",
+        )
 
+    result_dict = {}
+    runs = query_runs("lammps")
+    for (baseline, workload), wload_runs in runs.groupby(
+        ["baseline", "workload"]
+    ):
         if workload not in LAMMPS_SIM_WORKLOAD_CONFIGS:
             continue
 
         if baseline not in result_dict:
             result_dict[baseline] = {}
 
-        results = read_csv(csv)
-        grouped = results.groupby("WorldSize", as_index=False)
-
+        summaries = summarise_by(wload_runs, "size", "Time")
+        world_sizes = sorted(summaries.keys())
         result_dict[baseline][workload] = {
-            "world-size": grouped.mean()["WorldSize"].to_list(),
-            "exec-time-mean": grouped.mean()["Time"].to_list(),
-            "exec-time-sem": grouped.sem()["Time"].to_list(),
+            "world-size": world_sizes,
+            "exec-time-mean": [summaries[ws]["mean"] for ws in world_sizes],
+            "exec-time-sem": [summaries[ws]["sem"] for ws in world_sizes],
+            "exec-time-ci": [summaries[ws]["mean-ci"] for ws in world_sizes],
         }
 
     return result_dict
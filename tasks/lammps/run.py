@@ -3,10 +3,13 @@ from faasmctl.util.planner import reset as reset_planner
 from invoke import task
 from os import makedirs
 from os.path import basename, join
+from tasks.lammps.graph import get_mpi_comm_matrices
 from tasks.util.faasm import (
+    get_faasm_exec_hosts_from_json,
     get_faasm_exec_time_from_json,
     post_async_msg_and_get_result_json,
 )
+from tasks.util.harness import run_benchmark
 from tasks.util.lammps import (
     LAMMPS_FAASM_USER,
     LAMMPS_MIGRATION_NET_DOCKER_BINARY,
@@ -22,7 +25,9 @@ from tasks.util.openmpi import (
     get_native_mpi_pods,
     run_kubectl_cmd,
 )
-from time import sleep, time
+from tasks.util.planner import get_comm_aware_host_list
+from tasks.util.results_store import init_results, record_run
+from time import time
 
 # Parameters tuning the experiment runs
 NPROCS_EXPERIMENT = list(range(2, 17))
@@ -34,23 +39,57 @@ def _init_csv_file(csv_name):
     with open(result_file, "w") as out_file:
         out_file.write("WorldSize,Run,Time\n")
 
+    init_results(result_file)
+
     return result_file
 
 
-def _write_csv_line(csv_name, nprocs, run_num, actual_time):
+def _write_csv_line(
+    csv_name, baseline, workload, nprocs, run_num, actual_time, params=None
+):
     result_file = join(LAMMPS_RESULTS_DIR, csv_name)
     with open(result_file, "a") as out_file:
         out_file.write("{},{},{:.2f}\n".format(nprocs, run_num, actual_time))
 
+    record_run(
+        "lammps",
+        baseline,
+        {"Time": round(actual_time, 2)},
+        workload=workload,
+        size=nprocs,
+        params={"Run": run_num, **(params or {})},
+        source=result_file,
+    )
+
 
 @task(iterable=["w"])
-def wasm(ctx, w, repeats=1):
+def wasm(
+    ctx,
+    w,
+    repeats=1,
+    exec_graph=None,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+):
     """
     Run LAMMPS simulation on Granny
+
+    Optionally, pass the path to an execution graph (in JSON) of a previous
+    LAMMPS run to place the ranks to minimise cross-host messages. In that
+    case, we only run with the same number of processes as the graph (the
+    only size we have a mapping for)
     """
     num_vms = len(get_faasm_worker_ips())
     assert num_vms == 2, "Expected 2 VMs got: {}!".format(num_vms)
 
+    comm_matrices = None
+    nprocs = NPROCS_EXPERIMENT
+    if exec_graph is not None:
+        with open(exec_graph, "r") as fh:
+            comm_matrices = get_mpi_comm_matrices(fh.read())
+        nprocs = [comm_matrices["world_size"]]
+
     for workload in w:
         if workload not in LAMMPS_SIM_WORKLOAD_CONFIGS:
             print(
@@ -63,20 +102,20 @@ def wasm(ctx, w, repeats=1):
             get_lammps_data_file(workload_config["data-file"])["data"][0]
         )
 
-        csv_name = "lammps_granny_{}.csv".format(workload)
+        baseline = "granny" if comm_matrices is None else "granny-comm-aware"
+        csv_name = "lammps_{}_{}.csv".format(baseline, workload)
         _init_csv_file(csv_name)
 
-        for nproc in NPROCS_EXPERIMENT:
+        for nproc in nprocs:
             reset_planner(num_vms)
 
-            for nrep in range(repeats):
-                print(
-                    "Running LAMMPS on Granny with {} MPI processes"
-                    " (workload: {}, run: {}/{})".format(
-                        nproc, workload, nrep + 1, repeats
-                    )
+            host_list = None
+            if comm_matrices is not None:
+                host_list = get_comm_aware_host_list(
+                    comm_matrices["msg_count"]
                 )
 
+            def _run():
                 # Run LAMMPS
                 cmdline = "-in faasm://lammps-data/{}".format(data_file)
                 msg = {
@@ -90,13 +129,36 @@ def wasm(ctx, w, repeats=1):
                         chunk_size=workload_config["chunk_size"],
                     ),
                 }
-                result_json = post_async_msg_and_get_result_json(msg)
+                result_json = post_async_msg_and_get_result_json(
+                    msg, host_list=host_list
+                )
                 actual_time = get_faasm_exec_time_from_json(result_json)
-                _write_csv_line(csv_name, nproc, nrep, actual_time)
+                return actual_time, get_faasm_exec_hosts_from_json(result_json)
+
+            run_benchmark(
+                _run,
+                lambda run_num, actual_time, params: _write_csv_line(
+                    csv_name,
+                    baseline,
+                    workload,
+                    nproc,
+                    run_num,
+                    actual_time,
+                    params,
+                ),
+                repeats=repeats,
+                max_repeats=max_repeats,
+                num_warmup_runs=warmup_runs,
+                time_budget=time_budget,
+                label="LAMMPS on Granny with {} MPI processes"
+                " (workload: {})".format(nproc, workload),
+            )
 
 
 @task(iterable=["w"])
-def native(ctx, w, repeats=1):
+def native(
+    ctx, w, repeats=1, max_repeats=None, time_budget=None, warmup_runs=0
+):
     """
     Run LAMMPS experiment on OpenMPI
     """
@@ -131,49 +193,59 @@ def native(ctx, w, repeats=1):
         )
 
         for nproc in NPROCS_EXPERIMENT:
-            for nrep in range(repeats):
-                print(
-                    "Running LAMMPS on native with {} MPI processes "
-                    "(workload: {}, run: {}/{})".format(
-                        nproc, workload, nrep + 1, repeats
-                    )
+            # Prepare host list (in terms of IPs)
+            if nproc > num_cpus_per_vm:
+                host_list = [pod_ips[0]] * num_cpus_per_vm + [pod_ips[1]] * (
+                    nproc - num_cpus_per_vm
                 )
-
-                # Prepare host list (in terms of IPs)
-                if nproc > num_cpus_per_vm:
-                    host_list = [pod_ips[0]] * num_cpus_per_vm + [
-                        pod_ips[1]
-                    ] * (nproc - num_cpus_per_vm)
-                else:
-                    host_list = [pod_ips[0]] * nproc
-
-                # Prepare execution commands
-                mpirun_cmd = [
-                    "mpirun",
-                    get_lammps_migration_params(
-                        native=True,
-                        num_loops=3,
-                        num_net_loops=workload_config["num_net_loops"],
-                        chunk_size=workload_config["chunk_size"],
-                    ),
-                    "-np {}".format(nproc),
-                    "-host {}".format(",".join(host_list)),
-                    LAMMPS_MIGRATION_NET_DOCKER_BINARY,
-                    native_cmdline,
-                ]
-                mpirun_cmd = " ".join(mpirun_cmd)
-                exec_cmd = [
-                    "exec",
-                    master_pod,
-                    "--",
-                    "su mpirun -c '{}'".format(mpirun_cmd),
-                ]
-
-                # Run command
+            else:
+                host_list = [pod_ips[0]] * nproc
+
+            # Prepare execution commands
+            mpirun_cmd = [
+                "mpirun",
+                get_lammps_migration_params(
+                    native=True,
+                    num_loops=3,
+                    num_net_loops=workload_config["num_net_loops"],
+                    chunk_size=workload_config["chunk_size"],
+                ),
+                "-np {}".format(nproc),
+                "-host {}".format(",".join(host_list)),
+                LAMMPS_MIGRATION_NET_DOCKER_BINARY,
+                native_cmdline,
+            ]
+            mpirun_cmd = " ".join(mpirun_cmd)
+            exec_cmd = [
+                "exec",
+                master_pod,
+                "--",
+                "su mpirun -c '{}'".format(mpirun_cmd),
+            ]
+
+            def _run():
                 start = time()
                 run_kubectl_cmd("lammps", " ".join(exec_cmd))
                 end = time()
-                actual_time = end - start
-                _write_csv_line(csv_name, nproc, nrep, actual_time)
-
-                sleep(2)
+                return end - start
+
+            run_benchmark(
+                _run,
+                lambda run_num, actual_time, params: _write_csv_line(
+                    csv_name,
+                    "native",
+                    workload,
+                    nproc,
+                    run_num,
+                    actual_time,
+                    params,
+                ),
+                repeats=repeats,
+                max_repeats=max_repeats,
+                num_warmup_runs=warmup_runs,
+                time_budget=time_budget,
+                hosts=host_list,
+                sleep_secs=2,
+                label="LAMMPS on native with {} MPI processes"
+                " (workload: {})".format(nproc, workload),
+            )
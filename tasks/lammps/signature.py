@@ -0,0 +1,77 @@
+from invoke import task
+from os import makedirs
+from os.path import join
+from tasks.lammps.graph import get_mpi_comm_matrices
+from tasks.util.comm_signature import (
+    get_replay_function,
+    load_latest_comm_signature,
+    save_comm_signature,
+)
+from tasks.util.lammps import (
+    LAMMPS_RESULTS_DIR,
+    LAMMPS_SIM_WORKLOAD_CONFIGS,
+)
+from tasks.util.mapping import get_contiguous_mapping
+from tasks.util.partition import iter_partitions
+from tasks.util.planner import get_xvm_links_from_part
+
+
+@task
+def capture(ctx, exec_graph, workload, exec_time=None):
+    """
+    Store the communication signature of a LAMMPS run, given its execution
+    graph (in JSON), the workload it ran, and its execution time (in seconds)
+    """
+    if workload not in LAMMPS_SIM_WORKLOAD_CONFIGS:
+        raise RuntimeError(
+            "Unrecognised workload config ({}) must be one in: {}".format(
+                workload, list(LAMMPS_SIM_WORKLOAD_CONFIGS.keys())
+            )
+        )
+
+    with open(exec_graph, "r") as fh:
+        comm_matrices = get_mpi_comm_matrices(fh.read())
+
+    signature_file = save_comm_signature(
+        comm_matrices,
+        workload,
+        workload_config=LAMMPS_SIM_WORKLOAD_CONFIGS[workload],
+        exec_time=None if exec_time is None else float(exec_time),
+    )
+    print(
+        "Stored communication signature (world size: {}) in: {}".format(
+            comm_matrices["world_size"], signature_file
+        )
+    )
+
+
+@task
+def replay(ctx, workload, nprocs, num_cpus_per_vm=8):
+    """
+    Estimate the runtime of a LAMMPS run under every partition of its ranks
+    (with at most `num_cpus_per_vm` ranks per host), replaying the latest
+    stored signature for the workload and number of processes
+    """
+    nprocs = int(nprocs)
+    num_cpus_per_vm = int(num_cpus_per_vm)
+    get_runtime = get_replay_function(
+        load_latest_comm_signature(workload, nprocs)
+    )
+
+    makedirs(LAMMPS_RESULTS_DIR, exist_ok=True)
+    result_file = join(
+        LAMMPS_RESULTS_DIR,
+        "lammps_replay_{}_{}.csv".format(workload, nprocs),
+    )
+    with open(result_file, "w") as out_file:
+        out_file.write("Partition,CrossVMLinks,Time\n")
+
+        for part in iter_partitions(nprocs, max_part=num_cpus_per_vm):
+            runtime = get_runtime(get_contiguous_mapping(nprocs, part))
+            out_file.write(
+                '"{}",{},{:.2f}\n'.format(
+                    part, get_xvm_links_from_part(part), runtime
+                )
+            )
+
+    print("Wrote replayed runtimes to: {}".format(result_file))
@@ -1,33 +1,30 @@
 from glob import glob
 from invoke import task
-from os.path import join
-from pandas import read_csv
+from os.path import basename, join
 from tasks.util.lulesh import (
     LULESH_RESULTS_DIR,
 )
+from tasks.util.results_store import query_runs, sync_csv_results
+from tasks.util.stats import summarise_by
 
 
 def _read_results():
     glob_str = "lulesh_*.csv"
-    result_dict = {}
 
+    # Import any results not recorded in the results store yet
     for csv in glob(join(LULESH_RESULTS_DIR, glob_str)):
-        baseline = csv.split("_")[1].split(".")[0]
-
-        if baseline not in result_dict:
-            result_dict[baseline] = {}
-
-        results = read_csv(csv)
-        grouped = results.groupby("NumThreads", as_index=False)
-
-        for nt in grouped.mean()["NumThreads"].to_list():
-            index = grouped.mean()["NumThreads"].to_list().index(nt)
-            result_dict[baseline][nt] = {
-                "mean": grouped.mean()["Time"].to_list()[index],
-                "sem": grouped.sem()["Time"].to_list()[index],
-            }
-
-    return result_dict
+        sync_csv_results(
+            csv,
+            "lulesh",
+            basename(csv).split("_")[1].split(".")[0],
+            ["ExecTimeSecs"],
+            size_col="NumThreads",
+        )
+
+    return {
+        baseline: summarise_by(runs, "size", "ExecTimeSecs")
+        for baseline, runs in query_runs("lulesh").groupby("baseline")
+    }
 
 
 @task(default=True)
@@ -5,6 +5,7 @@ from os import makedirs
 from os.path import join
 from subprocess import run
 from tasks.util.faasm import (
+    get_faasm_exec_hosts_from_json,
     get_faasm_exec_time_from_json,
     post_async_msg_and_get_result_json,
 )
@@ -18,6 +19,8 @@ from tasks.util.lulesh import (
     get_lulesh_cmdline,
     get_lulesh_input_data,
 )
+from tasks.util.harness import run_benchmark
+from tasks.util.results_store import init_results, record_run
 from time import time
 
 """
@@ -35,18 +38,38 @@ def _init_csv_file(csv_name):
     with open(result_file, "w") as out_file:
         out_file.write("NumThreads,Run,ExecTimeSecs\n")
 
+    init_results(result_file)
+
     return result_file
 
 
-def _write_csv_line(csv_name, nprocs, run_num, actual_time):
+def _write_csv_line(
+    csv_name, baseline, nprocs, run_num, actual_time, params=None
+):
     result_file = join(LULESH_RESULTS_DIR, csv_name)
 
     with open(result_file, "a") as out_file:
         out_file.write("{},{},{:.2f}\n".format(nprocs, run_num, actual_time))
 
+    record_run(
+        "lulesh",
+        baseline,
+        {"ExecTimeSecs": round(actual_time, 2)},
+        size=nprocs,
+        params={"Run": run_num, **(params or {})},
+        source=result_file,
+    )
+
 
 @task(default=True)
-def granny(ctx, nthreads=None, repeats=1):
+def granny(
+    ctx,
+    nthreads=None,
+    repeats=1,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+):
     """
     Run LAMMPS simulation on Granny
     """
@@ -66,13 +89,7 @@ def granny(ctx, nthreads=None, repeats=1):
     for nthread in nthreads:
         reset_planner(num_vms)
 
-        for nrep in range(repeats):
-            print(
-                "Running LULESH on Granny with {} OpenMP threads ({}/{})".format(
-                    nthread, nrep + 1, repeats
-                )
-            )
-
+        def _run():
             # Run LULESH
             msg = {
                 "user": LULESH_FAASM_USER,
@@ -83,11 +100,30 @@ def granny(ctx, nthreads=None, repeats=1):
 
             result_json = post_async_msg_and_get_result_json(msg)
             actual_time = get_faasm_exec_time_from_json(result_json)
-            _write_csv_line(csv_name, nthread, nrep, actual_time)
+            return actual_time, get_faasm_exec_hosts_from_json(result_json)
+
+        run_benchmark(
+            _run,
+            lambda run_num, actual_time, params: _write_csv_line(
+                csv_name, "granny", nthread, run_num, actual_time, params
+            ),
+            repeats=repeats,
+            max_repeats=max_repeats,
+            num_warmup_runs=warmup_runs,
+            time_budget=time_budget,
+            label="LULESH on Granny with {} OpenMP threads".format(nthread),
+        )
 
 
 @task()
-def native(ctx, nthreads=None, repeats=1):
+def native(
+    ctx,
+    nthreads=None,
+    repeats=1,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+):
     """
     Run LAMMPS experiment on OpenMPI
     """
@@ -104,13 +140,8 @@ def native(ctx, nthreads=None, repeats=1):
     # master_vm = vm_names[0]
 
     for nthread in nthreads:
-        for nrep in range(repeats):
-            print(
-                "Running LULESH on OpenMP with {} OpenMP threads ({}/{})".format(
-                    nthread, nrep + 1, repeats
-                )
-            )
 
+        def _run():
             binary = LULESH_DOCKER_BINARY
             cmdline = get_lulesh_cmdline()
             openmp_cmd = "bash -c 'OPENMP_NUM_THREADS={} {} {}'".format(
@@ -138,5 +169,18 @@ def native(ctx, nthreads=None, repeats=1):
             # run_kubectl_cmd("openmp", exec_cmd)
             run(docker_cmd, shell=True, check=True)
             actual_time = round(time() - start_ts, 2)
-            _write_csv_line(csv_name, nthread, nrep, actual_time)
             print("Actual time: {} s".format(actual_time))
+            return actual_time
+
+        run_benchmark(
+            _run,
+            lambda run_num, actual_time, params: _write_csv_line(
+                csv_name, "native", nthread, run_num, actual_time, params
+            ),
+            repeats=repeats,
+            max_repeats=max_repeats,
+            num_warmup_runs=warmup_runs,
+            time_budget=time_budget,
+            hosts=["openmp-test"],
+            label="LULESH on OpenMP with {} OpenMP threads".format(nthread),
+        )
@@ -1,6 +1,4 @@
 from invoke import task
-from matplotlib.patches import Patch
-from matplotlib.pyplot import subplots, subplot_mosaic
 from tasks.util.elastic import (
     plot_elastic_results,
     read_elastic_results,
@@ -17,13 +15,9 @@ from tasks.util.locality import (
     plot_locality_results,
     read_locality_results,
 )
-from tasks.util.plot import (
-    DOUBLE_COL_FIGSIZE_HALF,
-    DOUBLE_COL_FIGSIZE_THIRD,
-    get_color_for_baseline,
-    get_label_for_baseline,
-    save_plot,
-)
+from tasks.util.plot import DOUBLE_COL_FIGSIZE_HALF
+from tasks.util.render import FigureJob, render_figures
+from tasks.util.results_cache import clear_results_cache
 from tasks.util.spot import (
     plot_spot_results,
     read_spot_results,
@@ -32,7 +26,7 @@ from tasks.util.spot import (
 
 # TODO: delete me if miracle happens
 @task
-def migration(ctx):
+def migration(ctx, force=False, num_procs=None):
     """
     Macrobenchmark plot showing the benefits of migrating MPI applications to
     improve locality of execution. We show:
@@ -52,83 +46,72 @@ def migration(ctx):
             n_vms, n_tasks, num_cpus_per_vm, migrate=True
         )
 
-    # ----------
-    # Plot 1: aggregate idle vCPUs
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results(
-        "percentage_vcpus",
-        results,
-        ax,
-        num_vms=num_vms,
-        num_tasks=num_tasks,
-        migrate=True,
-    )
-
-    # Manually craft the legend
-    baselines = ["slurm", "batch", "granny", "granny-migrate"]
-    legend_entries = [
-        Patch(
-            color=get_color_for_baseline("mpi-migrate", baseline),
-            label=get_label_for_baseline("mpi-migrate", baseline),
-        )
-        for baseline in baselines
+    jobs = [
+        # Plot 1: aggregate idle vCPUs
+        FigureJob(
+            "makespan_migrate_vcpus",
+            plot_locality_results,
+            [
+                (
+                    "percentage_vcpus",
+                    {
+                        "num_vms": num_vms,
+                        "num_tasks": num_tasks,
+                        "migrate": True,
+                    },
+                )
+            ],
+            MAKESPAN_PLOTS_DIR,
+            legend={
+                "workload": "mpi-migrate",
+                "baselines": ["slurm", "batch", "granny", "granny-migrate"],
+                "loc": "upper center",
+                "ncols": 2,
+                "bbox_to_anchor": (0.535, 0.3),
+            },
+        ),
+        # Plot 2: aggregate xVM links
+        FigureJob(
+            "makespan_migrate_xvm",
+            plot_locality_results,
+            [
+                (
+                    "percentage_xvm",
+                    {
+                        "num_vms": num_vms,
+                        "num_tasks": num_tasks,
+                        "migrate": True,
+                    },
+                )
+            ],
+            MAKESPAN_PLOTS_DIR,
+        ),
+        # Plot 3: timeseries of vCPUs
+        FigureJob(
+            "makespan_migrate_ts_vcpus",
+            plot_locality_results,
+            [("ts_vcpus", {"num_vms": timeseries_num_vms, "migrate": True})],
+            MAKESPAN_PLOTS_DIR,
+        ),
+        # Plot 4: timeseries of xVM links
+        FigureJob(
+            "makespan_migrate_ts_xvm",
+            plot_locality_results,
+            [
+                (
+                    "ts_xvm_links",
+                    {"num_vms": timeseries_num_vms, "migrate": True},
+                )
+            ],
+            MAKESPAN_PLOTS_DIR,
+        ),
     ]
-    fig.legend(
-        handles=legend_entries,
-        loc="upper center",
-        ncols=2,
-        bbox_to_anchor=(0.535, 0.3),
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_migrate_vcpus")
-
-    # ----------
-    # Plot 1: aggregate xVM links
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results(
-        "percentage_xvm",
-        results,
-        ax,
-        num_vms=num_vms,
-        num_tasks=num_tasks,
-        migrate=True,
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_migrate_xvm")
-
-    # ----------
-    # Plot 3: timeseries of vCPUs
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results(
-        "ts_vcpus", results, ax, num_vms=timeseries_num_vms, migrate=True
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_migrate_ts_vcpus")
-
-    # ----------
-    # Plot 4: timeseries of xVM links
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
 
-    plot_locality_results(
-        "ts_xvm_links", results, ax, num_vms=timeseries_num_vms, migrate=True
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_migrate_ts_xvm")
+    render_figures(jobs, results, num_procs=num_procs, force=force)
 
 
 @task
-def locality(ctx):
+def locality(ctx, force=False, num_procs=None):
     """
     Macrobenchmark plot showing the benefits of migrating MPI applications to
     improve locality of execution. We show:
@@ -153,99 +136,80 @@ def locality(ctx):
     for (n_vms, n_tasks) in zip(num_vms, num_tasks):
         results[n_vms] = read_locality_results(n_vms, n_tasks, num_cpus_per_vm)
 
-    # ----------
-    # Plot 1: makespan bar plot
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results(
-        "makespan", results, ax, num_vms=num_vms, num_tasks=num_tasks
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_locality_makespan")
-
-    # ----------
-    # Plot 2: Aggregate vCPUs metric
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results(
-        "percentage_vcpus", results, ax, num_vms=num_vms, num_tasks=num_tasks
-    )
-
-    # ----------
-    # Plot 3: Aggregate xVM metric
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results(
-        "percentage_xvm", results, ax, num_vms=num_vms, num_tasks=num_tasks
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_locality_xvm")
-
-    # ----------
-    # Plot 4: execution time CDF
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results(
-        "cdf_jct",
-        results,
-        ax,
-        cdf_num_vms=timeseries_num_vms,
-        cdf_num_tasks=timeseries_num_tasks,
-    )
-
     # Manually craft the legend
-    baselines = ["granny-batch", "granny", "granny-migrate"]
-    legend_entries = [
-        Patch(
-            color=get_color_for_baseline("mpi-locality", baseline),
-            label=get_label_for_baseline("mpi-locality", baseline),
-        )
-        for baseline in baselines
+    legend = {
+        "workload": "mpi-locality",
+        "baselines": ["granny-batch", "granny", "granny-migrate"],
+        "loc": "lower center",
+        "ncols": 2,
+        "bbox_to_anchor": (0.65, 0.17),
+    }
+
+    jobs = [
+        # Plot 1: makespan bar plot
+        FigureJob(
+            "makespan_locality_makespan",
+            plot_locality_results,
+            [("makespan", {"num_vms": num_vms, "num_tasks": num_tasks})],
+            MAKESPAN_PLOTS_DIR,
+        ),
+        # Plot 2: Aggregate vCPUs metric
+        FigureJob(
+            "makespan_locality_vcpus",
+            plot_locality_results,
+            [
+                (
+                    "percentage_vcpus",
+                    {"num_vms": num_vms, "num_tasks": num_tasks},
+                )
+            ],
+            MAKESPAN_PLOTS_DIR,
+            legend=legend,
+        ),
+        # Plot 3: Aggregate xVM metric
+        FigureJob(
+            "makespan_locality_xvm",
+            plot_locality_results,
+            [("percentage_xvm", {"num_vms": num_vms, "num_tasks": num_tasks})],
+            MAKESPAN_PLOTS_DIR,
+        ),
+        # Plot 4: execution time CDF
+        FigureJob(
+            "makespan_locality_cdf_jct",
+            plot_locality_results,
+            [
+                (
+                    "cdf_jct",
+                    {
+                        "cdf_num_vms": timeseries_num_vms,
+                        "cdf_num_tasks": timeseries_num_tasks,
+                    },
+                )
+            ],
+            MAKESPAN_PLOTS_DIR,
+            legend=legend,
+        ),
+        # Plot 5: time-series of idle vCPUs
+        FigureJob(
+            "makespan_locality_ts_vcpus",
+            plot_locality_results,
+            [("ts_vcpus", {"num_vms": timeseries_num_vms})],
+            MAKESPAN_PLOTS_DIR,
+        ),
+        # Plot 6: time-series of cross-VM links
+        FigureJob(
+            "makespan_locality_ts_xvm",
+            plot_locality_results,
+            [("ts_xvm_links", {"num_vms": timeseries_num_vms})],
+            MAKESPAN_PLOTS_DIR,
+        ),
     ]
-    fig.legend(
-        handles=legend_entries,
-        loc="lower center",
-        ncols=2,
-        bbox_to_anchor=(0.65, 0.17),
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_locality_vcpus")
 
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_locality_cdf_jct")
-
-    # ----------
-    # Plot 5: time-series of idle vCPUs
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results("ts_vcpus", results, ax, num_vms=timeseries_num_vms)
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_locality_ts_vcpus")
-
-    # ----------
-    # Plot 5: time-series of cross-VM links
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_locality_results(
-        "ts_xvm_links", results, ax, num_vms=timeseries_num_vms
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_locality_ts_xvm")
+    render_figures(jobs, results, num_procs=num_procs, force=force)
 
 
 @task
-def eviction(ctx):
+def eviction(ctx, force=False, num_procs=None):
     """
     Macrobenchmark plot showing the benefits of migrating MPI applications to
     evict idle VMs.
@@ -269,44 +233,47 @@ def eviction(ctx):
             n_vms, n_users, n_tasks, num_cpus_per_vm
         )
 
-    fig, ax = subplot_mosaic([["left", "right"], ["left", "right"]])
-
-    # ----------
-    # Plot 1: bar plot of the CPUsecs per execution
-    # ----------
-
-    plot_eviction_results(
-        "makespan",
-        results,
-        ax["left"],
-        num_vms=num_vms,
-        num_tasks=num_tasks,
-        num_users=num_users,
-    )
-
-    # ----------
-    # Plot 2: timeseries of one of the cluster sizes
-    # ----------
-
-    plot_eviction_results(
-        "tasks_per_user",
-        results,
-        ax["right"],
-        num_vms=timeseries_num_vms,
-        num_users=timeseries_num_users,
-    )
+    jobs = [
+        FigureJob(
+            "eviction",
+            plot_eviction_results,
+            [
+                # Plot 1: bar plot of the CPUsecs per execution
+                (
+                    "makespan",
+                    {
+                        "num_vms": num_vms,
+                        "num_tasks": num_tasks,
+                        "num_users": num_users,
+                    },
+                ),
+                # Plot 2: timeseries of one of the cluster sizes
+                (
+                    "tasks_per_user",
+                    {
+                        "num_vms": timeseries_num_vms,
+                        "num_users": timeseries_num_users,
+                    },
+                ),
+            ],
+            MAKESPAN_PLOTS_DIR,
+            figsize=None,
+        )
+    ]
 
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "eviction")
+    render_figures(jobs, results, num_procs=num_procs, force=force)
 
 
 @task
-def spot(ctx):
+def spot(ctx, force=False, num_procs=None):
     """
     Macro-benchmark showing the benefits of using Granny to run on SPOT VMs.
     - LHS: makespan slowdown wrt not using SPOT VMs (makespan_spot / makespan_no_spot)
     - RHS: cost savings of using SPOT VMs (price_spot / price_no_spot). We
            use different savings percentages of using spot VMs from 90% (maximum
            reported by Azure) to 25% (90, 75, 50, 25)
+    - Pareto: cost vs makespan frontier per baseline when choosing the
+           fraction of spot VMs (see tasks/util/cost.py)
     """
     num_vms = [8, 16, 24, 32]
     num_tasks = [25, 50, 75, 100]
@@ -316,57 +283,54 @@ def spot(ctx):
     for (n_vms, n_tasks) in zip(num_vms, num_tasks):
         results[n_vms] = read_spot_results(n_vms, n_tasks, num_cpus_per_vm)
 
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_HALF)
-
-    # ----------
-    # Plot 1: makespan slowdown (spot / no spot)
-    # ----------
-
-    plot_spot_results(
-        "makespan",
-        results,
-        ax,
-        num_vms=num_vms,
-        num_tasks=num_tasks,
-    )
-
-    # Manually craft the legend
     baselines = ["slurm", "batch", "granny"]
-    legend_entries = [
-        Patch(
-            color=get_color_for_baseline("mpi-spot", baseline),
-            label=get_label_for_baseline("mpi-spot", baseline),
-        )
-        for baseline in baselines
+    jobs = [
+        # Plot 1: makespan slowdown (spot / no spot)
+        FigureJob(
+            "makespan_spot_makespan",
+            plot_spot_results,
+            [("makespan", {"num_vms": num_vms, "num_tasks": num_tasks})],
+            MAKESPAN_PLOTS_DIR,
+            figsize=DOUBLE_COL_FIGSIZE_HALF,
+            legend={
+                "workload": "mpi-spot",
+                "baselines": baselines,
+                "loc": "upper center",
+                "ncols": len(baselines),
+                "bbox_to_anchor": (0.52, 1.07),
+            },
+        ),
+        # Plot 2: stacked cost bar plot (spot) + real cost (no spot)
+        FigureJob(
+            "makespan_spot_cost",
+            plot_spot_results,
+            [("cost", {"num_vms": num_vms, "num_tasks": num_tasks})],
+            MAKESPAN_PLOTS_DIR,
+            figsize=DOUBLE_COL_FIGSIZE_HALF,
+        ),
     ]
-    fig.legend(
-        handles=legend_entries,
-        loc="upper center",
-        ncols=len(baselines),
-        bbox_to_anchor=(0.52, 1.07),
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_spot_makespan")
-
-    # ----------
-    # Plot 2: stacked cost bar plot (spot) + real cost (no spot)
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_HALF)
 
-    plot_spot_results(
-        "cost",
-        results,
-        ax,
-        num_vms=num_vms,
-        num_tasks=num_tasks,
-    )
+    # Plot 3: Pareto frontier of (makespan, cost) when choosing the fraction
+    # of spot VMs, for different discounts
+    for n_vms in num_vms:
+        jobs.append(
+            FigureJob(
+                "makespan_spot_pareto_{}vms".format(n_vms),
+                plot_spot_results,
+                [
+                    ("pareto", {"num_vms": n_vms, "discount": discount})
+                    for discount in [0.9, 0.6, 0.3]
+                ],
+                MAKESPAN_PLOTS_DIR,
+                figsize=(12, 3),
+            )
+        )
 
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_spot_cost")
+    render_figures(jobs, results, num_procs=num_procs, force=force)
 
 
 @task
-def elastic(ctx):
+def elastic(ctx, force=False, num_procs=None):
     """
     Macro-benchmark showing the benefits of using Granny to elastically scale
     up shared memory applications to use idle vCPU cores.
@@ -392,83 +356,75 @@ def elastic(ctx):
     for (n_vms, n_tasks) in zip(num_vms, num_tasks):
         results[n_vms] = read_elastic_results(n_vms, n_tasks, num_cpus_per_vm)
 
-    # ----------
-    # Plot 1: makespan
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_elastic_results(
-        "makespan",
-        results,
-        ax,
-        num_vms=num_vms,
-        num_tasks=num_tasks,
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_elastic_makespan")
-
-    # ----------
-    # Plot 2: percentage of idle vCPUs
-    # ----------
+    jobs = [
+        # Plot 1: makespan
+        FigureJob(
+            "makespan_elastic_makespan",
+            plot_elastic_results,
+            [("makespan", {"num_vms": num_vms, "num_tasks": num_tasks})],
+            MAKESPAN_PLOTS_DIR,
+        ),
+        # Plot 2: percentage of idle vCPUs
+        FigureJob(
+            "makespan_elastic_vcpus",
+            plot_elastic_results,
+            [
+                (
+                    "percentage_vcpus",
+                    {
+                        "num_vms": num_vms,
+                        "num_tasks": num_tasks,
+                        "num_cpus_per_vm": num_cpus_per_vm,
+                    },
+                )
+            ],
+            MAKESPAN_PLOTS_DIR,
+            legend={
+                "workload": "omp-elastic",
+                "baselines": ["slurm", "batch", "granny", "granny-elastic"],
+                "loc": "lower center",
+                "ncols": 2,
+                "bbox_to_anchor": (0.56, 0.2),
+            },
+        ),
+        # Plot 3: CDF of the JCT (for one run)
+        FigureJob(
+            "makespan_elastic_cdf_jct",
+            plot_elastic_results,
+            [
+                (
+                    "cdf_jct",
+                    {
+                        "cdf_num_vms": cdf_num_vms,
+                        "cdf_num_tasks": cdf_num_tasks,
+                    },
+                )
+            ],
+            MAKESPAN_PLOTS_DIR,
+        ),
+        # Plot 4: timeseries of % of idle CPU cores
+        FigureJob(
+            "makespan_elastic_ts_vcpus",
+            plot_elastic_results,
+            [
+                (
+                    "ts_vcpus",
+                    {
+                        "timeseries_num_vms": timeseries_num_vms,
+                        "timeseries_num_tasks": timeseries_num_tasks,
+                    },
+                )
+            ],
+            MAKESPAN_PLOTS_DIR,
+        ),
+    ]
 
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
+    render_figures(jobs, results, num_procs=num_procs, force=force)
 
-    plot_elastic_results(
-        "percentage_vcpus",
-        results,
-        ax,
-        num_vms=num_vms,
-        num_tasks=num_tasks,
-        num_cpus_per_vm=num_cpus_per_vm,
-    )
 
-    # Manually craft the legend
-    baselines = ["slurm", "batch", "granny", "granny-elastic"]
-    legend_entries = [
-        Patch(
-            color=get_color_for_baseline("omp-elastic", baseline),
-            label=get_label_for_baseline("omp-elastic", baseline),
-        )
-        for baseline in baselines
-    ]
-    fig.legend(
-        handles=legend_entries,
-        loc="lower center",
-        ncols=2,
-        bbox_to_anchor=(0.56, 0.2),
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_elastic_vcpus")
-
-    # ----------
-    # Plot 3: CDF of the JCT (for one run)
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_elastic_results(
-        "cdf_jct",
-        results,
-        ax,
-        cdf_num_vms=cdf_num_vms,
-        cdf_num_tasks=cdf_num_tasks,
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_elastic_cdf_jct")
-
-    # ----------
-    # Plot 4: timeseries of % of idle CPU cores
-    # ----------
-
-    fig, ax = subplots(figsize=DOUBLE_COL_FIGSIZE_THIRD)
-
-    plot_elastic_results(
-        "ts_vcpus",
-        results,
-        ax,
-        timeseries_num_vms=timeseries_num_vms,
-        timeseries_num_tasks=timeseries_num_tasks,
-    )
-
-    save_plot(fig, MAKESPAN_PLOTS_DIR, "makespan_elastic_ts_vcpus")
+@task
+def clear_cache(ctx):
+    """
+    Remove the cached (parsed) results used to speed-up re-plotting
+    """
+    clear_results_cache()
@@ -7,19 +7,21 @@ from tasks.makespan.scheduler import (
     BatchScheduler,
 )
 from tasks.util.env import RESULTS_DIR
+from tasks.util.fragmentation import AdmissionPolicy
 from tasks.util.makespan import (
     ALLOWED_BASELINES,
     EXEC_TASK_INFO_FILE_PREFIX,
     GRANNY_BASELINES,
     IDLE_CORES_FILE_PREFIX,
     MAKESPAN_FILE_PREFIX,
-    NATIVE_BASELINES,
     init_csv_file,
+    init_idle_cores_csv_file,
     get_idle_core_count_from_task_info,
     get_num_cpus_per_vm_from_trace,
     get_num_tasks_from_trace,
     get_trace_from_parameters,
     get_workload_from_trace,
+    register_results_in_catalog,
     write_line_to_csv,
 )
 from tasks.util.trace import load_task_trace_from_file
@@ -59,6 +61,10 @@ def granny(
     elastic=False,
     # Mandatory flag for the mpi-evict workload (not in the paper)
     num_users=None,
+    # Optional admission policy knobs for the mpi-locality workload
+    admission_slack=None,
+    admission_max_extra_vms=None,
+    admission_max_ext_frag=None,
 ):
     """
     Run: `inv makespan.run.granny --workload [mpi-migrate,mpi-spot,omp-elastic]
@@ -85,9 +91,35 @@ def granny(
             migrate
         ), "mpi-locality for granny can only be run with --migrate!"
 
+    admission_policy = None
+    if any(
+        [
+            knob is not None
+            for knob in [
+                admission_slack,
+                admission_max_extra_vms,
+                admission_max_ext_frag,
+            ]
+        ]
+    ):
+        assert (
+            workload == "mpi-locality"
+        ), "--admission-* flags should only be used with mpi-locality!"
+        admission_policy = AdmissionPolicy()
+        if admission_slack is not None:
+            admission_policy.slack_pctg = float(admission_slack)
+        if admission_max_extra_vms is not None:
+            admission_policy.max_extra_vms = int(admission_max_extra_vms)
+        if admission_max_ext_frag is not None:
+            admission_policy.max_external_fragmentation = float(
+                admission_max_ext_frag
+            )
+
     workload = _validate_workload(workload)
     trace = get_trace_from_parameters(workload, num_tasks, num_cpus_per_vm)
-    _do_run(baseline, num_vms, trace, num_users)
+    _do_run(
+        baseline, num_vms, trace, num_users, admission_policy=admission_policy
+    )
 
 
 @task()
@@ -155,7 +187,7 @@ def native_batch(
     )
 
 
-def _do_run(baseline, num_vms, trace, num_users):
+def _do_run(baseline, num_vms, trace, num_users, admission_policy=None):
     num_vms = int(num_vms)
     job_workload = get_workload_from_trace(trace)
     num_tasks = get_num_tasks_from_trace(trace)
@@ -193,6 +225,7 @@ def _do_run(baseline, num_vms, trace, num_users):
         num_vms,
         num_tasks_per_user,
         trace,
+        admission_policy=admission_policy,
     )
 
     if job_workload == "mpi-evict":
@@ -214,7 +247,7 @@ def _do_run(baseline, num_vms, trace, num_users):
     )
 
     start_ts = time()
-    executed_task_info = scheduler.run(baseline, task_trace)
+    scheduler.run(baseline, task_trace)
     makespan_secs = time() - start_ts
 
     # First of all, record the makespan (the total time elapsed)
@@ -227,29 +260,15 @@ def _do_run(baseline, num_vms, trace, num_users):
         makespan_secs,
     )
 
-    # For granny we get the idle cores as we run the experiment, from the
-    # planner (also, for the moment, we do not need these results for mpi-evict)
-    if baseline in NATIVE_BASELINES and job_workload != "mpi-evict":
-        num_idle_cores_per_time_step = get_idle_core_count_from_task_info(
-            baseline,
-            executed_task_info,
-            task_trace,
-            num_vms,
-            num_cpus_per_vm,
-        )
-        for time_step in num_idle_cores_per_time_step:
-            write_line_to_csv(
-                baseline,
-                IDLE_CORES_FILE_PREFIX,
-                num_vms,
-                None,
-                trace,
-                time_step,
-                num_idle_cores_per_time_step[time_step],
-            )
+    # The idle cores (and all other occupancy metrics) are recorded online,
+    # as we run the experiment, for all baselines. To re-construct them
+    # post-mortem from the executed task info use `idle_cores_from_exec_task`
 
-    # Finally shutdown the scheduler
+    # Finally shutdown the scheduler, and index the results
     scheduler.shutdown()
+    register_results_in_catalog(
+        baseline, num_vms, trace, num_tasks_per_user=num_tasks_per_user
+    )
 
 
 @task()
@@ -310,12 +329,16 @@ def idle_cores_from_exec_task(
         num_cpus_per_vm,
         granny,
     )
+    init_idle_cores_csv_file(baseline, num_vms, trace)
     for time_step in num_idle_cores_per_time_step:
         write_line_to_csv(
             baseline,
             IDLE_CORES_FILE_PREFIX,
             num_vms,
+            None,
             trace,
             time_step,
             num_idle_cores_per_time_step[time_step],
         )
+
+    register_results_in_catalog(baseline, num_vms, trace)
@@ -36,6 +36,11 @@ from tasks.util.faasm import (
     has_app_failed,
     post_async_msg_and_get_result_json,
 )
+from tasks.util.fragmentation import (
+    AdmissionPolicy,
+    get_fragmentation_metrics,
+    get_free_slots_per_host,
+)
 from tasks.util.kernels import get_openmp_kernel_cmdline
 from tasks.util.k8s import wait_for_pods as wait_for_native_mpi_pods
 from tasks.util.lammps import (
@@ -53,6 +58,7 @@ from tasks.util.lammps import (
 from tasks.util.makespan import (
     ALLOWED_BASELINES,
     EXEC_TASK_INFO_FILE_PREFIX,
+    FRAGMENTATION_INFO_FILE_PREFIX,
     GRANNY_BASELINES,
     GRANNY_BATCH_BASELINES,
     GRANNY_ELASTIC_BASELINES,
@@ -62,13 +68,21 @@ from tasks.util.makespan import (
     MPI_WORKLOADS,
     NATIVE_BASELINES,
     NATIVE_FT_BASELINES,
+    OCCUPANCY_INFO_FILE_PREFIX,
     OPENMP_WORKLOADS,
     SCHEDULING_INFO_FILE_PREFIX,
+    SPOT_FAULT_INJECTION_PERIOD_SECS,
+    SPOT_HOST_GRACE_PERIOD_SECS,
     get_num_cpus_per_vm_from_trace,
+    get_num_spot_faults,
     get_user_id_from_task,
     get_workload_from_trace,
     write_line_to_csv,
 )
+from tasks.util.occupancy import (
+    get_occupancy_matrix_from_in_flight_apps,
+    get_occupancy_metrics,
+)
 from tasks.util.openmpi import (
     get_native_mpi_namespace,
     get_native_mpi_pods,
@@ -77,8 +91,7 @@ from tasks.util.openmpi import (
 )
 from tasks.util.planner import (
     get_num_available_slots_from_in_flight_apps,
-    get_num_idle_cpus_from_in_flight_apps,
-    get_num_xvm_links_from_in_flight_apps,
+    get_xvm_links_from_part,
 )
 from time import sleep, time
 
@@ -194,6 +207,55 @@ def dequeue_with_timeout(
     return result
 
 
+def write_occupancy_metrics_to_csv(
+    baseline: str,
+    num_vms: int,
+    num_cpus_per_vm: int,
+    num_tasks_per_user: int,
+    trace_str: str,
+    ts: float,
+    num_idle_vms: int,
+    num_idle_cpus: int,
+    num_xvm_links: int,
+    free_slots_per_host,
+) -> None:
+    """
+    Record a snapshot of the cluster occupancy and fragmentation at time
+    `ts`. For Granny we get the snapshot from the planner, and for the native
+    baselines we keep it in the scheduler state, but both are recorded in the
+    same format
+    """
+    write_line_to_csv(
+        baseline,
+        SCHEDULING_INFO_FILE_PREFIX
+        if baseline in GRANNY_BASELINES
+        else OCCUPANCY_INFO_FILE_PREFIX,
+        num_vms,
+        num_tasks_per_user,
+        trace_str,
+        ts,
+        int(num_idle_vms),
+        int(num_idle_cpus),
+        int(num_xvm_links),
+    )
+
+    frag_metrics = get_fragmentation_metrics(
+        free_slots_per_host, num_cpus_per_vm
+    )
+    write_line_to_csv(
+        baseline,
+        FRAGMENTATION_INFO_FILE_PREFIX,
+        num_vms,
+        num_tasks_per_user,
+        trace_str,
+        ts,
+        int(frag_metrics["largest_placeable_job"]),
+        int(frag_metrics["largest_local_job"]),
+        float(frag_metrics["external_fragmentation"]),
+        float(frag_metrics["free_slot_scatter"]),
+    )
+
+
 def thread_pool_thread(
     work_queue: Queue,
     result_queue: Queue,
@@ -222,11 +284,14 @@ def thread_pool_thread(
         while True:
             sleep(PLANNER_MONITOR_RESOLUTION_SECS)
 
+            ts = time()
             in_flight_apps = planner_get_in_fligh_apps()
-            idle_vms, idle_cpus = get_num_idle_cpus_from_in_flight_apps(
-                num_vms,
-                num_cpus_per_vm,
-                in_flight_apps,
+            # Build the occupancy matrix once, and derive all metrics from it
+            occupancy, _ = get_occupancy_matrix_from_in_flight_apps(
+                in_flight_apps
+            )
+            metrics = get_occupancy_metrics(
+                occupancy, num_vms, num_cpus_per_vm
             )
 
             if read_one and len(in_flight_apps.apps) == 0:
@@ -235,16 +300,17 @@ def thread_pool_thread(
             elif len(in_flight_apps.apps) != 0:
                 read_one = True
 
-            write_line_to_csv(
+            write_occupancy_metrics_to_csv(
                 baseline,
-                SCHEDULING_INFO_FILE_PREFIX,
                 num_vms,
+                num_cpus_per_vm,
                 num_tasks_per_user,
                 trace_str,
-                time(),
-                idle_vms,
-                idle_cpus,
-                get_num_xvm_links_from_in_flight_apps(in_flight_apps),
+                ts,
+                metrics["idle_vms"],
+                metrics["idle_cpus"],
+                metrics["xvm_links"],
+                get_free_slots_per_host(occupancy, num_vms, num_cpus_per_vm),
             )
 
     work_queue: WorkQueueItem
@@ -477,6 +543,8 @@ class SchedulerState:
     num_tasks_per_user: int
     # Only for `mpi-spot`, number of faulty VMs
     num_faults: int = 0
+    # Only for `mpi-locality`, policy to admit new tasks (None uses default)
+    admission_policy: AdmissionPolicy = None
 
     # Total accounting of slots
     total_slots: int
@@ -494,6 +562,12 @@ class SchedulerState:
     # of cores assigned to each ip
     in_flight_tasks: Dict[int, List[Tuple[str, int]]] = {}
 
+    # For native baselines, we keep the number of cross-VM links of each
+    # in-flight task (and the total) to record the occupancy metrics as tasks
+    # come and go (for Granny, we get them from the planner)
+    xvm_links_per_task: Dict[int, int] = {}
+    num_xvm_links: int = 0
+
     # Accounting of the executed tasks and their information
     executed_task_info: Dict[int, ExecutedTaskInfo] = {}
     executed_task_count: int = 0
@@ -506,8 +580,10 @@ class SchedulerState:
         num_vms: int,
         num_tasks_per_user: int,
         trace_str: str,
+        admission_policy: AdmissionPolicy = None,
     ):
         self.baseline = baseline
+        self.admission_policy = admission_policy
         self.num_tasks = num_tasks
         self.num_vms = num_vms
         self.num_tasks_per_user = num_tasks_per_user
@@ -518,6 +594,8 @@ class SchedulerState:
         # Work-out total number of slots
         self.total_slots = num_vms * self.num_cpus_per_vm
         self.total_available_slots = self.total_slots
+        self.xvm_links_per_task = {}
+        self.num_xvm_links = 0
 
         # Initialise the pod list depending on the workload
         self.init_vm_list()
@@ -609,6 +687,58 @@ class SchedulerState:
 
         # Remove the task from in-flight
         del self.in_flight_tasks[task_id]
+        if task_id in self.xvm_links_per_task:
+            self.num_xvm_links -= self.xvm_links_per_task.pop(task_id)
+
+    def add_in_flight_task(
+        self,
+        task: TaskObject,
+        scheduling_decision: List[Tuple[str, int]],
+        ts: float,
+    ) -> None:
+        self.in_flight_tasks[task.task_id] = scheduling_decision
+
+        if self.baseline in NATIVE_BASELINES:
+            # The batch baseline allocates whole VMs, but only runs as many
+            # processes as the task's size, filling the VMs in order
+            procs_per_vm = []
+            left_to_assign = task.size
+            for _, slots in scheduling_decision:
+                procs_per_vm.append(min(slots, left_to_assign))
+                left_to_assign -= procs_per_vm[-1]
+
+            num_xvm_links = get_xvm_links_from_part(procs_per_vm)
+            self.xvm_links_per_task[task.task_id] = num_xvm_links
+            self.num_xvm_links += num_xvm_links
+            self.record_occupancy_metrics(ts)
+
+    def record_occupancy_metrics(self, ts: float) -> None:
+        """
+        Record the occupancy metrics for native baselines from the scheduler
+        state. We call it every time the state changes, with the time of the
+        event that changed it (i.e. when we allocate or release the slots)
+        """
+        if self.baseline not in NATIVE_BASELINES:
+            return
+
+        free_slots_per_host = list(self.vm_map.values())
+        write_occupancy_metrics_to_csv(
+            self.baseline,
+            self.num_vms,
+            self.num_cpus_per_vm,
+            self.num_tasks_per_user,
+            self.trace_str,
+            ts,
+            sum(
+                [
+                    free_slots == self.num_cpus_per_vm
+                    for free_slots in free_slots_per_host
+                ]
+            ),
+            self.total_available_slots,
+            self.num_xvm_links,
+            free_slots_per_host,
+        )
 
     def get_next_task(self, tasks):
         for task in tasks:
@@ -739,6 +869,11 @@ class SchedulerState:
         # allocation, we need to update the list of IPs and VM map
         if self.baseline in NATIVE_BASELINES:
             self.update_vm_list()
+            # The slots are free from the moment the task finishes, not from
+            # the moment we process its result
+            self.record_occupancy_metrics(
+                time() if has_task_failed(result) else result.end_ts
+            )
 
 
 class BatchScheduler:
@@ -756,6 +891,7 @@ class BatchScheduler:
         num_vms: int,
         num_tasks_per_user: int,
         trace_str: str,
+        admission_policy: AdmissionPolicy = None,
     ):
         self.state = SchedulerState(
             baseline,
@@ -763,6 +899,7 @@ class BatchScheduler:
             num_vms,
             num_tasks_per_user,
             trace_str,
+            admission_policy=admission_policy,
         )
 
         print("Initialised batch scheduler with the following parameters:")
@@ -803,12 +940,8 @@ class BatchScheduler:
 
         # Start the fault injection daemon for the appropriate workloads
         if self.state.workload == "mpi-spot" and baseline in ALL_FT_BASELINES:
-            # How often we notify a host that it will be evicted
-            fault_injection_period_secs = 60
-            # What grace period do we give hosts after notifying their eviction
-            host_grace_period_secs = 60
             # How many faults we are injecting
-            num_faults = int(num_vms / 4)
+            num_faults = get_num_spot_faults(num_vms)
             self.state.num_faults = num_faults
 
             self.fault_injection_daemon = Process(
@@ -817,8 +950,8 @@ class BatchScheduler:
                 args=(
                     baseline,
                     self.state.num_vms,
-                    fault_injection_period_secs,
-                    host_grace_period_secs,
+                    SPOT_FAULT_INJECTION_PERIOD_SECS,
+                    SPOT_HOST_GRACE_PERIOD_SECS,
                     num_faults,
                 ),
             )
@@ -945,6 +1078,7 @@ class BatchScheduler:
                         self.state.num_vms,
                         self.state.num_cpus_per_vm,
                         next_task_size=task.size,
+                        admission_policy=self.state.admission_policy,
                     )
                     >= task.size
                 )
@@ -1054,7 +1188,7 @@ class BatchScheduler:
                 )
 
         # Before returning, persist the scheduling decision to state
-        self.state.in_flight_tasks[task.task_id] = scheduling_decision
+        self.state.add_in_flight_task(task, scheduling_decision, time())
 
         return scheduling_decision
 
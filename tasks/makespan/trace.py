@@ -1,15 +1,34 @@
+from dataclasses import asdict
 from invoke import task
-from numpy import arange
-from numpy.random import default_rng
-from random import uniform
-from tasks.makespan.data import TaskObject
-from tasks.util.makespan import MPI_WORKLOADS
-from tasks.util.trace import dump_task_trace_to_file
-from typing import List
+from os.path import exists, join
+from tasks.util.swf import (
+    get_machine_size_from_swf_header,
+    read_swf_jobs,
+    rescale_swf_jobs,
+)
+from tasks.util.trace import (
+    convert_csv_trace_to_binary,
+    dump_task_trace_arrays_to_binary_file,
+    dump_task_trace_arrays_to_file,
+    MAKESPAN_TRACES_DIR,
+    generate_task_trace_arrays,
+    get_trace_config,
+    get_trace_file_name,
+    update_trace_config_from_file,
+)
 
 
 @task()
-def generate(ctx, workload, num_tasks, num_cores_per_vm=8, lmbd="0.1"):
+def generate(
+    ctx,
+    workload,
+    num_tasks,
+    num_cores_per_vm=8,
+    lmbd="0.1",
+    seed=None,
+    config=None,
+    binary=False,
+):
     """
     A trace is a set of tasks where each task is identified by:
     - An arrival time sampled from a Poisson distribution with parameter lambda
@@ -20,59 +39,119 @@ def generate(ctx, workload, num_tasks, num_cores_per_vm=8, lmbd="0.1"):
     record the time it takes for the task to be arrive wrt the previous task.
     We use that if arrival times are a Possion(lambda), then inter-arrival
     times are an exponential with parameter 1/lambda.
+
+    Pass a --seed to make the trace reproducible, and a --config JSON file to
+    override any of the distribution parameters in
+    tasks.util.trace.TraceConfig (e.g. workload mix, or size ranges).
+
+    With --binary, we also write the trace in the columnar binary format,
+    which is what we should use for very large traces
     """
     num_tasks = int(num_tasks)
     num_cores_per_vm = int(num_cores_per_vm)
-    lmbd = float(lmbd)
-
-    # Work out the possible number of cores per VM
-    # possible_mpi_sizes = arange(2, int(num_cores_per_vm * 2))
-    if workload == "mpi-evict" or workload == "mpi-spot":
-        possible_mpi_sizes = arange(4, int(num_cores_per_vm * 2))
-    else:
-        possible_mpi_sizes = arange(2, int(num_cores_per_vm * 2))
-    possible_omp_sizes = arange(1, num_cores_per_vm)
-
-    # The lambda parameter regulates how frequently new tasks arrive. If we
-    # make lambda smaller, then tasks will be more far apart. Formally, the
-    # lambda parameter is the inverse of the expected inter-arrival time
+
     # lmbd = 0.1 is fine for 4 VMs w/ 4 cores per VM
-    exp_mean = 1 / lmbd
-    rng = default_rng()
-    inter_arrival_times = [
-        int(i) for i in rng.exponential(exp_mean, int(num_tasks) - 1)
-    ]
-    inter_arrival_times.insert(0, 0)
-
-    # Work out the possible different workloads
-    if workload == "mpi-locality":
-        possible_workloads = ["mpi-locality"]
-    elif workload == "mpi-evict":
-        possible_workloads = ["mpi-migrate"]
-    elif workload == "mpi-spot":
-        possible_workloads = ["mpi-migrate"]
-    elif workload == "omp-elastic":
-        possible_workloads = ["omp"]
-    else:
-        raise RuntimeError("Unrecognised workload: {}".format(workload))
-
-    # Generate the random task trace
-    task_trace: List[TaskObject] = []
-    num_pos_wl = len(possible_workloads)
-    for idx in range(num_tasks):
-        wl_idx = int(uniform(0, num_pos_wl))
-        if possible_workloads[wl_idx] in MPI_WORKLOADS:
-            possible_sizes = possible_mpi_sizes
-        elif possible_workloads[wl_idx] == "omp":
-            possible_sizes = possible_omp_sizes
-        ws_idx = int(uniform(0, len(possible_sizes)))
-        task_trace.append(
-            TaskObject(
-                idx,
-                possible_workloads[wl_idx],
-                possible_sizes[ws_idx],
-                inter_arrival_times[idx],
+    trace_config = get_trace_config(
+        workload,
+        num_cores_per_vm,
+        lmbd=float(lmbd),
+        seed=None if seed is None else int(seed),
+    )
+    if config is not None:
+        trace_config = update_trace_config_from_file(trace_config, config)
+
+    trace_arrays = generate_task_trace_arrays(trace_config, num_tasks)
+    dump_task_trace_arrays_to_file(
+        trace_arrays, workload, num_tasks, num_cores_per_vm
+    )
+    if binary:
+        dump_task_trace_arrays_to_binary_file(
+            trace_arrays,
+            workload,
+            num_tasks,
+            num_cores_per_vm,
+            params=asdict(trace_config),
+        )
+
+
+@task()
+def to_binary(ctx, workload, num_tasks, num_cores_per_vm=8):
+    """
+    Convert an existing CSV trace to the columnar binary format
+    """
+    convert_csv_trace_to_binary(
+        workload, int(num_tasks), int(num_cores_per_vm)
+    )
+
+
+@task()
+def from_swf(
+    ctx,
+    swf_file,
+    workload,
+    num_vms,
+    num_tasks=None,
+    num_cores_per_vm=8,
+    skip_tasks=0,
+    target_load=None,
+    machine_size=None,
+    max_size=None,
+    run_time=None,
+    force=False,
+):
+    """
+    Import a trace in the Standard Workload Format (e.g. from the Parallel
+    Workloads Archive) and write it in our trace format
+
+    Job sizes are re-scaled from the original machine's size (read from the
+    SWF header, or --machine-size) to a cluster of --num-vms VMs, and clipped
+    to the workload's size range (or to --max-size). Arrival times are
+    compressed/stretched to match --target-load, if set.
+
+    Note that our tasks run for as long as their app takes, not for the SWF
+    job's run time. The target load is computed with the SWF run times unless
+    you pass our tasks' expected --run-time (in seconds), so it only matches
+    the load the replayed trace offers if you do
+    """
+    num_vms = int(num_vms)
+    num_cores_per_vm = int(num_cores_per_vm)
+
+    header, swf_jobs = read_swf_jobs(
+        swf_file,
+        num_tasks=None if num_tasks is None else int(num_tasks),
+        skip_tasks=int(skip_tasks),
+    )
+    num_tasks = len(swf_jobs["job_id"])
+
+    if machine_size is None:
+        machine_size = get_machine_size_from_swf_header(header)
+    if machine_size is None:
+        raise RuntimeError(
+            "Could not infer machine size from SWF header, please set "
+            "--machine-size"
+        )
+
+    trace_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_trace_file_name(workload, num_tasks, num_cores_per_vm),
+    )
+    if exists(trace_file) and not force:
+        raise RuntimeError(
+            "Trace file {} already exists! Use --force to overwrite".format(
+                trace_file
             )
         )
 
-    dump_task_trace_to_file(task_trace, workload, num_tasks, num_cores_per_vm)
+    trace_arrays = rescale_swf_jobs(
+        swf_jobs,
+        workload,
+        num_vms,
+        num_cores_per_vm,
+        int(machine_size),
+        target_load=None if target_load is None else float(target_load),
+        max_size=None if max_size is None else int(max_size),
+        run_time=None if run_time is None else float(run_time),
+    )
+    dump_task_trace_arrays_to_file(
+        trace_arrays, workload, num_tasks, num_cores_per_vm
+    )
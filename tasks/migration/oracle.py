@@ -6,6 +6,7 @@ from matplotlib.pyplot import subplots
 from os import makedirs
 from os.path import basename, join
 from random import sample
+from tasks.lammps.graph import get_mpi_comm_matrices
 from tasks.migration.util import generate_host_list
 from tasks.util.env import (
     PLOTS_ROOT,
@@ -24,17 +25,21 @@ from tasks.util.lammps import (
     get_lammps_data_file,
     get_lammps_migration_params,
 )
+from tasks.util.mapping import get_contiguous_mapping
+from tasks.util.partition import sample_partitions
+from tasks.util.placement_model import fit_placement_model
+from tasks.util.planner import get_link_cost_from_part, get_xvm_links_from_part
 from tasks.util.plot import save_plot
+from tasks.util.topology import load_topology
+from tasks.util.traffic import (
+    get_lammps_workload_payload_model,
+    get_traffic_cost_function,
+)
 from time import sleep
 
-
-def partition(number):
-    answer = set()
-    answer.add((number,))
-    for x in range(1, number):
-        for y in partition(number - x):
-            answer.add(tuple(sorted((x,) + y)))
-    return answer
+# Maximum number of partitions we rank (by cross-VM links or network time)
+# before picking the ones we run
+MAX_PARTITIONS_TO_RANK = 1000
 
 
 def calculate_cross_vm_links(part):
@@ -44,21 +49,27 @@ def calculate_cross_vm_links(part):
     The number of cross-VM links is the sum for each process of all the
     non-local processes divided by two.
     """
-    if len(part) == 1:
-        return 0
-
-    count = 0
-    for ind in range(len(part)):
-        count += sum(part[0:ind] + part[ind + 1 :]) * part[ind]
-
-    return int(count / 2)
+    return get_xvm_links_from_part(part)
 
 
 @task()
-def run(ctx, workload="very-network", nprocs=None):
+def run(
+    ctx, workload="very-network", nprocs=None, exec_graph=None, topology=None
+):
     """
     Experiment to measure the benefits of migration in isolation
+
+    Optionally, pass the path to an execution graph (in JSON) of a previous
+    LAMMPS run to rank the partitions we explore by their estimated network
+    time, rather than by their number of cross-VM links (for runs with the
+    same number of processes as the graph)
+
+    Optionally, pass the path to a topology (in JSON, see
+    `tasks.util.topology.load_topology`) to rank the partitions by the cost
+    of their links, penalising those that cross racks or zones
     """
+    topology = load_topology(topology)
+
     # Work out the number of processes to run with
     num_procs = [2, 3, 4, 5, 6, 7, 8]  # , 9, 10, 11, 12, 13, 14, 15, 16]
     num_cpus_per_vm = 8
@@ -68,6 +79,15 @@ def run(ctx, workload="very-network", nprocs=None):
 
     workload_config = LAMMPS_SIM_WORKLOAD_CONFIGS[workload]
 
+    network_time_world_size = None
+    if exec_graph is not None:
+        with open(exec_graph, "r") as fh:
+            comm_matrices = get_mpi_comm_matrices(fh.read())
+        network_time_world_size = comm_matrices["world_size"]
+        get_network_time = get_traffic_cost_function(
+            comm_matrices, get_lammps_workload_payload_model(workload)
+        )
+
     makedirs(RESULTS_DIR, exist_ok=True)
     result_dir = join(RESULTS_DIR, "migration")
     makedirs(result_dir, exist_ok=True)
@@ -88,18 +108,30 @@ def run(ctx, workload="very-network", nprocs=None):
         with open(result_file, "w") as out_file:
             out_file.write("Partition,CrossVMLinks,Time\n")
 
-        partitions = partition(n_proc)
+        # Rank (at most) MAX_PARTITIONS_TO_RANK partitions, sampled
+        # uniformly if there are more, so that large world sizes are feasible
+        partitions = sample_partitions(
+            n_proc,
+            MAX_PARTITIONS_TO_RANK,
+            max_part=num_cpus_per_vm,
+            max_parts=num_vms,
+        )
 
         # Prune the number of partitions we will explore to a hard cap
         max_num_partitions = 5
-        partitions = [
-            part for part in partitions if max(part) <= num_cpus_per_vm
-        ]
         if len(partitions) > max_num_partitions:
-            links = [
-                (ind, calculate_cross_vm_links(p))
-                for ind, p in enumerate(partitions)
-            ]
+            if n_proc == network_time_world_size:
+                # Ranks are placed contiguously (see `generate_host_list`)
+                links = [
+                    (ind, get_network_time(get_contiguous_mapping(n_proc, p)))
+                    for ind, p in enumerate(partitions)
+                ]
+            else:
+                # Part i runs in host i (see `generate_host_list`)
+                links = [
+                    (ind, get_link_cost_from_part(p, topology))
+                    for ind, p in enumerate(partitions)
+                ]
             links = sorted(links, key=lambda x: x[1])
             sampled_links = (
                 [links[0]]
@@ -217,3 +249,13 @@ def plot(ctx, workload="very-network"):
         join(PLOTS_ROOT, "migration"),
         "migration_oracle_{}".format(workload),
     )
+
+    # Print the placement model we fit from these results
+    model = fit_placement_model(workload)
+    print(
+        "Placement model for workload {} ({} samples, RMSE: {:.2f} s):".format(
+            workload, model["num-samples"], model["rmse"]
+        )
+    )
+    for feature, coeff in model["coeffs"].items():
+        print("\t{}: {:.4f}".format(feature, coeff))
@@ -2,11 +2,12 @@ from glob import glob
 from invoke import task
 from matplotlib.pyplot import hlines, subplots
 from numpy import arange
-from os.path import join
-from pandas import read_csv
+from os.path import basename, join
 from tasks.util.env import PROJ_ROOT
 from tasks.util.migration import MIGRATION_PLOTS_DIR
 from tasks.util.plot import UBENCH_PLOT_COLORS, save_plot
+from tasks.util.results_store import query_runs, sync_csv_results
+from tasks.util.stats import summarise_by
 
 
 ALL_WORKLOADS = [
@@ -20,23 +21,33 @@ ALL_WORKLOADS = [
 
 def _read_results():
     results_dir = join(PROJ_ROOT, "results", "migration")
-    result_dict = {}
 
+    # Import any results not recorded in the results store yet
     for csv in glob(join(results_dir, "migration_*.csv")):
-        workload = csv.split("_")[-1].split(".")[0]
+        sync_csv_results(
+            csv,
+            "migration",
+            "granny",
+            ["Time"],
+            workload=basename(csv)[len("migration_") : -len(".csv")],
+            size_col="WorldSize",
+        )
+
+    result_dict = {}
+    runs = query_runs("migration")
+    for workload, wload_runs in runs.groupby("workload"):
         if workload not in ALL_WORKLOADS:
             continue
 
-        results = read_csv(csv)
-        groupped_results = results.groupby("Check", as_index=False)
-
-        if workload not in result_dict:
-            result_dict[workload] = {}
-
+        # Parameters are stored as strings
+        wload_runs = wload_runs.astype({"Check": int})
+        summaries = summarise_by(wload_runs, "Check", "Time")
+        checks = sorted(summaries.keys())
         result_dict[workload] = {
-            "checks": groupped_results.mean()["Check"].to_list(),
-            "mean": groupped_results.mean()["Time"].to_list(),
-            "sem": groupped_results.sem()["Time"].to_list(),
+            "checks": checks,
+            "mean": [summaries[check]["mean"] for check in checks],
+            "sem": [summaries[check]["sem"] for check in checks],
+            "ci": [summaries[check]["mean-ci"] for check in checks],
         }
 
     return result_dict
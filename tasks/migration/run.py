@@ -10,9 +10,11 @@ from tasks.util.env import (
     RESULTS_DIR,
 )
 from tasks.util.faasm import (
+    get_faasm_exec_hosts_from_json,
     get_faasm_exec_time_from_json,
     post_async_msg_and_get_result_json,
 )
+from tasks.util.harness import run_benchmark
 from tasks.util.lammps import (
     LAMMPS_FAASM_USER,
     LAMMPS_FAASM_MIGRATION_NET_FUNC,
@@ -21,7 +23,7 @@ from tasks.util.lammps import (
     get_lammps_data_file,
     get_lammps_migration_params,
 )
-from time import sleep
+from tasks.util.results_store import init_results, record_run
 
 
 def _init_csv_file(csv_name):
@@ -33,10 +35,14 @@ def _init_csv_file(csv_name):
     with open(result_file, "w") as out_file:
         out_file.write("WorldSize,Check,Run,Time\n")
 
+    init_results(result_file)
+
     return result_file
 
 
-def _write_csv_line(csv_name, nprocs, check, run_num, actual_time):
+def _write_csv_line(
+    csv_name, workload, nprocs, check, run_num, actual_time, params=None
+):
     result_dir = join(RESULTS_DIR, "migration")
     result_file = join(result_dir, csv_name)
     with open(result_file, "a") as out_file:
@@ -44,9 +50,28 @@ def _write_csv_line(csv_name, nprocs, check, run_num, actual_time):
             "{},{},{},{:.2f}\n".format(nprocs, check, run_num, actual_time)
         )
 
+    record_run(
+        "migration",
+        "granny",
+        {"Time": round(actual_time, 2)},
+        workload=workload,
+        size=nprocs,
+        params={"Check": check, "Run": run_num, **(params or {})},
+        source=result_file,
+    )
+
 
 @task(default=True, iterable=["w"])
-def run(ctx, w, check_in=None, repeats=1, num_cores_per_vm=8):
+def run(
+    ctx,
+    w,
+    check_in=None,
+    repeats=1,
+    num_cores_per_vm=8,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=0,
+):
     """
     Run migration experiment
     """
@@ -80,16 +105,9 @@ def run(ctx, w, check_in=None, repeats=1, num_cores_per_vm=8):
         _init_csv_file(csv_name)
 
         for check in check_array:
-            for run_num in range(repeats):
-                reset_planner(num_vms)
 
-                # Print progress
-                print(
-                    "Running migration micro-benchmark (wload: "
-                    + "{} - check-at: {} - repeat: {}/{})".format(
-                        workload, check, run_num + 1, repeats
-                    )
-                )
+            def _run():
+                reset_planner(num_vms)
 
                 if workload == "all-to-all":
                     num_loops = 100000
@@ -136,8 +154,25 @@ def run(ctx, w, check_in=None, repeats=1, num_cores_per_vm=8):
                     msg, host_list=host_list
                 )
                 actual_time = get_faasm_exec_time_from_json(result_json)
-                _write_csv_line(
-                    csv_name, num_cores_per_vm, check, run_num, actual_time
-                )
-
-                sleep(2)
+                return actual_time, get_faasm_exec_hosts_from_json(result_json)
+
+            run_benchmark(
+                _run,
+                lambda run_num, actual_time, params: _write_csv_line(
+                    csv_name,
+                    workload,
+                    num_cores_per_vm,
+                    check,
+                    run_num,
+                    actual_time,
+                    params,
+                ),
+                repeats=repeats,
+                max_repeats=max_repeats,
+                num_warmup_runs=warmup_runs,
+                time_budget=time_budget,
+                sleep_secs=2,
+                label="migration micro-benchmark (wload: {} - check-at: {})".format(
+                    workload, check
+                ),
+            )
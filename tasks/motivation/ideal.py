@@ -6,6 +6,7 @@ from os import makedirs
 from os.path import join
 from pandas import read_csv
 from random import randint
+from tasks.util.design import PartitionDesign
 from tasks.util.env import PLOTS_ROOT, RESULTS_DIR
 from tasks.util.lammps import (
     LAMMPS_DOCKER_BINARY,
@@ -13,6 +14,8 @@ from tasks.util.lammps import (
     get_lammps_data_file,
 )
 from tasks.util.openmpi import get_native_mpi_pods, run_kubectl_cmd
+from tasks.util.partition import iter_partitions
+from tasks.util.planner import get_xvm_links_from_part
 from time import time
 
 
@@ -23,50 +26,31 @@ def _init_csv_file(csv_name):
     result_file = join(result_dir, csv_name)
     makedirs(RESULTS_DIR, exist_ok=True)
     with open(result_file, "w") as out_file:
-        out_file.write("Size,CrossVMLinks,ExecutionTimeSecs\n")
+        out_file.write("Size,CrossVMLinks,ExecutionTimeSecs,Partition\n")
 
     return result_file
 
 
-def _write_csv_line(csv_name, size, num_links, exec_time):
+def _write_csv_line(csv_name, size, num_links, exec_time, partition):
     result_dir = join(RESULTS_DIR, "motivation")
     result_file = join(result_dir, csv_name)
     with open(result_file, "a") as out_file:
-        out_file.write("{},{},{:.2f}\n".format(size, num_links, exec_time))
-
-
-def partition(number):
-    """
-    Given a whole number, find all its partitions (equivalently, these are all
-    the ways an application can be deployed)
-    """
-    answer = set()
-    answer.add((number,))
-    for x in range(1, number):
-        for y in partition(number - x):
-            to_add = tuple(sorted((x,) + y))
-            if max(to_add) > 8:
-                continue
-            answer.add(to_add)
-
-    return answer
+        out_file.write(
+            "{},{},{:.2f},{}\n".format(
+                size,
+                num_links,
+                exec_time,
+                "-".join([str(p) for p in partition]),
+            )
+        )
 
 
 def vm_links_from_partition(partition):
     """
     Given a partition of an application, return the number of cross-VM links
+    (the same as everywhere else, see `tasks.util.topology`)
     """
-    # If we are deployed in one single node, the number of links is 0
-    if len(partition) == 1:
-        return 0
-
-    # Otherwise, the number of links is the product of the number of processes
-    # in each VM
-    links = partition[0]
-    for i in range(1, len(partition)):
-        links = links * partition[i]
-
-    return links
+    return get_xvm_links_from_part(partition)
 
 
 def do_single_run(vm_names, vm_ips, size, partition):
@@ -117,7 +101,13 @@ def do_single_run(vm_names, vm_ips, size, partition):
 
 
 @task()
-def run(ctx, size=None):
+def run(ctx, size=None, adaptive=False, max_runs=None):
+    """
+    Run LAMMPS with every partition of each size across VMs. With
+    `--adaptive`, only run the partitions we need to fit the execution time
+    vs cross-VM links model with a tight confidence interval (see
+    `tasks.util.design`), up to `--max-runs` per size
+    """
     vm_names, vm_ips = get_native_mpi_pods("lammps")
     assert len(vm_ips) == 16
 
@@ -131,15 +121,46 @@ def run(ctx, size=None):
         csv_name = "ideal_crossvm_times_{}.csv".format(sz)
         _init_csv_file(csv_name)
 
-        size_permutations = partition(sz)
-        for size_permutation in size_permutations:
+        size_permutations = iter_partitions(sz, max_part=8)
+        if not adaptive:
+            for size_permutation in size_permutations:
+                exec_time = do_single_run(
+                    vm_names, vm_ips, sz, size_permutation
+                )
+                _write_csv_line(
+                    csv_name,
+                    sz,
+                    vm_links_from_partition(size_permutation),
+                    exec_time,
+                    size_permutation,
+                )
+            continue
+
+        design = PartitionDesign(
+            size_permutations,
+            get_links=vm_links_from_partition,
+            max_runs=None if max_runs is None else int(max_runs),
+        )
+        while True:
+            size_permutation = design.next_partition()
+            if size_permutation is None:
+                break
+
             exec_time = do_single_run(vm_names, vm_ips, sz, size_permutation)
+            design.add_result(size_permutation, exec_time)
             _write_csv_line(
                 csv_name,
                 sz,
                 vm_links_from_partition(size_permutation),
                 exec_time,
+                size_permutation,
+            )
+
+        print(
+            "Ran {}/{} partitions for size {}".format(
+                len(design.run_idxs), len(design.partitions), sz
             )
+        )
 
 
 @task
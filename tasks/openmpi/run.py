@@ -17,7 +17,9 @@ from tasks.util.lammps import (
     get_lammps_migration_params,
 )
 from tasks.util.openmpi import OPENMPI_RESULTS_DIR
+from tasks.util.partition import iter_partitions
 from tasks.util.planner import get_xvm_links_from_part
+from tasks.util.results_store import init_results, record_run
 from time import sleep, time
 
 # Parameters tuning the experiment runs
@@ -31,14 +33,26 @@ def init_csv_file(csv_name):
     with open(result_file, "w") as out_file:
         out_file.write("Part,CrossVmLinks,Time\n")
 
+    init_results(result_file)
+
     return result_file
 
 
-def write_csv_line(csv_name, part, xvm_links, actual_time):
+def write_csv_line(csv_name, baseline, part, xvm_links, actual_time):
     result_file = join(OPENMPI_RESULTS_DIR, csv_name)
     with open(result_file, "a") as out_file:
         out_file.write("{},{},{:.2f}\n".format(part, xvm_links, actual_time))
 
+    record_run(
+        "openmpi",
+        baseline,
+        {"Time": round(actual_time, 2)},
+        workload="oracle",
+        size=get_nproc_from_part(part),
+        params={"Part": part, "CrossVmLinks": xvm_links},
+        source=result_file,
+    )
+
 
 def get_native_host_list_from_part(part):
     """
@@ -94,15 +108,6 @@ def get_nproc_from_part(part):
     return nproc
 
 
-def partition(number):
-    answer = set()
-    answer.add((number,))
-    for x in range(1, number):
-        for y in partition(number - x):
-            answer.add(tuple(sorted((x,) + y)))
-    return answer
-
-
 @task
 def generate_partitions(ctx, max_num_partitions=5):
     all_parts = []
@@ -110,13 +115,13 @@ def generate_partitions(ctx, max_num_partitions=5):
     num_vms = len(ctr_names)
 
     for n_proc in [2, 4, 8]:
-        partitions = partition(n_proc)
+        partitions = list(
+            iter_partitions(
+                n_proc, max_part=NUM_CORES_PER_CTR, max_parts=num_vms
+            )
+        )
 
         # Prune the number of partitions we will explore to a hard cap
-        partitions = [
-            part for part in partitions if max(part) <= NUM_CORES_PER_CTR
-        ]
-        partitions = [part for part in partitions if len(part) <= num_vms]
         if len(partitions) > max_num_partitions:
             links = [
                 (ind, get_xvm_links_from_part(p))
@@ -194,7 +199,8 @@ EXP_CONFIG = {
 
 def do_run(native):
     partitions = load_partitions_from_file()
-    csv_name = "openmpi_oracle_{}.csv".format("native" if native else "granny")
+    baseline = "native" if native else "granny"
+    csv_name = "openmpi_oracle_{}.csv".format(baseline)
     init_csv_file(csv_name)
 
     # A partition is a comma separated list of procs-to-host mapping
@@ -217,7 +223,11 @@ def do_run(native):
         else:
             actual_time = run_wasm(part, conf)
         write_csv_line(
-            csv_name, part, get_xvm_links_from_part(part), actual_time
+            csv_name,
+            baseline,
+            part,
+            get_xvm_links_from_part(part),
+            actual_time,
         )
 
 
@@ -1,34 +1,37 @@
 from glob import glob
 from invoke import task
-from pandas import read_csv as pd_read_csv
 from os import makedirs
-from os.path import join
+from os.path import basename, join
 from tasks.polybench.util import POLYBENCH_FUNCS
 from tasks.util.env import MPL_STYLE_FILE, PLOTS_FORMAT, PLOTS_ROOT, PROJ_ROOT
+from tasks.util.results_store import query_runs, sync_csv_results
+from tasks.util.stats import summarise
 
 import matplotlib.pyplot as plt
 
 
 def _read_results(baseline):
     results_dir = join(PROJ_ROOT, "results", "polybench")
-    result_dict = {}
 
-    for csv in glob(join(results_dir, "polybench_{}_*.csv".format(baseline))):
-        poly_bench = "poly_{}".format(csv.split("_")[-1].split(".")[0])
+    # Import any results not recorded in the results store yet
+    csv_prefix = "polybench_{}_".format(baseline)
+    for csv in glob(join(results_dir, "{}*.csv".format(csv_prefix))):
+        poly_bench = basename(csv)[len(csv_prefix) : -len(".csv")]
         if poly_bench not in POLYBENCH_FUNCS:
             raise RuntimeError(
                 "Unrecognised poly bench: {}".format(poly_bench)
             )
 
-        results = pd_read_csv(csv)
-        result_dict[poly_bench] = {}
-
-        result_dict[poly_bench] = {
-            "mean": results.mean()["Time"],
-            "sem": results.sem()["Time"],
-        }
+        sync_csv_results(
+            csv, "polybench", baseline, ["Time"], workload=poly_bench
+        )
 
-    return result_dict
+    return {
+        poly_bench: summarise(runs["Time"].to_numpy())
+        for poly_bench, runs in query_runs(
+            "polybench", baseline=baseline
+        ).groupby("workload")
+    }
 
 
 def _check_results(native_results, granny_results):
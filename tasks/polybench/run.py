@@ -10,6 +10,7 @@ from tasks.polybench.util import (
 )
 from tasks.util.env import RESULTS_DIR
 from tasks.util.faasm import (
+    get_faasm_exec_hosts_from_json,
     get_faasm_exec_time_from_json,
     # TODO(planner)
     # get_faasm_planner_host_port,
@@ -17,8 +18,10 @@ from tasks.util.faasm import (
     # TODO(planner)
     # wait_for_workers as wait_for_planner_workers,
 )
+from tasks.util.harness import run_benchmark
 from tasks.util.openmpi import get_native_mpi_pods, run_kubectl_cmd
-from time import sleep
+from tasks.util.results_store import init_results, record_run
+from tasks.util.sweep import get_sweep_hosts, run_sweep
 
 NUM_WARMUP_RUNS = 1
 
@@ -36,15 +39,28 @@ def _init_csv_file(csv_name):
     with open(result_file, "w") as out_file:
         out_file.write("Run,Time\n")
 
+    init_results(result_file)
+
     return result_file
 
 
-def _write_csv_line(csv_name, run_num, actual_time):
+def _write_csv_line(
+    csv_name, baseline, bench, run_num, actual_time, params=None
+):
     result_dir = join(RESULTS_DIR, "polybench")
     result_file = join(result_dir, csv_name)
     with open(result_file, "a") as out_file:
         out_file.write("{},{:.5f}\n".format(run_num, actual_time))
 
+    record_run(
+        "polybench",
+        baseline,
+        {"Time": round(actual_time, 5)},
+        workload=bench,
+        params={"Run": run_num, **(params or {})},
+        source=result_file,
+    )
+
 
 def _get_poly_benchmarks(bench):
     if bench:
@@ -61,10 +77,64 @@ def _get_poly_benchmarks(bench):
     return poly_benchmarks
 
 
+def _run_granny_bench(
+    poly_bench, repeats, max_repeats, time_budget, warmup_runs, host
+):
+    """
+    Run one benchmark, in the given host (or wherever the planner schedules
+    it if None)
+    """
+    csv_name = _get_csv_name("granny", poly_bench)
+
+    def _run():
+        msg = {
+            "user": POLYBENCH_USER,
+            "function": poly_bench,
+            "async": True,
+        }
+        result_json = post_async_msg_and_get_result_json(
+            msg, host_list=None if host is None else [host]
+        )
+        actual_time = get_faasm_exec_time_from_json(result_json)
+        print("Actual time: {}".format(actual_time))
+        return actual_time, get_faasm_exec_hosts_from_json(result_json)
+
+    run_benchmark(
+        _run,
+        lambda run_num, actual_time, params: _write_csv_line(
+            csv_name, "granny", poly_bench, run_num, actual_time, params
+        ),
+        repeats=repeats,
+        max_repeats=max_repeats,
+        num_warmup_runs=warmup_runs,
+        time_budget=time_budget,
+        hosts=None if host is None else [host],
+        sleep_secs=2,
+        label="PolyBench ({}) on Granny{}".format(
+            poly_bench, "" if host is None else " in {}".format(host)
+        ),
+    )
+
+
 @task(default=True)
-def granny(ctx, bench=None, repeats=3):
+def granny(
+    ctx,
+    bench=None,
+    repeats=3,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=NUM_WARMUP_RUNS,
+    concurrent=False,
+):
     """
     Run the PolyBench/C microbenchmark with Granny (i.e. WASM)
+
+    We run at least `repeats` times, and, if set, up to `max_repeats` times
+    until the results are stable or we run over `time_budget` seconds, after
+    `warmup_runs` warm-up runs (that we do not record). With
+    `--concurrent`, we run each benchmark in a different host of the
+    cluster, as many at a time as registered hosts, and always with at least
+    one warm-up run (see below)
     """
     reset_planner()
     # TODO(planner): uncomment when planner is upstreamed
@@ -72,33 +142,52 @@ def granny(ctx, bench=None, repeats=3):
 
     poly_benchmarks = _get_poly_benchmarks(bench)
 
+    if concurrent:
+        hosts = get_sweep_hosts()
+        for poly_bench in poly_benchmarks:
+            _init_csv_file(_get_csv_name("granny", poly_bench))
+
+        # Flush the host state once, as other benchmarks may be running.
+        # We can not flush one host at a time, so later benchmarks would run
+        # in hosts warmed up by earlier ones. Instead, we warm each benchmark
+        # up in its own host, so that all of them run warm
+        flush_workers()
+        warmup_runs = max(int(warmup_runs), 1)
+
+        run_sweep(
+            poly_benchmarks,
+            lambda poly_bench, host: _run_granny_bench(
+                poly_bench,
+                repeats,
+                max_repeats,
+                time_budget,
+                warmup_runs,
+                host,
+            ),
+            hosts,
+        )
+        return
+
     for poly_bench in poly_benchmarks:
-        csv_name = _get_csv_name("granny", poly_bench)
-        _init_csv_file(csv_name)
+        _init_csv_file(_get_csv_name("granny", poly_bench))
 
         # First, flush the host state
         flush_workers()
 
-        # Do the repeats + 1 warm-up round
-        for run_num in range(repeats + NUM_WARMUP_RUNS):
-            msg = {
-                "user": POLYBENCH_USER,
-                "function": poly_bench,
-                "async": True,
-            }
-            result_json = post_async_msg_and_get_result_json(msg)
-            actual_time = get_faasm_exec_time_from_json(result_json)
-            if run_num >= NUM_WARMUP_RUNS:
-                _write_csv_line(
-                    csv_name, (run_num - NUM_WARMUP_RUNS), actual_time
-                )
-
-            print("Actual time: {}".format(actual_time))
-            sleep(2)
+        _run_granny_bench(
+            poly_bench, repeats, max_repeats, time_budget, warmup_runs, None
+        )
 
 
 @task
-def native(ctx, bench=None, repeats=3):
+def native(
+    ctx,
+    bench=None,
+    repeats=3,
+    max_repeats=None,
+    time_budget=None,
+    warmup_runs=NUM_WARMUP_RUNS,
+):
     """
     Run the PolyBench/C microbenchmark in nativ eexecution
     """
@@ -111,8 +200,7 @@ def native(ctx, bench=None, repeats=3):
         csv_name = _get_csv_name("native", poly_bench)
         _init_csv_file(csv_name)
 
-        # Do the repeats + 1 warm-up round
-        for run_num in range(repeats + NUM_WARMUP_RUNS):
+        def _run():
             poly_cmd = join(POLYBENCH_NATIVE_DOCKER_BUILD_DIR, poly_bench)
             exec_cmd = [
                 "exec",
@@ -125,11 +213,19 @@ def native(ctx, bench=None, repeats=3):
                 "polybench", " ".join(exec_cmd), capture_stderr=True
             )
             actual_time = float(exec_output)
-
-            if run_num >= NUM_WARMUP_RUNS:
-                _write_csv_line(
-                    csv_name, (run_num - NUM_WARMUP_RUNS), actual_time
-                )
-
             print("Actual time: {}".format(actual_time))
-            sleep(2)
+            return actual_time
+
+        run_benchmark(
+            _run,
+            lambda run_num, actual_time, params: _write_csv_line(
+                csv_name, "native", poly_bench, run_num, actual_time, params
+            ),
+            repeats=repeats,
+            max_repeats=max_repeats,
+            num_warmup_runs=warmup_runs,
+            time_budget=time_budget,
+            hosts=[master_pod],
+            sleep_secs=2,
+            label="PolyBench ({}) natively".format(poly_bench),
+        )
@@ -0,0 +1,286 @@
+from contextlib import closing
+from glob import glob
+from hashlib import sha256
+from numpy import load
+from os import makedirs
+from os.path import basename, exists, getmtime, join
+from sqlite3 import connect
+from tasks.util.env import RESULTS_DIR
+
+"""
+Catalog of the makespan experiment's traces and result files. Every time we
+write a trace or a result file we record its parameters, checksum, and row
+count in an SQLite index, so that readers can find the files they need with
+one query, instead of globbing the results directory and parsing the
+parameters back from the file names.
+"""
+
+CATALOG_FILE = join(RESULTS_DIR, "catalog.db")
+
+# Modification time of each directory when we last back-filled it, so that
+# we only scan it again if files have been added, removed, or renamed
+_INDEXED_DIR_MTIMES = {}
+
+TRACE_KIND = "trace"
+RESULT_KIND = "result"
+
+# Parameters we index files by (all of them may be NULL)
+CATALOG_PARAMS = [
+    "experiment",
+    "prefix",
+    "baseline",
+    "workload",
+    "num_vms",
+    "num_tasks",
+    "num_cpus_per_vm",
+    "num_tasks_per_user",
+]
+
+_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    experiment TEXT,
+    prefix TEXT,
+    baseline TEXT,
+    workload TEXT,
+    num_vms INTEGER,
+    num_tasks INTEGER,
+    num_cpus_per_vm INTEGER,
+    num_tasks_per_user INTEGER,
+    checksum TEXT,
+    num_rows INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS files_by_params ON files (
+    kind, experiment, workload, num_vms, num_tasks, prefix
+);
+"""
+
+
+def _get_connection(catalog_file=CATALOG_FILE):
+    makedirs(RESULTS_DIR, exist_ok=True)
+    conn = connect(catalog_file)
+    conn.executescript(_CATALOG_SCHEMA)
+    return conn
+
+
+def get_file_checksum_and_num_rows(file_path):
+    """
+    Get the SHA256 checksum of a file, and its number of data rows (i.e.
+    number of lines minus the header for CSV files, and number of records
+    for binary .npy files)
+    """
+    is_binary = file_path.endswith(".npy")
+    checksum = sha256()
+    num_lines = 0
+    with open(file_path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            checksum.update(chunk)
+            if not is_binary:
+                num_lines += chunk.count(b"\n")
+
+    if is_binary:
+        # Memory-mapping only reads the array's header
+        return checksum.hexdigest(), len(load(file_path, mmap_mode="r"))
+
+    return checksum.hexdigest(), max(num_lines - 1, 0)
+
+
+def register_file(file_path, kind, catalog_file=CATALOG_FILE, **params):
+    """
+    Record (or update) a file in the catalog with its parameters, checksum,
+    and row count. Call it once the file has been fully written
+    """
+    for key in params:
+        if key not in CATALOG_PARAMS:
+            raise RuntimeError(
+                "Unrecognised catalog parameter: {}".format(key)
+            )
+
+    checksum, num_rows = get_file_checksum_and_num_rows(file_path)
+    row = {key: params.get(key) for key in CATALOG_PARAMS}
+    row["path"] = file_path
+    row["kind"] = kind
+    row["checksum"] = checksum
+    row["num_rows"] = num_rows
+    row["mtime"] = getmtime(file_path)
+
+    columns = list(row.keys())
+    with closing(_get_connection(catalog_file)) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO files ({}) VALUES ({})".format(
+                ",".join(columns), ",".join(["?"] * len(columns))
+            ),
+            [row[col] for col in columns],
+        )
+
+
+def query_files(kind=None, catalog_file=CATALOG_FILE, **params):
+    """
+    Query the catalog for files matching all the given parameters. Returns a
+    list of dictionaries with all the catalog columns. Files that do not exist
+    anymore are skipped
+    """
+    conditions = []
+    values = []
+    if kind is not None:
+        conditions.append("kind = ?")
+        values.append(kind)
+    for key in params:
+        if key not in CATALOG_PARAMS:
+            raise RuntimeError(
+                "Unrecognised catalog parameter: {}".format(key)
+            )
+        if params[key] is None:
+            conditions.append("{} IS NULL".format(key))
+        else:
+            conditions.append("{} = ?".format(key))
+            values.append(params[key])
+
+    query = "SELECT * FROM files"
+    if len(conditions) > 0:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY path"
+
+    with closing(_get_connection(catalog_file)) as conn:
+        cursor = conn.execute(query, values)
+        columns = [desc[0] for desc in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    return [row for row in rows if exists(row["path"])]
+
+
+# ----------------------------
+# Makespan experiment helpers
+# ----------------------------
+
+
+def parse_makespan_file_name(file_name):
+    """
+    Parse the parameters of a makespan result or trace file from its name.
+    We only need this to back-fill the catalog with files written before we
+    had it. File names look like:
+    - trace_{workload}_{num_tasks}_{num_cpus_per_vm}.csv
+    - makespan_{prefix}_{baseline}_{num_vms}_{trace_ending}
+    - makespan_{prefix}_{baseline}_{num_vms}vms_{tpusr}tpusr_{trace_ending}
+    """
+    tokens = basename(file_name)[: -len(".csv")].split("_")
+
+    if tokens[0] == "trace":
+        return TRACE_KIND, {
+            "experiment": "makespan",
+            "workload": tokens[1],
+            "num_tasks": int(tokens[2]),
+            "num_cpus_per_vm": int(tokens[3]),
+        }
+
+    params = {
+        "experiment": "makespan",
+        "prefix": tokens[1],
+        "baseline": tokens[2],
+    }
+    if tokens[4].endswith("tpusr"):
+        params["num_vms"] = int(tokens[3][: -len("vms")])
+        params["num_tasks_per_user"] = int(tokens[4][: -len("tpusr")])
+        tokens = tokens[5:]
+    else:
+        params["num_vms"] = int(tokens[3])
+        tokens = tokens[4:]
+
+    params["workload"] = tokens[0]
+    params["num_tasks"] = int(tokens[1])
+    params["num_cpus_per_vm"] = int(tokens[2])
+
+    return RESULT_KIND, params
+
+
+def index_makespan_dir(dir_path, glob_str="*.csv", force=False):
+    """
+    Back-fill the catalog with all the makespan files in a directory that are
+    not registered yet (or that have changed since we registered them). We
+    only scan each directory once per process, and again if its contents
+    change (unless `force` is set)
+    """
+    if not exists(dir_path):
+        return
+
+    dir_mtime = getmtime(dir_path)
+    if not force and _INDEXED_DIR_MTIMES.get(dir_path) == dir_mtime:
+        return
+
+    registered = {
+        row["path"]: row["mtime"] for row in query_files(experiment="makespan")
+    }
+
+    for file_path in glob(join(dir_path, glob_str)):
+        if registered.get(file_path) == getmtime(file_path):
+            continue
+
+        try:
+            kind, params = parse_makespan_file_name(file_path)
+        except (IndexError, ValueError):
+            print("WARNING: skipping unrecognised file: {}".format(file_path))
+            continue
+
+        register_file(file_path, kind, **params)
+
+    _INDEXED_DIR_MTIMES[dir_path] = dir_mtime
+
+
+def query_makespan_results(
+    prefix,
+    num_vms,
+    workload,
+    num_tasks,
+    num_cpus_per_vm,
+    num_tasks_per_user=None,
+):
+    """
+    Get a list of (baseline, file_path) pairs with the makespan result files
+    for the given parameters (one per baseline)
+    """
+    query = {
+        "experiment": "makespan",
+        "prefix": prefix,
+        "num_vms": int(num_vms),
+        "workload": workload,
+        "num_tasks": int(num_tasks),
+        "num_cpus_per_vm": int(num_cpus_per_vm),
+        "num_tasks_per_user": None
+        if num_tasks_per_user is None
+        else int(num_tasks_per_user),
+    }
+
+    # Pick up any files that were not registered when written (e.g. copied
+    # from another machine), so that we do not drop the baselines that are
+    # missing from the catalog
+    index_makespan_dir(join(RESULTS_DIR, "makespan"))
+    rows = query_files(kind=RESULT_KIND, **query)
+
+    return [(row["baseline"], row["path"]) for row in rows]
+
+
+def get_makespan_result_file(
+    prefix,
+    baseline,
+    num_vms,
+    workload,
+    num_tasks,
+    num_cpus_per_vm,
+    num_tasks_per_user=None,
+):
+    """
+    Get the path to one baseline's makespan result file for the given
+    parameters, or None if there is none
+    """
+    return dict(
+        query_makespan_results(
+            prefix,
+            num_vms,
+            workload,
+            num_tasks,
+            num_cpus_per_vm,
+            num_tasks_per_user,
+        )
+    ).get(baseline)
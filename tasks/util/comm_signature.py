@@ -0,0 +1,226 @@
+from glob import glob
+from json import dumps, loads
+from numpy import (
+    array,
+    asarray,
+    concatenate,
+    full,
+    load as np_load,
+    savez_compressed,
+    unique,
+    zeros,
+)
+from os import makedirs
+from os.path import join
+from scipy.sparse import coo_matrix
+from tasks.util.env import RESULTS_DIR, get_version
+from tasks.util.mapping import get_contiguous_mapping
+from tasks.util.traffic import (
+    get_lammps_payload_model,
+    get_traffic_cost_function,
+)
+from time import time
+
+"""
+Communication signatures: compressed snapshots of the communication pattern
+of one run, so that we can keep them after analysing an execution graph, and
+replay them later. A signature has the per-type sparse message count
+matrices (see `tasks.lammps.graph.get_mpi_comm_matrices`), the world size,
+the placement (rank to host), the workload and its config, and (optionally)
+the measured execution time.
+
+Signatures are stored as compressed numpy archives, one per run, under
+COMM_SIGNATURES_DIR/<workload>/.
+
+To replay a signature under a different placement, we assume that the
+compute part of the run does not change, and only the network time does, so
+the estimated runtime is the measured one, minus the estimated network time
+of the original placement, plus the one of the new placement (see
+`tasks.util.traffic`).
+"""
+
+COMM_SIGNATURES_DIR = join(RESULTS_DIR, "comm-signatures")
+
+
+def _get_signature_dir(workload):
+    return join(COMM_SIGNATURES_DIR, workload)
+
+
+def _to_coo_arrays(matrix):
+    coo = matrix.tocoo()
+    return coo.row, coo.col, coo.data
+
+
+def save_comm_signature(
+    comm_matrices, workload, workload_config=None, exec_time=None
+):
+    """
+    Store the communication signature of a run, and return its file path
+    """
+    signature_dir = _get_signature_dir(workload)
+    makedirs(signature_dir, exist_ok=True)
+
+    timestamp = time()
+    signature_file = join(
+        signature_dir,
+        "{}_{}_{}.npz".format(
+            workload, comm_matrices["world_size"], int(timestamp * 1000)
+        ),
+    )
+
+    count_rows, count_cols, count_data = _to_coo_arrays(
+        comm_matrices["msg_count"]
+    )
+
+    # Flatten the per-type matrices into one set of COO arrays, with the
+    # message type of each entry
+    type_ids = [zeros(0, dtype=int)]
+    type_rows = [zeros(0, dtype=int)]
+    type_cols = [zeros(0, dtype=int)]
+    type_data = [zeros(0, dtype=int)]
+    for m_type, matrix in comm_matrices["msg_type"].items():
+        rows, cols, data = _to_coo_arrays(matrix)
+        type_ids.append(full(len(data), m_type, dtype=int))
+        type_rows.append(rows)
+        type_cols.append(cols)
+        type_data.append(data)
+
+    meta = {
+        "world_size": int(comm_matrices["world_size"]),
+        "workload": workload,
+        "workload-config": workload_config,
+        "exec-time": exec_time,
+        "version": get_version(),
+        "timestamp": timestamp,
+    }
+
+    savez_compressed(
+        signature_file,
+        meta=array(dumps(meta)),
+        hosts=array(comm_matrices["hosts"], dtype=str),
+        rank_to_host=asarray(comm_matrices["rank_to_host"]),
+        count_rows=count_rows,
+        count_cols=count_cols,
+        count_data=count_data,
+        type_ids=concatenate(type_ids),
+        type_rows=concatenate(type_rows),
+        type_cols=concatenate(type_cols),
+        type_data=concatenate(type_data),
+    )
+
+    return signature_file
+
+
+def load_comm_signature(signature_file):
+    """
+    Load a communication signature. Returns a dictionary with the same keys
+    as `get_mpi_comm_matrices`, plus the signature's metadata (`workload`,
+    `workload-config`, `exec-time`, `version`, and `timestamp`)
+    """
+    with np_load(signature_file) as npz:
+        signature = loads(str(npz["meta"]))
+        world_size = signature["world_size"]
+        shape = (world_size, world_size)
+
+        def _to_csr(rows, cols, data):
+            return coo_matrix((data, (rows, cols)), shape=shape).tocsr()
+
+        signature["hosts"] = npz["hosts"].tolist()
+        signature["rank_to_host"] = npz["rank_to_host"]
+        signature["msg_count"] = _to_csr(
+            npz["count_rows"], npz["count_cols"], npz["count_data"]
+        )
+
+        type_ids = npz["type_ids"]
+        signature["msg_type"] = {}
+        for m_type in unique(type_ids).tolist():
+            is_type = type_ids == m_type
+            signature["msg_type"][m_type] = _to_csr(
+                npz["type_rows"][is_type],
+                npz["type_cols"][is_type],
+                npz["type_data"][is_type],
+            )
+
+    return signature
+
+
+def list_comm_signatures(workload, world_size=None):
+    """
+    List the signature files for a workload (and world size), oldest first
+    """
+    glob_str = "{}_{}_*.npz".format(
+        workload, "*" if world_size is None else int(world_size)
+    )
+    signature_files = glob(join(_get_signature_dir(workload), glob_str))
+    return sorted(
+        signature_files, key=lambda f: int(f.split("_")[-1].split(".")[0])
+    )
+
+
+def load_latest_comm_signature(workload, world_size):
+    """
+    Load the most recent signature for a workload and world size
+    """
+    signature_files = list_comm_signatures(workload, world_size)
+    if len(signature_files) == 0:
+        raise RuntimeError(
+            "No communication signature for workload {} ({} procs) in: "
+            "{}".format(workload, world_size, _get_signature_dir(workload))
+        )
+
+    return load_comm_signature(signature_files[-1])
+
+
+def _get_signature_payload_model(signature):
+    workload_config = signature["workload-config"] or {}
+    return get_lammps_payload_model(
+        num_net_loops=workload_config.get("num_net_loops", 0),
+        chunk_size=workload_config.get("chunk_size", 0),
+    )
+
+
+def get_replay_function(signature, payload_model=None):
+    """
+    Return a function that, given a rank-to-host placement, estimates the
+    runtime (in seconds) of the run in the signature under that placement
+    """
+    if signature["exec-time"] is None:
+        raise RuntimeError(
+            "Can not replay a signature without execution time (workload: "
+            "{}, world size: {})".format(
+                signature["workload"], signature["world_size"]
+            )
+        )
+
+    if payload_model is None:
+        payload_model = _get_signature_payload_model(signature)
+    get_network_time = get_traffic_cost_function(signature, payload_model)
+    compute_time = signature["exec-time"] - get_network_time(
+        signature["rank_to_host"]
+    )
+
+    def replay(rank_to_host):
+        return max(compute_time + get_network_time(rank_to_host), 0)
+
+    return replay
+
+
+def replay_comm_signature(signature, rank_to_host, payload_model=None):
+    """
+    Estimate the runtime (in seconds) of the run in the signature under a
+    different rank-to-host placement
+    """
+    return get_replay_function(signature, payload_model)(rank_to_host)
+
+
+def replay_comm_signature_for_part(signature, part, payload_model=None):
+    """
+    Estimate the runtime of the run in the signature when we place its ranks
+    contiguously following a partition (i.e. the number of ranks in each
+    host, as in `generate_host_list`)
+    """
+    return replay_comm_signature(
+        signature,
+        get_contiguous_mapping(signature["world_size"], part),
+        payload_model=payload_model,
+    )
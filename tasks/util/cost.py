@@ -0,0 +1,227 @@
+from numpy import (
+    asarray,
+    broadcast_arrays,
+    ceil,
+    divide,
+    full_like,
+    inf,
+    lexsort,
+    minimum,
+    where,
+)
+from tasks.util.makespan import (
+    SPOT_FAULT_INJECTION_PERIOD_SECS,
+    get_num_spot_faults,
+)
+
+"""
+Cloud cost model for the spot VM experiments. Given the makespan of a
+baseline with and without spot VMs (i.e. with and without evictions), we
+estimate the makespan and cost over a grid of:
+- Spot discounts (fraction off the on-demand price)
+- Eviction rates (evictions per VM-hour)
+- Billing granularities (in seconds, e.g. 1 for per-second billing, 3600 for
+    hourly billing)
+- Spot mixes (fraction of the cluster's VMs that are spot VMs)
+
+All prices are normalised to the price of one on-demand VM-hour, so costs are
+in VM-hours (as in our plots). Every argument can be a scalar or an array, and
+results follow numpy broadcasting, so a full grid can be computed in one call
+by passing arrays with different (broadcastable) shapes.
+
+To extrapolate to other eviction rates, we assume that each eviction adds a
+fixed overhead to the makespan, that we measure from the recorded runs:
+    overhead = (makespan_spot - makespan_no_spot) / num_recorded_evictions
+With an eviction rate r (per VM-hour) over n_spot spot VMs, the makespan M
+satisfies M = M_0 + overhead * r * n_spot * M / 3600, so:
+    M = M_0 / (1 - overhead * r * n_spot / 3600)
+which diverges (i.e. the batch never finishes) when the denominator is not
+positive.
+"""
+
+SECONDS_PER_HOUR = 3600
+
+
+def get_num_recorded_evictions(makespan_spot_secs, num_vms):
+    """
+    Number of VM evictions during a recorded spot run, from our fault
+    injection schedule (see tasks.makespan.scheduler.fault_injection_thread)
+    """
+    num_periods = int(makespan_spot_secs // SPOT_FAULT_INJECTION_PERIOD_SECS)
+    return num_periods * get_num_spot_faults(num_vms)
+
+
+def get_recorded_eviction_rate(num_vms):
+    """
+    Eviction rate (evictions per VM-hour) of our fault injection schedule
+    """
+    return (
+        get_num_spot_faults(num_vms)
+        * SECONDS_PER_HOUR
+        / SPOT_FAULT_INJECTION_PERIOD_SECS
+        / num_vms
+    )
+
+
+def get_eviction_overhead_secs(
+    makespan_no_spot_secs, makespan_spot_secs, num_vms
+):
+    num_evictions = get_num_recorded_evictions(makespan_spot_secs, num_vms)
+    if num_evictions == 0:
+        return 0.0
+
+    return max(makespan_spot_secs - makespan_no_spot_secs, 0) / num_evictions
+
+
+def get_makespan_secs(
+    makespan_no_spot_secs,
+    eviction_overhead_secs,
+    eviction_rate,
+    num_vms,
+    spot_fraction=1.0,
+):
+    """
+    Expected makespan for a given eviction rate (per VM-hour) and fraction of
+    spot VMs. Returns inf if evictions arrive faster than we can recover
+    """
+    (
+        makespan_no_spot_secs,
+        eviction_overhead_secs,
+        eviction_rate,
+        spot_fraction,
+    ) = broadcast_arrays(
+        asarray(makespan_no_spot_secs, dtype=float),
+        asarray(eviction_overhead_secs, dtype=float),
+        asarray(eviction_rate, dtype=float),
+        asarray(spot_fraction, dtype=float),
+    )
+    num_spot_vms = spot_fraction * num_vms
+    slowdown_denom = (
+        1
+        - eviction_overhead_secs
+        * eviction_rate
+        * num_spot_vms
+        / SECONDS_PER_HOUR
+    )
+
+    return where(
+        slowdown_denom > 0,
+        divide(
+            makespan_no_spot_secs,
+            slowdown_denom,
+            out=full_like(slowdown_denom, inf),
+            where=slowdown_denom > 0,
+        ),
+        inf,
+    )
+
+
+def get_billed_secs(makespan_secs, billing_granularity_secs=1):
+    """
+    Billed time for each VM: the makespan rounded up to the billing
+    granularity
+    """
+    makespan_secs = asarray(makespan_secs, dtype=float)
+    billing_granularity_secs = asarray(billing_granularity_secs, dtype=float)
+    return ceil(makespan_secs / billing_granularity_secs) * (
+        billing_granularity_secs
+    )
+
+
+def get_cost_vm_hours(
+    makespan_secs,
+    num_vms,
+    discount=0.0,
+    spot_fraction=1.0,
+    billing_granularity_secs=1,
+):
+    """
+    Cost (in on-demand VM-hours) of running `num_vms` for `makespan_secs`,
+    where a `spot_fraction` of them are spot VMs with a `discount` (in [0, 1])
+    over the on-demand price
+    """
+    discount = asarray(discount, dtype=float)
+    spot_fraction = asarray(spot_fraction, dtype=float)
+    price_per_vm_hour = (1 - spot_fraction) + spot_fraction * (1 - discount)
+
+    return (
+        num_vms
+        * get_billed_secs(makespan_secs, billing_granularity_secs)
+        / SECONDS_PER_HOUR
+        * price_per_vm_hour
+    )
+
+
+def get_cost_grid(
+    makespan_no_spot_secs,
+    makespan_spot_secs,
+    num_vms,
+    discounts,
+    eviction_rates,
+    billing_granularities_secs,
+    spot_fractions,
+):
+    """
+    Evaluate makespan and cost over the full grid of discounts, eviction
+    rates, billing granularities, and spot fractions. Returns a dictionary
+    with the `makespan` and `cost` arrays, both with shape:
+    (num_discounts, num_eviction_rates, num_granularities, num_fractions)
+    and the grid axes
+    """
+    discounts = asarray(discounts, dtype=float).reshape(-1, 1, 1, 1)
+    eviction_rates = asarray(eviction_rates, dtype=float).reshape(1, -1, 1, 1)
+    billing_granularities_secs = asarray(
+        billing_granularities_secs, dtype=float
+    ).reshape(1, 1, -1, 1)
+    spot_fractions = asarray(spot_fractions, dtype=float).reshape(1, 1, 1, -1)
+
+    eviction_overhead_secs = get_eviction_overhead_secs(
+        makespan_no_spot_secs, makespan_spot_secs, num_vms
+    )
+    makespan = get_makespan_secs(
+        makespan_no_spot_secs,
+        eviction_overhead_secs,
+        eviction_rates,
+        num_vms,
+        spot_fractions,
+    )
+    cost = get_cost_vm_hours(
+        makespan,
+        num_vms,
+        discounts,
+        spot_fractions,
+        billing_granularities_secs,
+    )
+    makespan, cost = broadcast_arrays(makespan, cost)
+
+    return {
+        "makespan": makespan,
+        "cost": cost,
+        "discounts": discounts.ravel(),
+        "eviction_rates": eviction_rates.ravel(),
+        "billing_granularities_secs": billing_granularities_secs.ravel(),
+        "spot_fractions": spot_fractions.ravel(),
+    }
+
+
+def get_pareto_frontier(makespans, costs):
+    """
+    Indexes (into the flattened arrays) of the points in the Pareto frontier
+    of (makespan, cost), i.e. the points for which no other point is both
+    faster and cheaper. Indexes are sorted by increasing makespan
+    """
+    makespans = asarray(makespans, dtype=float).ravel()
+    costs = asarray(costs, dtype=float).ravel()
+
+    # Sort by makespan (and cost to break ties), and keep the points that
+    # strictly improve the best cost so far
+    order = lexsort((costs, makespans))
+    order = order[makespans[order] < inf]
+    sorted_costs = costs[order]
+    if len(sorted_costs) == 0:
+        return order
+
+    best_cost_before = minimum.accumulate(sorted_costs)
+    is_frontier = sorted_costs[1:] < best_cost_before[:-1]
+
+    return order[[True] + is_frontier.tolist()]
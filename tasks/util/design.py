@@ -0,0 +1,151 @@
+from numpy import asarray, sqrt, unique
+from scipy.stats import t as t_dist
+from tasks.util.planner import get_xvm_links_from_part
+from tasks.util.stats import BOOTSTRAP_CONFIDENCE
+
+"""
+Adaptive experiment design for the locality (oracle) experiments. Instead of
+running every partition, we fit a linear model of execution time vs number
+of cross-VM links as results come in, and pick the next partition to run
+where the model is least certain (i.e. the widest confidence interval of the
+predicted mean time). We stop once the interval is tight (relative to the
+predicted time) at every candidate number of links, or when we run out of
+partitions or runs.
+
+We always start with the partitions with the fewest and most links, and one
+in between, which is the minimum to estimate the model's error.
+"""
+
+# Stop when the confidence interval's half-width is below this fraction of
+# the predicted time, for all candidate numbers of links
+DESIGN_TOLERANCE = 0.05
+
+# Runs we need to fit the model, and before we trust its error estimate
+# enough to stop (with very few runs the residuals may be small by chance)
+DESIGN_MIN_RUNS = 3
+DESIGN_MIN_RUNS_TO_STOP = 5
+
+
+class PartitionDesign:
+    """
+    Pick, one at a time, which of a list of candidate partitions to run
+    next. Call `next_partition` to get it, `add_result` with its execution
+    time once it has run, and stop when `next_partition` returns None
+    """
+
+    def __init__(
+        self,
+        partitions,
+        get_links=get_xvm_links_from_part,
+        tolerance=DESIGN_TOLERANCE,
+        max_runs=None,
+        confidence=BOOTSTRAP_CONFIDENCE,
+    ):
+        self.partitions = list(partitions)
+        if len(self.partitions) == 0:
+            raise RuntimeError(
+                "Can not design an experiment without partitions!"
+            )
+
+        self.links = [get_links(part) for part in self.partitions]
+        self.tolerance = tolerance
+        self.max_runs = len(self.partitions) if max_runs is None else max_runs
+        self.confidence = confidence
+
+        # Indexes (in `partitions`) of the ones we have run, and their times
+        self.run_idxs = []
+        self.times = []
+
+    def add_result(self, part, exec_time):
+        self.run_idxs.append(self.partitions.index(tuple(part)))
+        self.times.append(float(exec_time))
+
+    def _get_initial_idxs(self):
+        """
+        Partitions with the fewest links, most links, and median links
+        """
+        order = sorted(
+            range(len(self.partitions)), key=lambda i: self.links[i]
+        )
+        return [order[0], order[-1], order[len(order) // 2]]
+
+    def fit(self):
+        """
+        Fit the linear model time = intercept + slope * links to the results
+        so far. Returns a dictionary with the coefficients, the residual
+        standard error, and a function that returns the predicted mean time
+        and its confidence interval's half-width for a number of links
+        """
+        xs = asarray([self.links[i] for i in self.run_idxs], dtype=float)
+        ys = asarray(self.times, dtype=float)
+        num_runs = len(ys)
+        if num_runs < DESIGN_MIN_RUNS:
+            raise RuntimeError(
+                "Need at least {} runs to fit the model (have: {})".format(
+                    DESIGN_MIN_RUNS, num_runs
+                )
+            )
+
+        x_mean = xs.mean()
+        sxx = ((xs - x_mean) ** 2).sum()
+        # With a single number of links we can only estimate the mean
+        num_params = 2 if sxx > 0 else 1
+        slope = (
+            ((xs - x_mean) * (ys - ys.mean())).sum() / sxx if sxx > 0 else 0
+        )
+        intercept = ys.mean() - slope * x_mean
+
+        residuals = ys - (intercept + slope * xs)
+        dof = max(num_runs - num_params, 1)
+        std_err = sqrt((residuals**2).sum() / dof)
+        t_value = t_dist.ppf(1 - (1 - self.confidence) / 2, dof)
+
+        def predict(links):
+            leverage = 1 / num_runs
+            if sxx > 0:
+                leverage += (links - x_mean) ** 2 / sxx
+            return (
+                intercept + slope * links,
+                t_value * std_err * sqrt(leverage),
+            )
+
+        return {
+            "intercept": float(intercept),
+            "slope": float(slope),
+            "std-err": float(std_err),
+            "predict": predict,
+        }
+
+    def next_partition(self):
+        """
+        Return the next partition to run, or None if we are done
+        """
+        if len(self.run_idxs) >= self.max_runs:
+            return None
+
+        not_run = [
+            i for i in range(len(self.partitions)) if i not in self.run_idxs
+        ]
+        if len(not_run) == 0:
+            return None
+
+        for idx in self._get_initial_idxs():
+            if idx not in self.run_idxs:
+                return self.partitions[idx]
+
+        model = self.fit()
+        widths = {}
+        is_tight = True
+        for links in unique(self.links).tolist():
+            mean, half_width = model["predict"](links)
+            widths[links] = half_width
+            if half_width > self.tolerance * abs(mean):
+                is_tight = False
+
+        if is_tight and len(self.run_idxs) >= DESIGN_MIN_RUNS_TO_STOP:
+            return None
+
+        # Run the partition with the widest interval, and, among those with
+        # the same number of links, the first one in the list
+        next_idx = max(not_run, key=lambda i: (widths[self.links[i]], -i))
+        return self.partitions[next_idx]
@@ -0,0 +1,260 @@
+from math import pi
+from numpy import (
+    arange,
+    array,
+    asarray,
+    concatenate,
+    exp,
+    floor,
+    log,
+    log2,
+    sin,
+    sort,
+    zeros,
+)
+
+"""
+Arrival processes and size distributions to synthesise task traces. Each
+sampler takes a numpy Generator (so that traces are reproducible given a
+seed) and a configuration dictionary with a `type` key and the parameters
+of the distribution.
+
+Arrival processes return the arrival times (in seconds, as floats) of
+`num_tasks` tasks, where the first task always arrives at time 0:
+- poisson: homogeneous Poisson process with rate `lmbd`
+- mmpp: Markov-modulated Poisson process. The process moves between states
+    (e.g. calm and burst) that last an exponential time with mean
+    `mean_durations[i]`, and while in state i arrivals are Poisson with rate
+    `rates[i]`. States are visited in round-robin order
+- diurnal: non-homogeneous Poisson process with sinusoidal rate:
+    lmbd * (1 + amplitude * sin(2 * pi * t / period + phase))
+- pareto-onoff: superposition of `num_sources` on/off sources, where on and
+    off periods are Pareto-distributed with shape `alpha` (heavy-tailed for
+    1 < alpha < 2, which makes the aggregate self-similar) and means
+    `mean_on`/`mean_off`. Sources emit Poisson arrivals at rate `on_rate`
+    while on
+
+Size distributions return `num_tasks` integer sizes in [min_size, max_size):
+- uniform: uniform over the integers in the range
+- log-uniform: the log of the size is uniform (i.e. favours small sizes)
+- empirical: sample from the histogram given by `sizes` and `weights`
+- power-of-two: with probability `pow2_prob` sample uniformly one of the
+    powers of two in the range, otherwise sample uniformly from the range
+"""
+
+DEFAULT_ARRIVAL = {"type": "poisson", "lmbd": 0.1}
+DEFAULT_SIZE_DIST = {"type": "uniform"}
+
+# ----------------------------
+# Arrival processes
+# ----------------------------
+
+
+def _sample_poisson_arrivals(rng, num_tasks, config):
+    inter_arrival_times = rng.exponential(1 / config["lmbd"], num_tasks - 1)
+    return concatenate([[0.0], inter_arrival_times.cumsum()])
+
+
+def _sample_mmpp_arrivals(rng, num_tasks, config):
+    rates = asarray(config["rates"], dtype=float)
+    mean_durations = asarray(config["mean_durations"], dtype=float)
+    if len(rates) != len(mean_durations):
+        raise RuntimeError("MMPP needs one mean duration per rate!")
+
+    # Simulate state periods in batches, and in each period draw a Poisson
+    # number of arrivals placed uniformly within the period
+    arrival_times = []
+    num_arrivals = 0
+    state = 0
+    period_start = 0.0
+    batch_size = 1024
+    while num_arrivals < num_tasks:
+        states = (state + arange(batch_size)) % len(rates)
+        durations = rng.exponential(mean_durations[states])
+        starts = period_start + concatenate([[0.0], durations[:-1].cumsum()])
+        counts = rng.poisson(rates[states] * durations)
+
+        period_idx = counts.nonzero()[0].repeat(counts[counts > 0])
+        offsets = rng.uniform(0, 1, len(period_idx)) * durations[period_idx]
+        arrival_times.append(sort(starts[period_idx] + offsets))
+        num_arrivals += len(period_idx)
+
+        state = (state + batch_size) % len(rates)
+        period_start = starts[-1] + durations[-1]
+
+    arrival_times = concatenate(arrival_times)[:num_tasks]
+    return arrival_times - arrival_times[0]
+
+
+def _sample_diurnal_arrivals(rng, num_tasks, config):
+    lmbd = float(config["lmbd"])
+    amplitude = float(config.get("amplitude", 0.5))
+    period = float(config.get("period", 86400))
+    phase = float(config.get("phase", 0))
+    if not 0 <= amplitude <= 1:
+        raise RuntimeError("Diurnal amplitude must be in [0, 1]")
+
+    # Thinning (Lewis & Shedler): sample a homogeneous process with the
+    # maximum rate, and keep each arrival with probability rate(t) / max_rate
+    max_rate = lmbd * (1 + amplitude)
+    arrival_times = []
+    num_arrivals = 0
+    last_t = 0.0
+    while num_arrivals < num_tasks:
+        batch_size = max(2 * (num_tasks - num_arrivals), 1024)
+        ts = last_t + rng.exponential(1 / max_rate, batch_size).cumsum()
+        rate = lmbd * (1 + amplitude * sin(2 * pi * ts / period + phase))
+        keep = rng.uniform(0, 1, batch_size) * max_rate < rate
+        arrival_times.append(ts[keep])
+        num_arrivals += int(keep.sum())
+        last_t = ts[-1]
+
+    arrival_times = concatenate(arrival_times)[:num_tasks]
+    return arrival_times - arrival_times[0]
+
+
+def _sample_pareto(rng, alpha, mean, size):
+    # Pareto with shape alpha and minimum x_m has mean alpha * x_m / (alpha-1)
+    x_m = mean * (alpha - 1) / alpha
+    return x_m * (1 + rng.pareto(alpha, size))
+
+
+def _sample_pareto_onoff_arrivals(rng, num_tasks, config):
+    alpha = float(config.get("alpha", 1.5))
+    mean_on = float(config["mean_on"])
+    mean_off = float(config["mean_off"])
+    on_rate = float(config["on_rate"])
+    num_sources = int(config.get("num_sources", 1))
+    if alpha <= 1:
+        raise RuntimeError("Pareto shape must be > 1 for a finite mean")
+
+    # Each source needs, on average, num_tasks / num_sources arrivals, so we
+    # simulate on/off periods in batches. Sources advance independently, so
+    # we can only keep the arrivals before the earliest point all sources
+    # have reached (the horizon)
+    arrival_times = array([], dtype=float)
+    source_start = zeros(num_sources)
+    num_periods = max(int(2 * num_tasks / (on_rate * mean_on)), 16)
+    while (arrival_times < source_start.min()).sum() < num_tasks:
+        on = _sample_pareto(rng, alpha, mean_on, (num_sources, num_periods))
+        off = _sample_pareto(rng, alpha, mean_off, (num_sources, num_periods))
+        ends = source_start[:, None] + (on + off).cumsum(axis=1)
+        starts = (ends - on - off).ravel()
+        counts = rng.poisson(on_rate * on).ravel()
+        on = on.ravel()
+
+        period_idx = counts.nonzero()[0].repeat(counts[counts > 0])
+        offsets = rng.uniform(0, 1, len(period_idx)) * on[period_idx]
+        arrival_times = concatenate(
+            [arrival_times, starts[period_idx] + offsets]
+        )
+        source_start = ends[:, -1]
+
+    arrival_times = sort(arrival_times[arrival_times < source_start.min()])
+    arrival_times = arrival_times[:num_tasks]
+
+    return arrival_times - arrival_times[0]
+
+
+def sample_arrival_times(rng, num_tasks, arrival_config=None):
+    if arrival_config is None:
+        arrival_config = DEFAULT_ARRIVAL
+
+    if num_tasks <= 0:
+        return array([], dtype=float)
+
+    arrival_type = arrival_config["type"]
+    if arrival_type == "poisson":
+        return _sample_poisson_arrivals(rng, num_tasks, arrival_config)
+    if arrival_type == "mmpp":
+        return _sample_mmpp_arrivals(rng, num_tasks, arrival_config)
+    if arrival_type == "diurnal":
+        return _sample_diurnal_arrivals(rng, num_tasks, arrival_config)
+    if arrival_type == "pareto-onoff":
+        return _sample_pareto_onoff_arrivals(rng, num_tasks, arrival_config)
+
+    raise RuntimeError("Unrecognised arrival process: {}".format(arrival_type))
+
+
+def get_inter_arrival_times(arrival_times):
+    """
+    Convert float arrival times to the integer inter-arrival times we record
+    in a trace. We floor the arrival times first to prevent rounding errors
+    from accumulating
+    """
+    arrival_times = floor(asarray(arrival_times)).astype(int)
+    return concatenate([[0], arrival_times[1:] - arrival_times[:-1]])
+
+
+def sample_inter_arrival_times(rng, num_tasks, arrival_config=None):
+    """
+    Sample the integer inter-arrival times we record in a trace. For the
+    Poisson process we truncate each (exponential) gap, as we always have,
+    so that traces with the same seed do not change. For all other processes
+    we floor the arrival times (see `get_inter_arrival_times`)
+    """
+    if arrival_config is None:
+        arrival_config = DEFAULT_ARRIVAL
+
+    if num_tasks > 0 and arrival_config["type"] == "poisson":
+        inter_arrival_times = rng.exponential(
+            1 / arrival_config["lmbd"], num_tasks - 1
+        )
+        return concatenate([[0], inter_arrival_times.astype(int)])
+
+    return get_inter_arrival_times(
+        sample_arrival_times(rng, num_tasks, arrival_config)
+    )
+
+
+# ----------------------------
+# Size distributions
+# ----------------------------
+
+
+def sample_sizes(rng, num_tasks, min_size, max_size, size_config=None):
+    if size_config is None:
+        size_config = DEFAULT_SIZE_DIST
+
+    min_size = int(min_size)
+    max_size = int(max_size)
+    size_type = size_config["type"]
+
+    if size_type == "uniform":
+        return rng.integers(min_size, max_size, size=num_tasks)
+
+    if size_type == "log-uniform":
+        log_sizes = rng.uniform(log(min_size), log(max_size), size=num_tasks)
+        sizes = floor(exp(log_sizes)).astype(int)
+        return sizes.clip(min_size, max_size - 1)
+
+    if size_type == "empirical":
+        sizes = asarray(size_config["sizes"], dtype=int)
+        weights = asarray(size_config["weights"], dtype=float)
+        in_range = (sizes >= min_size) & (sizes < max_size)
+        if not in_range.any():
+            raise RuntimeError(
+                "No empirical size in range [{}, {})".format(
+                    min_size, max_size
+                )
+            )
+        sizes = sizes[in_range]
+        weights = weights[in_range]
+        return rng.choice(sizes, size=num_tasks, p=weights / weights.sum())
+
+    if size_type == "power-of-two":
+        pow2_prob = float(size_config.get("pow2_prob", 0.8))
+        pow2s = 2 ** arange(
+            int(floor(log2(max(min_size, 1)))),
+            int(floor(log2(max_size - 1))) + 1,
+        )
+        pow2s = pow2s[(pow2s >= min_size) & (pow2s < max_size)]
+        uniform_sizes = rng.integers(min_size, max_size, size=num_tasks)
+        if len(pow2s) == 0:
+            return uniform_sizes
+
+        pow2_sizes = rng.choice(pow2s, size=num_tasks)
+        is_pow2 = rng.uniform(0, 1, size=num_tasks) < pow2_prob
+        return pow2_sizes * is_pow2 + uniform_sizes * (~is_pow2)
+
+    raise RuntimeError("Unrecognised size distribution: {}".format(size_type))
@@ -1,7 +1,9 @@
 from base64 import b64encode
-from glob import glob
 from os.path import join
-from pandas import read_csv
+from tasks.util.catalog import (
+    get_makespan_result_file,
+    query_makespan_results,
+)
 from tasks.util.env import EXAMPLES_DOCKER_DIR, PLOTS_ROOT, RESULTS_DIR
 from tasks.util.math import cum_sum
 from tasks.util.plot import (
@@ -9,7 +11,16 @@ from tasks.util.plot import (
     get_color_for_baseline,
     get_label_for_baseline,
 )
-from tasks.util.trace import load_task_trace_from_file
+from tasks.util.results_cache import cached_results, read_csv_cached
+from tasks.util.timeseries import (
+    get_idle_cpus_step_function,
+    get_step_function_per_second,
+    read_time_series_per_second,
+)
+from tasks.util.trace import (
+    MAKESPAN_TRACES_DIR,
+    load_task_trace_from_file,
+)
 
 # TODO: move this constants to a shared makesan file (right now they live
 # in util/makespan)
@@ -54,6 +65,7 @@ def get_elastic_input_data(num_loops=OPENMP_ELASTIC_NUM_LOOPS, native=False):
     )
 
 
+@cached_results(MAKESPAN_RESULTS_DIR, MAKESPAN_TRACES_DIR)
 def read_elastic_results(num_vms, num_tasks, num_cpus_per_vm):
     result_dict = {}
 
@@ -61,12 +73,10 @@ def read_elastic_results(num_vms, num_tasks, num_cpus_per_vm):
     # Results to visualise makespan
     # -----
 
-    glob_str = "makespan_makespan_*_{}_omp-elastic_{}_{}.csv".format(
-        num_vms, num_tasks, num_cpus_per_vm
-    )
-    for csv in glob(join(MAKESPAN_RESULTS_DIR, glob_str)):
-        baseline = csv.split("_")[2]
-        results = read_csv(csv)
+    for baseline, csv in query_makespan_results(
+        "makespan", num_vms, "omp-elastic", num_tasks, num_cpus_per_vm
+    ):
+        results = read_csv_cached(csv)
         result_dict[baseline] = {}
 
         makespan_s = results["MakespanSecs"].to_list()
@@ -86,12 +96,10 @@ def read_elastic_results(num_vms, num_tasks, num_cpus_per_vm):
     # Results to visualize all the rest
     # -----
 
-    glob_str = "makespan_exec-task-info_*_{}_omp-elastic_{}_{}.csv".format(
-        num_vms, num_tasks, num_cpus_per_vm
-    )
-    for csv in glob(join(MAKESPAN_RESULTS_DIR, glob_str)):
-        baseline = csv.split("_")[2]
-        results = read_csv(csv)
+    for baseline, csv in query_makespan_results(
+        "exec-task-info", num_vms, "omp-elastic", num_tasks, num_cpus_per_vm
+    ):
+        results = read_csv_cached(csv)
 
         # -----
         # Results to visualise JCT
@@ -115,27 +123,7 @@ def read_elastic_results(num_vms, num_tasks, num_cpus_per_vm):
             result_dict[baseline]["queue-time"][tid] = tqueue
             result_dict[baseline]["jct"][tid] = e_ts - genesis_ts
 
-        # ----
-        # Results to visualise % of idle CPU cores (and time-series)
-        # -----
-
         time_elapsed_secs = int(results.max()["EndTimeStamp"] - genesis_ts)
-        tasks_per_ts = [[] for i in range(time_elapsed_secs)]
-
-        for index, row in results.iterrows():
-            task_id = row["TaskId"]
-            start_slot = int(row["StartTimeStamp"] - genesis_ts)
-            end_slot = int(row["EndTimeStamp"] - genesis_ts)
-
-            for ind in range(start_slot, end_slot):
-                tasks_per_ts[ind].append(task_id)
-
-        for tasks in tasks_per_ts:
-            tasks.sort()
-
-        tasks_per_ts = {ts: tasks for ts, tasks in enumerate(tasks_per_ts)}
-
-        result_dict[baseline]["tasks_per_ts"] = tasks_per_ts
 
         # -----
         # Results to visualise % of idle CPU cores (and time-series)
@@ -147,35 +135,63 @@ def read_elastic_results(num_vms, num_tasks, num_cpus_per_vm):
 
         result_dict[baseline]["ts_vcpus"] = {}
         total_available_vcpus = num_vms * num_cpus_per_vm
-        sched_info_csv = (
-            "makespan_sched-info_{}_{}_omp-elastic_{}_{}.csv".format(
-                baseline, num_vms, num_tasks, num_cpus_per_vm
-            )
+        sched_info_csv = get_makespan_result_file(
+            "sched-info",
+            baseline,
+            num_vms,
+            "omp-elastic",
+            num_tasks,
+            num_cpus_per_vm,
         )
 
-        if baseline in NATIVE_BASELINES:
-            # First, set each timestamp to the total available vCPUs
-            for ts in result_dict[baseline]["tasks_per_ts"]:
-                result_dict[baseline]["ts_vcpus"][ts] = total_available_vcpus
-
-            # Second, for each ts subtract the size of each task in-flight
-            for ts in result_dict[baseline]["tasks_per_ts"]:
-                for t in result_dict[baseline]["tasks_per_ts"][ts]:
-                    result_dict[baseline]["ts_vcpus"][ts] -= task_trace[
-                        int(t)
-                    ].size
-
-            # Third, express the results as percentages, and the number of
-            # idle VMs as a number (not as a set)
-            for ts in result_dict[baseline]["ts_vcpus"]:
-                result_dict[baseline]["ts_vcpus"][ts] = (
-                    result_dict[baseline]["ts_vcpus"][ts]
-                    / total_available_vcpus
-                ) * 100
+        # Native baselines record the occupancy metrics online since we
+        # added them to the scheduler state. For older results, we
+        # re-construct them from the executed task info
+        occupancy_csv = get_makespan_result_file(
+            "occupancy-info",
+            baseline,
+            num_vms,
+            "omp-elastic",
+            num_tasks,
+            num_cpus_per_vm,
+        )
+
+        if baseline in NATIVE_BASELINES and occupancy_csv is not None:
+            occupancy = read_time_series_per_second(
+                occupancy_csv,
+                {"NumIdleCpus": total_available_vcpus},
+                genesis_ts,
+                time_elapsed_secs,
+            )
+            result_dict[baseline]["ts_vcpus"] = {
+                ts: idle_cpus / total_available_vcpus * 100
+                for ts, idle_cpus in occupancy["NumIdleCpus"].items()
+            }
+        elif baseline in NATIVE_BASELINES:
+            # Build the step function of idle vCPUs from the task's start and
+            # end events, and sample it once per second
+            times, idle_vcpus = get_idle_cpus_step_function(
+                results["StartTimeStamp"].to_numpy(),
+                results["EndTimeStamp"].to_numpy(),
+                [task_trace[int(t)].size for t in task_ids],
+                total_available_vcpus,
+            )
+            result_dict[baseline]["ts_vcpus"] = get_step_function_per_second(
+                times,
+                idle_vcpus / total_available_vcpus * 100,
+                genesis_ts,
+                time_elapsed_secs,
+                100,
+            )
         else:
             # For Granny, the idle vCPUs results are directly available in
             # the file
-            sch_info_csv = read_csv(join(MAKESPAN_RESULTS_DIR, sched_info_csv))
+            if sched_info_csv is None:
+                raise RuntimeError(
+                    "No scheduling info for baseline {} (num VMs: {} - num "
+                    "tasks: {})".format(baseline, num_vms, num_tasks)
+                )
+            sch_info_csv = read_csv_cached(sched_info_csv)
             idle_cpus = (
                 sch_info_csv["NumIdleCpus"] / total_available_vcpus * 100
             ).to_list()
@@ -1,14 +1,15 @@
-from glob import glob
 from matplotlib.patches import Patch
 from numpy import linspace
 from os.path import join
-from pandas import read_csv
 from scipy.interpolate import CubicSpline
+from tasks.util.catalog import query_makespan_results
 from tasks.util.env import (
     PLOTS_ROOT,
     RESULTS_DIR,
 )
 from tasks.util.plot import get_color_for_baseline, get_label_for_baseline
+from tasks.util.results_cache import cached_results, read_csv_cached
+from tasks.util.trace import MAKESPAN_TRACES_DIR
 
 MAKESPAN_RESULTS_DIR = join(RESULTS_DIR, "makespan")
 MAKESPAN_PLOTS_DIR = join(PLOTS_ROOT, "makespan")
@@ -18,18 +19,20 @@ def get_user_id_from_task_id(num_tasks_per_user, task_id):
     return int(task_id / num_tasks_per_user) + 1
 
 
+@cached_results(MAKESPAN_RESULTS_DIR, MAKESPAN_TRACES_DIR)
 def read_eviction_results(num_vms, num_users, num_tasks, num_cpus_per_vm):
     result_dict = {}
 
     num_tasks_per_user = int(num_tasks / num_users)
-    glob_str = (
-        "makespan_exec-task-info_*_{}vms_{}tpusr_mpi-evict_{}_{}.csv".format(
-            num_vms, num_tasks_per_user, num_tasks, num_cpus_per_vm
-        )
-    )
-    for csv in glob(join(MAKESPAN_RESULTS_DIR, glob_str)):
-        baseline = csv.split("_")[2]
-        results = read_csv(csv)
+    for baseline, csv in query_makespan_results(
+        "exec-task-info",
+        num_vms,
+        "mpi-evict",
+        num_tasks,
+        num_cpus_per_vm,
+        num_tasks_per_user=num_tasks_per_user,
+    ):
+        results = read_csv_cached(csv)
         result_dict[baseline] = {}
 
         # -----
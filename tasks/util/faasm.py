@@ -18,6 +18,22 @@ def get_faasm_exec_time_from_json(results_json, check=False):
     return actual_time
 
 
+def get_faasm_exec_hosts_from_json(results_json):
+    """
+    Return the hosts that executed the messages in Faasm's response JSON.
+    Responses are protobuf messages serialised with their JSON field names
+    (i.e. `executedHost`), but exec-graph nodes use the original field name
+    (i.e. `exec_host`)
+    """
+    hosts = set()
+    for result_json in results_json:
+        host = result_json.get("executedHost", result_json.get("exec_host"))
+        if host:
+            hosts.add(host)
+
+    return sorted(hosts)
+
+
 def get_faasm_planner_host_port():
     return faasmctl_get_planner_host_port(get_faasm_ini_file())
 
@@ -0,0 +1,165 @@
+from dataclasses import dataclass
+from math import ceil
+from numpy import (
+    asarray,
+    count_nonzero,
+    divide,
+    int64,
+    ones_like,
+    pad,
+    sort,
+    zeros_like,
+)
+from tasks.util.occupancy import get_used_cpus_per_host
+
+"""
+External fragmentation metrics for a cluster snapshot. All the metrics take
+the number of free slots per host as input, an array of shape (num_hosts,) or
+(num_snapshots, num_hosts), and operate over the last axis.
+"""
+
+
+def get_free_slots_per_host(occupancy, num_vms, num_cpus_per_vm):
+    """
+    Get the free slots per host from an occupancy matrix (see
+    tasks.util.occupancy). Hosts that do not appear in the occupancy matrix
+    are appended as fully free
+    """
+    used_per_host = get_used_cpus_per_host(occupancy)
+    free_per_host = int(num_cpus_per_vm) - used_per_host
+
+    num_missing = int(num_vms) - free_per_host.shape[-1]
+    if num_missing > 0:
+        pad_width = [(0, 0)] * (free_per_host.ndim - 1) + [(0, num_missing)]
+        free_per_host = pad(
+            free_per_host, pad_width, constant_values=int(num_cpus_per_vm)
+        )
+
+    return free_per_host
+
+
+def get_largest_placeable_job(free_per_host, max_num_vms=None):
+    """
+    Largest job we can place spanning, at most, `max_num_vms` VMs. If
+    `max_num_vms` is 1, this is the largest job we can place without any
+    cross-VM links. If it is None, any number of VMs is allowed
+    """
+    free_desc = -sort(-asarray(free_per_host, dtype=int64), axis=-1)
+    if max_num_vms is not None:
+        free_desc = free_desc[..., : int(max_num_vms)]
+
+    return free_desc.sum(axis=-1)
+
+
+def get_min_vms_for_job(free_per_host, job_size):
+    """
+    Minimum number of VMs that could hold a job of size `job_size`, given the
+    current free slots. We greedily fill the emptiest VMs first. Returns -1 if
+    the job does not fit in the cluster
+    """
+    free_desc = -sort(-asarray(free_per_host, dtype=int64), axis=-1)
+    cum_free = free_desc.cumsum(axis=-1)
+    min_vms = (cum_free < int(job_size)).sum(axis=-1) + 1
+    fits = cum_free[..., -1] >= int(job_size)
+
+    return min_vms * fits - (~fits)
+
+
+def get_external_fragmentation(free_per_host):
+    """
+    Classic external fragmentation metric: 1 - (largest free contiguous
+    block / total free). Here a contiguous block is the set of free slots in
+    one VM. It is 0 if all free slots are in one VM (or there are none)
+    """
+    free_per_host = asarray(free_per_host, dtype=int64)
+    largest = asarray(free_per_host.max(axis=-1), dtype=float)
+    total = asarray(free_per_host.sum(axis=-1), dtype=float)
+
+    ratio = divide(largest, total, out=zeros_like(total), where=total > 0)
+    return (total > 0) * (1 - ratio)
+
+
+def get_free_slot_scatter(free_per_host, num_cpus_per_vm):
+    """
+    How scattered the free slots are across VMs: the number of VMs with free
+    slots divided by the minimum number of VMs that could hold them all. It
+    is 1 if free slots are perfectly packed, and grows with scattering
+    """
+    free_per_host = asarray(free_per_host, dtype=int64)
+    num_hosts_with_free = asarray(
+        count_nonzero(free_per_host, axis=-1), dtype=float
+    )
+    min_hosts = asarray(
+        -(-free_per_host.sum(axis=-1) // int(num_cpus_per_vm)), dtype=float
+    )
+
+    return divide(
+        num_hosts_with_free,
+        min_hosts,
+        out=ones_like(min_hosts),
+        where=min_hosts > 0,
+    )
+
+
+def get_fragmentation_metrics(free_per_host, num_cpus_per_vm):
+    return {
+        "largest_placeable_job": get_largest_placeable_job(free_per_host),
+        "largest_local_job": get_largest_placeable_job(free_per_host, 1),
+        "external_fragmentation": get_external_fragmentation(free_per_host),
+        "free_slot_scatter": get_free_slot_scatter(
+            free_per_host, num_cpus_per_vm
+        ),
+    }
+
+
+# ----------------------------
+# Admission policy
+# ----------------------------
+
+
+@dataclass
+class AdmissionPolicy:
+    """
+    Tunable admission policy for Granny's locality-aware baselines. A job is
+    admitted if it fits, and:
+    - slack_pctg: after admitting it, at least this fraction of the cluster's
+        slots remain free (slack to help the planner de-fragment by migrating)
+    - max_extra_vms: it could be placed using at most this many VMs more than
+        the minimum it would need in an empty cluster (None disables it)
+    - max_external_fragmentation: the current external fragmentation is below
+        this threshold (None disables it)
+    """
+
+    slack_pctg: float = 0.05
+    max_extra_vms: int = None
+    max_external_fragmentation: float = None
+
+
+# With 5% slack we almost always have perfect locality, and we do not loose
+# too much utilisation. With 10%, locality is perfect but we hold back more
+DEFAULT_ADMISSION_POLICY = AdmissionPolicy()
+
+
+def should_admit_task(policy, free_per_host, task_size, num_cpus_per_vm):
+    free_per_host = asarray(free_per_host, dtype=int64)
+    total_slots = free_per_host.shape[-1] * int(num_cpus_per_vm)
+    num_free_slots = int(free_per_host.sum())
+
+    if num_free_slots < task_size:
+        return False
+
+    if (num_free_slots - task_size) < int(total_slots * policy.slack_pctg):
+        return False
+
+    if policy.max_extra_vms is not None:
+        min_vms = int(get_min_vms_for_job(free_per_host, task_size))
+        ideal_vms = ceil(task_size / int(num_cpus_per_vm))
+        if min_vms > ideal_vms + int(policy.max_extra_vms):
+            return False
+
+    if policy.max_external_fragmentation is not None:
+        ext_frag = float(get_external_fragmentation(free_per_host))
+        if ext_frag > policy.max_external_fragmentation:
+            return False
+
+    return True
@@ -0,0 +1,202 @@
+from numpy import asarray, quantile
+from tasks.util.stats import summarise
+from threading import Lock
+from time import sleep, time
+
+"""
+Benchmark harness shared by the experiments' `run.py` tasks. For each
+configuration (e.g. a workload and a number of processes) we:
+1. Run a number of warm-up repetitions (none by default), and discard them.
+2. Run at least `repeats` repetitions.
+3. Keep repeating, up to `max_repeats`, until the bootstrap confidence
+    interval of the mean is narrow enough (relative to the mean), or we run
+    out of time budget.
+
+We flag a repetition as an outlier if it falls outside the Tukey fences of
+the repetitions before it. Outliers are still written to the CSV files, but
+we record the flag (and the hosts the repetition ran in) as parameters in
+the results store, and leave them out of the stopping criteria.
+
+By default `max_repeats` is `repeats`, so that, unless asked to, we run the
+same number of repetitions as before. We record results under a lock, so
+that we can run different configurations concurrently (see
+`tasks.util.sweep`).
+"""
+
+# Warm-ups add a (discarded) run per configuration, so experiments opt in
+HARNESS_NUM_WARMUP_RUNS = 0
+# Stop repeating once the confidence interval's half-width is below this
+# fraction of the mean
+HARNESS_TARGET_CI_WIDTH = 0.05
+# Repetitions (that are not outliers) we need before we trust the interval
+# enough to stop (with very few of them it may be narrow by chance)
+HARNESS_MIN_RUNS_TO_STOP = 3
+# Tukey fences (in inter-quartile ranges), and the number of repetitions we
+# need before we flag any of them. We floor the inter-quartile range to a
+# fraction of the median so that near-identical runs are not outliers
+HARNESS_OUTLIER_IQR_FACTOR = 1.5
+HARNESS_OUTLIER_MIN_RUNS = 4
+HARNESS_OUTLIER_MIN_IQR = 0.01
+
+_RECORD_LOCK = Lock()
+
+
+def is_outlier(exec_time, prev_times):
+    """
+    Whether an execution time falls outside the Tukey fences of the previous
+    ones
+    """
+    if len(prev_times) < HARNESS_OUTLIER_MIN_RUNS:
+        return False
+
+    q1, median, q3 = quantile(asarray(prev_times), [0.25, 0.5, 0.75])
+    iqr = max(q3 - q1, HARNESS_OUTLIER_MIN_IQR * abs(median))
+    return bool(
+        exec_time < q1 - HARNESS_OUTLIER_IQR_FACTOR * iqr
+        or exec_time > q3 + HARNESS_OUTLIER_IQR_FACTOR * iqr
+    )
+
+
+def get_ci_width(exec_times):
+    """
+    Half-width of the confidence interval of the mean, as a fraction of the
+    mean
+    """
+    summary = summarise(exec_times)
+    low, high = summary["mean-ci"]
+    if summary["mean"] == 0:
+        return 0
+
+    return (high - low) / 2 / abs(summary["mean"])
+
+
+def run_benchmark(
+    run_fn,
+    record_fn,
+    repeats=1,
+    max_repeats=None,
+    num_warmup_runs=HARNESS_NUM_WARMUP_RUNS,
+    target_ci_width=HARNESS_TARGET_CI_WIDTH,
+    time_budget=None,
+    hosts=None,
+    sleep_secs=0,
+    label="benchmark",
+):
+    """
+    Run a benchmark configuration with warm-ups and adaptive repeats:
+    - run_fn: runs one repetition, and returns its execution time (in
+        seconds), or a tuple with its execution time and the hosts it ran in
+    - record_fn: called as `record_fn(run_num, exec_time, params)` for each
+        (non warm-up) repetition, with the parameters to record in the
+        results store (`Hosts` and `Outlier`)
+    - repeats: minimum number of repetitions
+    - max_repeats: maximum number of repetitions (defaults to `repeats`)
+    - time_budget: seconds (including warm-ups) after which we do not start
+        any more repetitions (once we have `repeats` of them)
+    - hosts: hosts the benchmark runs in (or is pinned to). If `run_fn`
+        also returns the hosts, they must not be empty
+
+    Returns a dictionary with the execution times, the indexes of the
+    outliers, and why we stopped repeating
+    """
+    repeats = int(repeats)
+    max_repeats = repeats if max_repeats is None else int(max_repeats)
+    if repeats < 1 or max_repeats < repeats:
+        raise RuntimeError(
+            "Invalid number of repeats (min: {} - max: {})!".format(
+                repeats, max_repeats
+            )
+        )
+
+    def _run_once():
+        result = run_fn()
+        if not isinstance(result, tuple):
+            return float(result), hosts
+
+        run_hosts = result[1]
+        if hosts is not None and len(run_hosts) == 0:
+            raise RuntimeError(
+                "{} was pinned to {} but reported no hosts!".format(
+                    label, hosts
+                )
+            )
+        return float(result[0]), run_hosts
+
+    start_ts = time()
+    for warmup_num in range(int(num_warmup_runs)):
+        print(
+            "Running {} (warm-up: {}/{})".format(
+                label, warmup_num + 1, num_warmup_runs
+            )
+        )
+        _run_once()
+        if sleep_secs > 0:
+            sleep(sleep_secs)
+
+    exec_times = []
+    outliers = []
+    stop_reason = "max-repeats"
+    while len(exec_times) < max_repeats:
+        run_num = len(exec_times)
+        if run_num >= repeats:
+            inliers = [
+                t for i, t in enumerate(exec_times) if i not in outliers
+            ]
+            if (
+                len(inliers) >= HARNESS_MIN_RUNS_TO_STOP
+                and get_ci_width(inliers) <= target_ci_width
+            ):
+                stop_reason = "ci-width"
+                break
+
+            # Do not start a repetition we do not expect to finish in time
+            elapsed = time() - start_ts
+            if time_budget is not None and (
+                elapsed + exec_times[-1] > float(time_budget)
+            ):
+                stop_reason = "time-budget"
+                break
+
+        print(
+            "Running {} (run: {}/{})".format(
+                label,
+                run_num + 1,
+                (
+                    repeats
+                    if max_repeats == repeats
+                    else "{}-{}".format(repeats, max_repeats)
+                ),
+            )
+        )
+        exec_time, run_hosts = _run_once()
+
+        outlier = is_outlier(exec_time, exec_times)
+        if outlier:
+            print(
+                "WARNING: run {} of {} is an outlier ({:.2f} s)".format(
+                    run_num, label, exec_time
+                )
+            )
+            outliers.append(run_num)
+        exec_times.append(exec_time)
+
+        params = {"Outlier": int(outlier)}
+        if run_hosts is not None:
+            params["Hosts"] = ",".join(sorted(set(run_hosts)))
+        with _RECORD_LOCK:
+            record_fn(run_num, exec_time, params)
+
+        if sleep_secs > 0:
+            sleep(sleep_secs)
+
+    print(
+        "Finished {} after {} runs ({} outliers, stopped by: {})".format(
+            label, len(exec_times), len(outliers), stop_reason
+        )
+    )
+
+    return {
+        "exec-times": exec_times,
+        "outliers": outliers,
+        "stop-reason": stop_reason,
+    }
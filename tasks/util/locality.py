@@ -1,12 +1,15 @@
-from glob import glob
 from numpy import linspace
-from os.path import join
-from pandas import read_csv
 from scipy.interpolate import CubicSpline
+from tasks.util.catalog import (
+    get_makespan_result_file,
+    query_makespan_results,
+)
 from tasks.util.makespan import (
     GRANNY_BASELINES,
     MAKESPAN_RESULTS_DIR,
     NATIVE_BASELINES,
+    OCCUPANCY_INFO_FILE_PREFIX,
+    SCHEDULING_INFO_FILE_PREFIX,
 )
 from tasks.util.math import cum_sum
 from tasks.util.planner import get_xvm_links_from_part
@@ -15,25 +18,33 @@ from tasks.util.plot import (
     get_color_for_baseline,
     get_label_for_baseline,
 )
-from tasks.util.trace import load_task_trace_from_file
+from tasks.util.results_cache import cached_results, read_csv_cached
+from tasks.util.timeseries import (
+    get_idle_cpus_step_function,
+    get_idle_vms_step_function,
+    get_step_function,
+    get_step_function_per_second,
+    read_time_series_per_second,
+)
+from tasks.util.trace import (
+    MAKESPAN_TRACES_DIR,
+    load_task_trace_from_file,
+)
 
 # ----------------------------
 # Plotting utilities
 # ----------------------------
 
 
+@cached_results(MAKESPAN_RESULTS_DIR, MAKESPAN_TRACES_DIR)
 def read_locality_results(num_vms, num_tasks, num_cpus_per_vm, migrate=False):
     workload = "mpi-locality" if not migrate else "mpi-migrate"
 
     # Load results
     result_dict = {}
-    glob_str = "makespan_exec-task-info_*_{}_{}_{}_{}.csv".format(
-        num_vms, workload, num_tasks, num_cpus_per_vm
-    )
-    for csv in glob(join(MAKESPAN_RESULTS_DIR, glob_str)):
-        baseline = csv.split("_")[2]
-        workload = csv.split("_")[4]
-
+    for baseline, csv in query_makespan_results(
+        "exec-task-info", num_vms, workload, num_tasks, num_cpus_per_vm
+    ):
         # -----
         # Results to visualise differences between execution time and time
         # in queue
@@ -41,7 +52,7 @@ def read_locality_results(num_vms, num_tasks, num_cpus_per_vm, migrate=False):
 
         # Results for per-job exec time and time-in-queue
         result_dict[baseline] = {}
-        results = read_csv(csv)
+        results = read_csv_cached(csv)
         task_ids = results["TaskId"].to_list()
         times_exec = results["TimeExecuting"].to_list()
         times_queue = results["TimeInQueue"].to_list()
@@ -72,52 +83,37 @@ def read_locality_results(num_vms, num_tasks, num_cpus_per_vm, migrate=False):
                 num_vms, num_tasks, baseline, time_elapsed_secs
             )
         )
-        if time_elapsed_secs > 1e5:
-            raise RuntimeError(
-                "Measured total time elapsed is too long: {}".format(
-                    time_elapsed_secs
-                )
-            )
 
-        # Dump all data
-        tasks_per_ts = [[] for i in range(time_elapsed_secs)]
-        for index, row in results.iterrows():
-            task_id = row["TaskId"]
-            start_slot = int(row["StartTimeStamp"] - start_ts)
-            end_slot = int(row["EndTimeStamp"] - start_ts)
-            for ind in range(start_slot, end_slot):
-                tasks_per_ts[ind].append(task_id)
-        for tasks in tasks_per_ts:
-            tasks.sort()
-
-        # Prune the timeseries
-        pruned_tasks_per_ts = {}
-        # prev_tasks = []
-        for ts, tasks in enumerate(tasks_per_ts):
-            # NOTE: we are not pruning at the moment
-            pruned_tasks_per_ts[ts] = tasks
-            # if tasks != prev_tasks:
-            # pruned_tasks_per_ts[ts] = tasks
-            # prev_tasks = tasks
-
-        result_dict[baseline]["tasks_per_ts"] = pruned_tasks_per_ts
+        # Start and end timestamp of each task, to build the time-series
+        task_start_ts = results["StartTimeStamp"].to_numpy()
+        task_end_ts = results["EndTimeStamp"].to_numpy()
 
         # -----
         # Results to visualise scheduling info per task
         # -----
 
-        sched_info_csv = "makespan_sched-info_{}_{}_{}_{}_{}.csv".format(
-            baseline, num_vms, workload, num_tasks, num_cpus_per_vm
+        sched_info_csv = get_makespan_result_file(
+            SCHEDULING_INFO_FILE_PREFIX,
+            baseline,
+            num_vms,
+            workload,
+            num_tasks,
+            num_cpus_per_vm,
         )
+        if sched_info_csv is None:
+            raise RuntimeError(
+                "No scheduling info for baseline {} (num VMs: {} - workload: "
+                "{} - num tasks: {})".format(
+                    baseline, num_vms, workload, num_tasks
+                )
+            )
         if baseline not in GRANNY_BASELINES:
             result_dict[baseline]["task_scheduling"] = {}
 
             # We identify VMs by numbers, not IPs
             ip_to_vm = {}
             vm_to_id = {}
-            with open(
-                join(MAKESPAN_RESULTS_DIR, sched_info_csv), "r"
-            ) as sched_fd:
+            with open(sched_info_csv, "r") as sched_fd:
                 # Process the file line by line, as each line will be different in
                 # length
                 for num, line in enumerate(sched_fd):
@@ -188,42 +184,72 @@ def read_locality_results(num_vms, num_tasks, num_cpus_per_vm, migrate=False):
         result_dict[baseline]["ts_idle_vms"] = {}
         total_available_vcpus = num_vms * num_cpus_per_vm
 
-        if baseline in NATIVE_BASELINES:
-            # First, set each timestamp to the total available vCPUs, and
-            # initialise the set of idle vms
-            for ts in result_dict[baseline]["tasks_per_ts"]:
-                result_dict[baseline]["ts_vcpus"][ts] = total_available_vcpus
-                result_dict[baseline]["ts_idle_vms"][ts] = set()
-
-            # Second, for each ts subtract the size of each task in-flight
-            for ts in result_dict[baseline]["tasks_per_ts"]:
-                for t in result_dict[baseline]["tasks_per_ts"][ts]:
-                    result_dict[baseline]["ts_vcpus"][ts] -= task_trace[
-                        int(t)
-                    ].size
-
-                    # In addition, for each task in flight, add the tasks's IPs
-                    # to the host set
-                    for vm_id in result_dict[baseline]["task_scheduling"][
-                        str(int(t))
-                    ]:
-                        result_dict[baseline]["ts_idle_vms"][ts].add(vm_id)
-
-            # Third, express the results as percentages, and the number of
-            # idle VMs as a number (not as a set)
-            for ts in result_dict[baseline]["ts_vcpus"]:
-                result_dict[baseline]["ts_vcpus"][ts] = (
-                    result_dict[baseline]["ts_vcpus"][ts]
-                    / total_available_vcpus
-                ) * 100
-
-                result_dict[baseline]["ts_idle_vms"][ts] = num_vms - len(
-                    result_dict[baseline]["ts_idle_vms"][ts]
-                )
+        # Native baselines record the occupancy metrics online since we
+        # added them to the scheduler state. For older results, we
+        # re-construct them from the executed task info
+        occupancy_csv = get_makespan_result_file(
+            OCCUPANCY_INFO_FILE_PREFIX,
+            baseline,
+            num_vms,
+            workload,
+            num_tasks,
+            num_cpus_per_vm,
+        )
+
+        if baseline in NATIVE_BASELINES and occupancy_csv is not None:
+            occupancy = read_time_series_per_second(
+                occupancy_csv,
+                {
+                    "NumIdleCpus": total_available_vcpus,
+                    "NumIdleVms": num_vms,
+                    "NumCrossVmLinks": 0,
+                },
+                start_ts,
+                time_elapsed_secs,
+            )
+            result_dict[baseline]["ts_vcpus"] = {
+                ts: idle_cpus / total_available_vcpus * 100
+                for ts, idle_cpus in occupancy["NumIdleCpus"].items()
+            }
+            result_dict[baseline]["ts_idle_vms"] = occupancy["NumIdleVms"]
+            result_dict[baseline]["ts_xvm_links"] = occupancy[
+                "NumCrossVmLinks"
+            ]
+        elif baseline in NATIVE_BASELINES:
+            # Build the step functions of idle vCPUs and idle VMs from the
+            # task's start and end events, and sample them once per second
+            times, idle_vcpus = get_idle_cpus_step_function(
+                task_start_ts,
+                task_end_ts,
+                [task_trace[int(t)].size for t in task_ids],
+                total_available_vcpus,
+            )
+            result_dict[baseline]["ts_vcpus"] = get_step_function_per_second(
+                times,
+                idle_vcpus / total_available_vcpus * 100,
+                start_ts,
+                time_elapsed_secs,
+                100,
+            )
+
+            times, idle_vms = get_idle_vms_step_function(
+                task_start_ts,
+                task_end_ts,
+                [
+                    list(result_dict[baseline]["task_scheduling"][str(t)])
+                    for t in task_ids
+                ],
+                num_vms,
+            )
+            result_dict[baseline][
+                "ts_idle_vms"
+            ] = get_step_function_per_second(
+                times, idle_vms, start_ts, time_elapsed_secs, num_vms
+            )
         else:
             # For Granny, the idle vCPUs results are directly available in
             # the file
-            sch_info_csv = read_csv(join(MAKESPAN_RESULTS_DIR, sched_info_csv))
+            sch_info_csv = read_csv_cached(sched_info_csv)
             idle_cpus = (
                 sch_info_csv["NumIdleCpus"] / total_available_vcpus * 100
             ).to_list()
@@ -250,33 +276,39 @@ def read_locality_results(num_vms, num_tasks, num_cpus_per_vm, migrate=False):
         # Results to visualise the # of cross-vm links
         # -----
 
-        if baseline in NATIVE_BASELINES:
-            for ts in result_dict[baseline]["tasks_per_ts"]:
-                result_dict[baseline]["ts_xvm_links"][ts] = 0
-
-            for ts in result_dict[baseline]["tasks_per_ts"]:
-                for t in result_dict[baseline]["tasks_per_ts"][ts]:
-                    if baseline == "slurm":
-                        sched = result_dict[baseline]["task_scheduling"][
-                            str(int(t))
-                        ]
-
-                        # If only scheduled to one VM, no cross-VM links
-                        if len(sched) <= 1:
-                            continue
-
-                        # Add the accumulated to the total tally
-                        result_dict[baseline]["ts_xvm_links"][
-                            ts
-                        ] += get_xvm_links_from_part(list(sched.values()))
-                    elif baseline == "batch":
-                        # Batch baseline is optimal in terms of cross-vm links
-                        task_size = task_trace[int(t)].size
-                        if task_size > 8:
-                            num_links = 8 * (task_size - 8) / 2
-                            result_dict[baseline]["ts_xvm_links"][
-                                ts
-                            ] += num_links
+        if baseline in NATIVE_BASELINES and occupancy_csv is None:
+            # First, work out the cross-VM links of each task, which are
+            # constant while the task is in-flight
+            xvm_links_per_task = []
+            for t in task_ids:
+                num_links = 0
+                if baseline == "slurm":
+                    sched = result_dict[baseline]["task_scheduling"][str(t)]
+
+                    # If only scheduled to one VM, no cross-VM links
+                    if len(sched) > 1:
+                        num_links = get_xvm_links_from_part(
+                            list(sched.values())
+                        )
+                elif baseline == "batch":
+                    # Batch baseline fills whole VMs in order (as in
+                    # `SchedulerState.add_in_flight_task`)
+                    task_size = task_trace[int(t)].size
+                    part = [num_cpus_per_vm] * (task_size // num_cpus_per_vm)
+                    if task_size % num_cpus_per_vm > 0:
+                        part.append(task_size % num_cpus_per_vm)
+                    num_links = get_xvm_links_from_part(part)
+                xvm_links_per_task.append(num_links)
+
+            # Second, add them up over time
+            times, xvm_links = get_step_function(
+                task_start_ts, task_end_ts, xvm_links_per_task
+            )
+            result_dict[baseline][
+                "ts_xvm_links"
+            ] = get_step_function_per_second(
+                times, xvm_links, start_ts, time_elapsed_secs, 0
+            )
 
     return result_dict
 
@@ -1,11 +1,17 @@
-from math import ceil, floor
 from os import makedirs
-from os.path import join
+from os.path import exists, join
+from tasks.util.catalog import RESULT_KIND, register_file
 from tasks.util.env import (
     PLOTS_ROOT,
     RESULTS_DIR,
 )
 from tasks.util.openmpi import get_native_mpi_pods_ip_to_vm
+from tasks.util.results_store import init_results, record_run
+from tasks.util.timeseries import (
+    get_idle_cpus_step_function,
+    get_step_function_per_second,
+    round_to_whole_secs,
+)
 
 # Directories
 MAKESPAN_RESULTS_DIR = join(RESULTS_DIR, "makespan")
@@ -15,6 +21,8 @@ MAKESPAN_PLOTS_DIR = join(PLOTS_ROOT, "makespan")
 IDLE_CORES_FILE_PREFIX = "idle-cores"
 EXEC_TASK_INFO_FILE_PREFIX = "exec-task-info"
 SCHEDULING_INFO_FILE_PREFIX = "sched-info"
+FRAGMENTATION_INFO_FILE_PREFIX = "frag-info"
+OCCUPANCY_INFO_FILE_PREFIX = "occupancy-info"
 MAKESPAN_FILE_PREFIX = "makespan"
 
 # Allowed system baselines:
@@ -41,22 +49,26 @@ MPI_MIGRATE_WORKLOADS = ["mpi-locality", "mpi-evict", "mpi-spot"]
 MPI_WORKLOADS = ["mpi"] + MPI_MIGRATE_WORKLOADS
 OPENMP_WORKLOADS = ["omp", "omp-elastic"]
 
+# Spot VM fault-injection schedule (for `mpi-spot`): every period, we notify
+# a quarter of the VMs that they will be evicted, and evict them after the
+# grace period
+SPOT_FAULT_INJECTION_PERIOD_SECS = 60
+SPOT_HOST_GRACE_PERIOD_SECS = 60
+
+
+def get_num_spot_faults(num_vms):
+    """
+    Number of VMs we evict every fault-injection period
+    """
+    return int(num_vms / 4)
+
 
 def init_csv_file(baseline, num_vms, trace_str, num_tasks_per_user=None):
     makedirs(MAKESPAN_RESULTS_DIR, exist_ok=True)
 
-    # Idle Cores file
-    csv_name_ic = "makespan_{}_{}_{}_{}".format(
-        IDLE_CORES_FILE_PREFIX,
-        baseline,
-        num_vms
-        if num_tasks_per_user is None
-        else "{}vms_{}tpusr".format(num_vms, num_tasks_per_user),
-        get_trace_ending(trace_str),
-    )
-    ic_file = join(MAKESPAN_RESULTS_DIR, csv_name_ic)
-    with open(ic_file, "w") as out_file:
-        out_file.write("TimeStampSecs,NumIdleCores\n")
+    # We record the occupancy online (see `write_occupancy_metrics_to_csv`),
+    # so we only create the idle cores file if we rebuild it post-mortem
+    # (see `init_idle_cores_csv_file`)
 
     # Executed task info file
     csv_name = "makespan_{}_{}_{}_{}".format(
@@ -90,12 +102,40 @@ def init_csv_file(baseline, num_vms, trace_str, num_tasks_per_user=None):
             ips, vms = get_native_mpi_pods_ip_to_vm("makespan")
             ip_to_vm = ["{},{}".format(ip, vm) for ip, vm in zip(ips, vms)]
             out_file.write(",".join(ip_to_vm) + "\n")
-    else:
-        with open(csv_file, "w") as out_file:
-            out_file.write(
-                "TimeStampSecs,NumIdleVms,NumIdleCpus,NumCrossVmLinks\n"
-            )
-            out_file.write
+
+        # For native baselines, the scheduler keeps the occupancy metrics
+        # itself, and records them in a file with the same format than the
+        # one we use for Granny's scheduling info
+        csv_name = "makespan_{}_{}_{}_{}".format(
+            OCCUPANCY_INFO_FILE_PREFIX,
+            baseline,
+            num_vms
+            if num_tasks_per_user is None
+            else "{}vms_{}tpusr".format(num_vms, num_tasks_per_user),
+            get_trace_ending(trace_str),
+        )
+        csv_file = join(MAKESPAN_RESULTS_DIR, csv_name)
+
+    with open(csv_file, "w") as out_file:
+        out_file.write(
+            "TimeStampSecs,NumIdleVms,NumIdleCpus,NumCrossVmLinks\n"
+        )
+
+    # Fragmentation info file
+    csv_name = "makespan_{}_{}_{}_{}".format(
+        FRAGMENTATION_INFO_FILE_PREFIX,
+        baseline,
+        num_vms
+        if num_tasks_per_user is None
+        else "{}vms_{}tpusr".format(num_vms, num_tasks_per_user),
+        get_trace_ending(trace_str),
+    )
+    csv_file = join(MAKESPAN_RESULTS_DIR, csv_name)
+    with open(csv_file, "w") as out_file:
+        out_file.write(
+            "TimeStampSecs,LargestPlaceableJob,LargestLocalJob,"
+            "ExternalFragmentation,FreeSlotScatter\n"
+        )
 
     # Makespan file
     # In some fault-tolerant baselines we cannot only rely on the executed task
@@ -113,6 +153,30 @@ def init_csv_file(baseline, num_vms, trace_str, num_tasks_per_user=None):
     with open(csv_file, "w") as out_file:
         out_file.write("MakespanSecs\n")
 
+    init_results(csv_file)
+
+
+def init_idle_cores_csv_file(
+    baseline, num_vms, trace_str, num_tasks_per_user=None
+):
+    """
+    Create the idle cores file, to rebuild the number of idle cores from the
+    executed task info of an old run
+    """
+    makedirs(MAKESPAN_RESULTS_DIR, exist_ok=True)
+
+    csv_name = "makespan_{}_{}_{}_{}".format(
+        IDLE_CORES_FILE_PREFIX,
+        baseline,
+        num_vms
+        if num_tasks_per_user is None
+        else "{}vms_{}tpusr".format(num_vms, num_tasks_per_user),
+        get_trace_ending(trace_str),
+    )
+    ic_file = join(MAKESPAN_RESULTS_DIR, csv_name)
+    with open(ic_file, "w") as out_file:
+        out_file.write("TimeStampSecs,NumIdleCores\n")
+
 
 def write_line_to_csv(
     baseline, exp_key, num_vms, num_tasks_per_user, trace_str, *args
@@ -160,6 +224,30 @@ def write_line_to_csv(
         else:
             with open(makespan_file, "a") as out_file:
                 out_file.write("{},{},{},{}\n".format(*args))
+    elif exp_key == OCCUPANCY_INFO_FILE_PREFIX:
+        csv_name = "makespan_{}_{}_{}_{}".format(
+            OCCUPANCY_INFO_FILE_PREFIX,
+            baseline,
+            num_vms
+            if num_tasks_per_user is None
+            else "{}vms_{}tpusr".format(num_vms, num_tasks_per_user),
+            get_trace_ending(trace_str),
+        )
+        makespan_file = join(MAKESPAN_RESULTS_DIR, csv_name)
+        with open(makespan_file, "a") as out_file:
+            out_file.write("{},{},{},{}\n".format(*args))
+    elif exp_key == FRAGMENTATION_INFO_FILE_PREFIX:
+        csv_name = "makespan_{}_{}_{}_{}".format(
+            FRAGMENTATION_INFO_FILE_PREFIX,
+            baseline,
+            num_vms
+            if num_tasks_per_user is None
+            else "{}vms_{}tpusr".format(num_vms, num_tasks_per_user),
+            get_trace_ending(trace_str),
+        )
+        makespan_file = join(MAKESPAN_RESULTS_DIR, csv_name)
+        with open(makespan_file, "a") as out_file:
+            out_file.write("{},{},{},{},{}\n".format(*args))
     elif exp_key == MAKESPAN_FILE_PREFIX:
         csv_name = "makespan_{}_{}_{}_{}".format(
             MAKESPAN_FILE_PREFIX,
@@ -173,6 +261,61 @@ def write_line_to_csv(
         with open(makespan_file, "a") as out_file:
             out_file.write("{}\n".format(*args))
 
+        record_run(
+            "makespan",
+            baseline,
+            {"MakespanSecs": args[0]},
+            workload=get_workload_from_trace(trace_str),
+            size=num_vms,
+            params={
+                "NumTasks": get_num_tasks_from_trace(trace_str),
+                "NumCpusPerVm": get_num_cpus_per_vm_from_trace(trace_str),
+                "NumTasksPerUser": num_tasks_per_user,
+            },
+            source=makespan_file,
+        )
+
+
+def register_results_in_catalog(
+    baseline, num_vms, trace_str, num_tasks_per_user=None
+):
+    """
+    Record all the result files of one run in the catalog. Call it once the
+    run has finished and all files have been written
+    """
+    for prefix in [
+        IDLE_CORES_FILE_PREFIX,
+        EXEC_TASK_INFO_FILE_PREFIX,
+        SCHEDULING_INFO_FILE_PREFIX,
+        FRAGMENTATION_INFO_FILE_PREFIX,
+        OCCUPANCY_INFO_FILE_PREFIX,
+        MAKESPAN_FILE_PREFIX,
+    ]:
+        csv_name = "makespan_{}_{}_{}_{}".format(
+            prefix,
+            baseline,
+            num_vms
+            if num_tasks_per_user is None
+            else "{}vms_{}tpusr".format(num_vms, num_tasks_per_user),
+            get_trace_ending(trace_str),
+        )
+        csv_file = join(MAKESPAN_RESULTS_DIR, csv_name)
+        if not exists(csv_file):
+            continue
+
+        register_file(
+            csv_file,
+            RESULT_KIND,
+            experiment="makespan",
+            prefix=prefix,
+            baseline=baseline,
+            workload=get_workload_from_trace(trace_str),
+            num_vms=int(num_vms),
+            num_tasks=get_num_tasks_from_trace(trace_str),
+            num_cpus_per_vm=get_num_cpus_per_vm_from_trace(trace_str),
+            num_tasks_per_user=num_tasks_per_user,
+        )
+
 
 # ----------------------------
 # Trace file name manipulation
@@ -229,35 +372,12 @@ def get_idle_core_count_from_task_info(
 ):
     """
     Given a map of <task_id, ExecutedTaskInfo> work out the number of idle
-    cores in the system from the first task's start timestap, to the last
-    task's end timestamp. This method is quite inneficient in terms of
-    complexity, but it happens post-mortem so unless its very bad we don't
-    really care
+    cores in the system, once per second, from the first task's start
+    timestamp, to the last task's end timestamp
     """
-    # First, work out the total time elapsed between all the executed tasks
-    # and divide it in one second slots
-    min_start_ts = min(
-        [et.exec_start_ts for et in executed_task_info.values()]
-    )
-    max_end_ts = max([et.exec_end_ts for et in executed_task_info.values()])
-    time_elapsed_secs = int(max_end_ts - min_start_ts)
-    if time_elapsed_secs > 1e5:
-        raise RuntimeError(
-            "Measured total time elapsed is too long: {}".format(
-                time_elapsed_secs
-            )
-        )
-
-    # Initialise each time slot to the maximum number of cores
-    num_idle_cores_per_time_step = {}
-    for ts in range(time_elapsed_secs):
-        num_idle_cores_per_time_step[ts] = num_vms * num_cpus_per_vm
-
-    # Then, for each task, subtract its size to all the seconds it elapsed. We
-    # are conservative here and round up for start times, and down for end
-    # times. If this becomes a problem, we can always use a smaller time
-    # differential
-    for task_id in executed_task_info:
+    task_ids = list(executed_task_info.keys())
+    task_sizes = []
+    for task_id in task_ids:
         # Retrieve original task and assert it is the right one
         task = task_trace[task_id]
         if task.task_id != task_id:
@@ -274,24 +394,23 @@ def get_idle_core_count_from_task_info(
         # just subtract the container size in case of overcomitment
         if task.app == "omp" and not baseline == "granny":
             task_size = min(task.size, num_cpus_per_vm)
+        task_sizes.append(task_size)
+
+    start_ts = [executed_task_info[t].exec_start_ts for t in task_ids]
+    end_ts = [executed_task_info[t].exec_end_ts for t in task_ids]
+    min_start_ts = min(start_ts)
+    time_elapsed_secs = int(max(end_ts) - min_start_ts)
+
+    total_cpus = num_vms * num_cpus_per_vm
+    times, idle_cores = get_idle_cpus_step_function(
+        *round_to_whole_secs(start_ts, end_ts, min_start_ts),
+        task_sizes,
+        total_cpus,
+    )
 
-        # Get the start and end ts as offsets from our global minimum timestamp
-        start_t = executed_task_info[task_id].exec_start_ts - min_start_ts
-        end_t = executed_task_info[task_id].exec_end_ts - min_start_ts
-
-        # Be conservative, and round the start timestamp up and the end
-        # timestamp down to prevent double-counting
-        start_t = ceil(start_t)
-        end_t = floor(end_t)
-
-        # Finally, subtract the task size from all the time slots during which
-        # the task was in-flight
-        while start_t < end_t:
-            if start_t not in num_idle_cores_per_time_step:
-                raise RuntimeError(
-                    "Time differential ({}) not in range!".format(start_t)
-                )
-            num_idle_cores_per_time_step[start_t] -= task_size
-            start_t += 1
-
-    return num_idle_cores_per_time_step
+    return {
+        ts: int(num_idle_cores)
+        for ts, num_idle_cores in get_step_function_per_second(
+            times, idle_cores, min_start_ts, time_elapsed_secs, total_cpus
+        ).items()
+    }
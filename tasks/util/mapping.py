@@ -0,0 +1,256 @@
+from numpy import (
+    arange,
+    argmax,
+    argsort,
+    asarray,
+    diag,
+    eye,
+    fill_diagonal,
+    full,
+    inf,
+    ix_,
+    repeat,
+    where,
+    zeros,
+)
+from scipy.linalg import eigh
+from scipy.sparse import issparse
+
+"""
+Communication-aware rank-to-host mapping. Given a rank x rank communication
+matrix (e.g. message counts from an execution graph, see
+`tasks.lammps.graph.get_mpi_comm_matrices`) and the number of free slots in
+each host, we look for a mapping of ranks to hosts that minimises the volume
+of cross-host messages.
+
+We seed the mapping with recursive spectral bisection, and by growing one
+host at a time with the ranks that talk the most to the ranks already in it.
+We refine each seed with Kernighan-Lin style passes of single-rank moves (to
+hosts with free slots) and pairwise swaps, always taking the move with the
+largest gain. We also refine the contiguous mapping (the one we use by
+default), and keep the best of all, so the result is never worse than
+contiguous placement.
+"""
+
+# Maximum number of moves/swaps per refinement, as a multiple of the number
+# of ranks
+MAX_REFINE_MOVES_PER_RANK = 4
+
+
+def _get_symmetric_weights(comm_matrix):
+    """
+    Cross-host volume only depends on the total traffic between two ranks,
+    in either direction
+    """
+    if issparse(comm_matrix):
+        comm_matrix = comm_matrix.toarray()
+    comm_matrix = asarray(comm_matrix, dtype=float)
+    assert (
+        comm_matrix.ndim == 2 and comm_matrix.shape[0] == comm_matrix.shape[1]
+    ), "Communication matrix must be square (got: {})".format(
+        comm_matrix.shape
+    )
+
+    weights = comm_matrix + comm_matrix.T
+    fill_diagonal(weights, 0)
+    return weights
+
+
+def get_cross_host_volume(comm_matrix, rank_to_host):
+    """
+    Total volume of the messages between ranks in different hosts
+    """
+    if issparse(comm_matrix):
+        coo = comm_matrix.tocoo()
+        rank_to_host = asarray(rank_to_host)
+        is_xhost = rank_to_host[coo.row] != rank_to_host[coo.col]
+        return float(coo.data[is_xhost].sum())
+
+    comm_matrix = asarray(comm_matrix, dtype=float)
+    rank_to_host = asarray(rank_to_host)
+    is_xhost = rank_to_host[:, None] != rank_to_host[None, :]
+    return float(comm_matrix[is_xhost].sum())
+
+
+def get_contiguous_mapping(num_ranks, free_slots):
+    """
+    Map ranks to hosts in order, filling each host before moving to the next
+    one (i.e. what we get from `generate_host_list`)
+    """
+    free_slots = asarray(free_slots, dtype=int)
+    assert (
+        free_slots.sum() >= num_ranks
+    ), "Not enough free slots (have: {} - need: {})".format(
+        free_slots.sum(), num_ranks
+    )
+
+    return repeat(range(len(free_slots)), free_slots)[:num_ranks]
+
+
+def _get_greedy_mapping(weights, free_slots):
+    """
+    Fill hosts one at a time (largest first), each time taking the unmapped
+    rank with most traffic to the ranks already in the host. We start each
+    host with the unmapped rank with most traffic overall
+    """
+    num_ranks = weights.shape[0]
+    rank_to_host = full(num_ranks, -1, dtype=int)
+    is_mapped = zeros(num_ranks, dtype=bool)
+    num_mapped = 0
+
+    for host in argsort(-asarray(free_slots), kind="stable"):
+        if num_mapped == num_ranks:
+            break
+
+        to_host = zeros(num_ranks)
+        for _ in range(min(int(free_slots[host]), num_ranks - num_mapped)):
+            if to_host[~is_mapped].max() > 0:
+                scores = where(is_mapped, -inf, to_host)
+            else:
+                scores = where(is_mapped, -inf, weights.sum(axis=1))
+            rank = int(argmax(scores))
+
+            rank_to_host[rank] = host
+            is_mapped[rank] = True
+            to_host += weights[rank]
+            num_mapped += 1
+
+    return rank_to_host
+
+
+def _get_bisection_mapping(weights, free_slots):
+    """
+    Recursive spectral bisection: split the hosts in two halves, and the
+    ranks in two groups (in proportion to the free slots in each half) along
+    the Fiedler vector of the communication graph's Laplacian, which keeps
+    strongly connected ranks on the same side
+    """
+    rank_to_host = full(weights.shape[0], -1, dtype=int)
+    _bisect(
+        weights,
+        asarray(free_slots, dtype=int),
+        arange(weights.shape[0]),
+        arange(len(free_slots)),
+        rank_to_host,
+    )
+    return rank_to_host
+
+
+def _bisect(weights, free_slots, ranks, hosts, rank_to_host):
+    if len(hosts) == 1 or len(ranks) == 0:
+        rank_to_host[ranks] = hosts[0]
+        return
+
+    left_hosts = hosts[: len(hosts) // 2]
+    right_hosts = hosts[len(hosts) // 2 :]
+    left_slots = int(free_slots[left_hosts].sum())
+    right_slots = int(free_slots[right_hosts].sum())
+    num_left = int(round(len(ranks) * left_slots / (left_slots + right_slots)))
+    num_left = min(max(num_left, len(ranks) - right_slots), left_slots)
+
+    if len(ranks) > 2:
+        sub_weights = weights[ix_(ranks, ranks)]
+        laplacian = diag(sub_weights.sum(axis=1)) - sub_weights
+        _, fiedler = eigh(laplacian, subset_by_index=[1, 1])
+        order = argsort(fiedler[:, 0], kind="stable")
+    else:
+        order = arange(len(ranks))
+
+    _bisect(
+        weights, free_slots, ranks[order[:num_left]], left_hosts, rank_to_host
+    )
+    _bisect(
+        weights, free_slots, ranks[order[num_left:]], right_hosts, rank_to_host
+    )
+
+
+def _refine_mapping(weights, free_slots, rank_to_host):
+    """
+    Greedily apply the single-rank move or pairwise swap with the largest
+    reduction in cross-host volume, until no move reduces it
+    """
+    num_ranks = weights.shape[0]
+    num_hosts = len(free_slots)
+    rank_to_host = rank_to_host.copy()
+
+    host_one_hot = eye(num_hosts)[rank_to_host]
+    # to_host[r, h] is the traffic between rank r and the ranks in host h
+    to_host = weights @ host_one_hot
+    num_free = asarray(free_slots, dtype=int) - host_one_hot.sum(
+        axis=0
+    ).astype(int)
+
+    for _ in range(MAX_REFINE_MOVES_PER_RANK * num_ranks):
+        ranks = range(num_ranks)
+        # move_gain[r, h] is the reduction in cross-host volume from moving
+        # rank r to host h
+        move_gain = to_host - to_host[ranks, rank_to_host][:, None]
+
+        best_move = where(num_free[None, :] > 0, move_gain, -inf)
+        best_move[ranks, rank_to_host] = -inf
+        move_rank, move_host = divmod(int(argmax(best_move)), num_hosts)
+        move_gain_value = best_move[move_rank, move_host]
+
+        # swap_gain[a, b] is the reduction from swapping ranks a and b
+        swap_gain = (
+            move_gain[:, rank_to_host]
+            + move_gain[:, rank_to_host].T
+            - 2 * weights
+        )
+        swap_gain[rank_to_host[:, None] == rank_to_host[None, :]] = -inf
+        swap_a, swap_b = divmod(int(argmax(swap_gain)), num_ranks)
+        swap_gain_value = swap_gain[swap_a, swap_b]
+
+        if max(move_gain_value, swap_gain_value) <= 1e-9:
+            break
+
+        if move_gain_value >= swap_gain_value:
+            moves = [(move_rank, move_host)]
+        else:
+            moves = [
+                (swap_a, rank_to_host[swap_b]),
+                (swap_b, rank_to_host[swap_a]),
+            ]
+
+        for rank, new_host in moves:
+            old_host = rank_to_host[rank]
+            to_host[:, old_host] -= weights[:, rank]
+            to_host[:, new_host] += weights[:, rank]
+            num_free[old_host] += 1
+            num_free[new_host] -= 1
+            rank_to_host[rank] = new_host
+
+    return rank_to_host
+
+
+def get_comm_aware_mapping(comm_matrix, free_slots):
+    """
+    Return an array with the host index (in `free_slots`) of each rank, that
+    minimises the cross-host volume in the communication matrix
+    """
+    weights = _get_symmetric_weights(comm_matrix)
+    num_ranks = weights.shape[0]
+    contiguous = get_contiguous_mapping(num_ranks, free_slots)
+
+    candidates = [
+        _refine_mapping(weights, free_slots, contiguous),
+        _refine_mapping(
+            weights, free_slots, _get_greedy_mapping(weights, free_slots)
+        ),
+        _refine_mapping(
+            weights, free_slots, _get_bisection_mapping(weights, free_slots)
+        ),
+    ]
+    volumes = [
+        get_cross_host_volume(weights, mapping) for mapping in candidates
+    ]
+
+    return candidates[volumes.index(min(volumes))]
+
+
+def get_host_list_from_mapping(rank_to_host, hosts):
+    """
+    Turn a rank-to-host mapping into a host list (i.e. the host IP for each
+    rank, the format the planner expects)
+    """
+    return [hosts[host] for host in rank_to_host]
@@ -0,0 +1,177 @@
+from numpy import (
+    asarray,
+    count_nonzero,
+    divide,
+    int64,
+    where,
+    zeros,
+    zeros_like,
+)
+from tasks.util.topology import get_num_links
+
+"""
+Cluster occupancy metrics engine. We represent the state of the cluster at a
+given point in time as an occupancy matrix of shape (num_apps, num_hosts)
+where entry (i, j) is the number of processes (or threads) of app i running
+in host j. All the metrics below operate over the last two axes, so they work
+the same on a single snapshot, or on a stack of snapshots with shape
+(num_snapshots, num_apps, num_hosts).
+"""
+
+
+def get_occupancy_matrix_from_in_flight_apps(in_flight_apps, host_ips=None):
+    """
+    Build the (num_apps, num_hosts) occupancy matrix from a planner's
+    in-flight apps snapshot
+
+    If a list of host IPs is provided, columns follow its order (and it is
+    extended in-place with any IP we have not seen before). This way, we can
+    keep a consistent host ordering across snapshots
+    """
+    if host_ips is None:
+        host_ips = []
+    host_idx = {ip: idx for idx, ip in enumerate(host_ips)}
+
+    for app in in_flight_apps.apps:
+        for ip in app.hostIps:
+            if ip not in host_idx:
+                host_idx[ip] = len(host_ips)
+                host_ips.append(ip)
+
+    occupancy = zeros((len(in_flight_apps.apps), len(host_ips)), dtype=int64)
+    for app_idx, app in enumerate(in_flight_apps.apps):
+        for ip in app.hostIps:
+            occupancy[app_idx, host_idx[ip]] += 1
+
+    return occupancy, host_ips
+
+
+def get_occupancy_matrix_from_sched_decisions(sched_decisions, host_ips=None):
+    """
+    Build the (num_apps, num_hosts) occupancy matrix from a list of native
+    scheduling decisions, where each decision is a list of (ip, slots) pairs
+    """
+    if host_ips is None:
+        host_ips = []
+    host_idx = {ip: idx for idx, ip in enumerate(host_ips)}
+
+    for sched_decision in sched_decisions:
+        for ip, _ in sched_decision:
+            if ip not in host_idx:
+                host_idx[ip] = len(host_ips)
+                host_ips.append(ip)
+
+    occupancy = zeros((len(sched_decisions), len(host_ips)), dtype=int64)
+    for app_idx, sched_decision in enumerate(sched_decisions):
+        for ip, slots in sched_decision:
+            occupancy[app_idx, host_idx[ip]] += int(slots)
+
+    return occupancy, host_ips
+
+
+def stack_occupancy_matrices(occupancies):
+    """
+    Stack a list of occupancy matrices (with possibly different number of
+    apps and hosts) into one (num_snapshots, max_apps, max_hosts) array by
+    zero-padding. Zero rows and columns do not change any of the metrics, but
+    all matrices must share the same host ordering for the per-host metrics to
+    be meaningful (see `host_ips` in the builders above)
+    """
+    max_apps = max([occ.shape[0] for occ in occupancies], default=0)
+    max_hosts = max([occ.shape[1] for occ in occupancies], default=0)
+
+    stacked = zeros((len(occupancies), max_apps, max_hosts), dtype=int64)
+    for idx, occ in enumerate(occupancies):
+        stacked[idx, : occ.shape[0], : occ.shape[1]] = occ
+
+    return stacked
+
+
+def get_xvm_links_per_app(occupancy):
+    """
+    Number of cross-VM links for each app. If an app has n_j processes in
+    host j, and N processes in total, each process links to all the processes
+    outside its host, so the number of links is:
+        sum_j n_j * (N - n_j) / 2 = (N^2 - sum_j n_j^2) / 2
+    """
+    return get_num_links(occupancy)
+
+
+def get_xvm_links(occupancy):
+    """
+    Total number of cross-VM links in the cluster
+    """
+    return get_xvm_links_per_app(occupancy).sum(axis=-1)
+
+
+def get_used_cpus_per_host(occupancy):
+    return asarray(occupancy, dtype=int64).sum(axis=-2)
+
+
+def get_idle_cpus(occupancy, num_vms, num_cpus_per_vm):
+    total_cpus = int(num_vms) * int(num_cpus_per_vm)
+    return total_cpus - asarray(occupancy, dtype=int64).sum(axis=(-2, -1))
+
+
+def get_idle_vms(occupancy, num_vms):
+    """
+    Number of VMs with no process running on them. Hosts that do not appear
+    in the occupancy matrix are considered idle
+    """
+    used_per_host = get_used_cpus_per_host(occupancy)
+    return int(num_vms) - count_nonzero(used_per_host, axis=-1)
+
+
+def get_fragmentation_index(occupancy, num_vms, num_cpus_per_vm):
+    """
+    Fraction of idle CPUs that are stranded in partially-occupied VMs (i.e.
+    that can not be allocated to a job requesting a full VM). It is 0 if all
+    the idle CPUs are in idle VMs (or there are no idle CPUs), and 1 if every
+    idle CPU lives in a VM that is already running something
+    """
+    used_per_host = get_used_cpus_per_host(occupancy)
+    free_per_host = int(num_cpus_per_vm) - used_per_host
+    stranded = where(used_per_host > 0, free_per_host, 0).sum(axis=-1)
+    idle_cpus = get_idle_cpus(occupancy, num_vms, num_cpus_per_vm)
+
+    stranded = asarray(stranded, dtype=float)
+    idle_cpus = asarray(idle_cpus, dtype=float)
+    return divide(
+        stranded,
+        idle_cpus,
+        out=zeros_like(stranded),
+        where=idle_cpus > 0,
+    )
+
+
+def get_occupancy_metrics(occupancy, num_vms, num_cpus_per_vm):
+    """
+    Compute all cluster metrics for one (or a stack of) occupancy matrices
+    in one go. Returns a dictionary of scalars (or arrays, for stacks)
+    """
+    return {
+        "idle_vms": get_idle_vms(occupancy, num_vms),
+        "idle_cpus": get_idle_cpus(occupancy, num_vms, num_cpus_per_vm),
+        "xvm_links": get_xvm_links(occupancy),
+        "fragmentation": get_fragmentation_index(
+            occupancy, num_vms, num_cpus_per_vm
+        ),
+    }
+
+
+def get_occupancy_metrics_from_snapshots(
+    in_flight_apps_list, num_vms, num_cpus_per_vm
+):
+    """
+    Compute the cluster metrics for a list of in-flight app snapshots (e.g.
+    recorded during an experiment) using one consistent host ordering
+    """
+    host_ips = []
+    occupancies = [
+        get_occupancy_matrix_from_in_flight_apps(ifa, host_ips)[0]
+        for ifa in in_flight_apps_list
+    ]
+
+    return get_occupancy_metrics(
+        stack_occupancy_matrices(occupancies), num_vms, num_cpus_per_vm
+    )
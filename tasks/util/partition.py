@@ -0,0 +1,120 @@
+from functools import lru_cache
+from random import sample
+
+"""
+Integer partitions, i.e. all the ways we can spread an application's
+processes across hosts, irrespective of which host is which. We represent a
+partition as a tuple with its parts in ascending order (e.g. `(2, 3, 3)` for
+eight processes in three hosts), and enumerate them in lexicographic order.
+
+We prune by the maximum part size (i.e. slots per host) and the maximum
+number of parts (i.e. number of hosts) during enumeration, and never explore
+branches that can not be completed. Counting is memoised, which lets us
+also get the i-th partition directly, and sample partitions uniformly without
+enumerating them all.
+"""
+
+
+@lru_cache(maxsize=None)
+def _count(number, min_part, max_part, max_parts):
+    """
+    Number of partitions of `number` with all parts in [min_part, max_part],
+    and at most `max_parts` parts
+    """
+    if number == 0:
+        return 1
+    if max_parts == 0 or min_part > min(number, max_part):
+        return 0
+
+    count = 0
+    for part in range(min_part, min(number, max_part) + 1):
+        count += _count(number - part, part, max_part, max_parts - 1)
+
+    return count
+
+
+def _get_bounds(number, max_part, max_parts):
+    max_part = number if max_part is None else min(int(max_part), number)
+    max_parts = number if max_parts is None else min(int(max_parts), number)
+    return max_part, max_parts
+
+
+def count_partitions(number, max_part=None, max_parts=None):
+    """
+    Number of partitions of `number`, with at most `max_parts` parts of size
+    at most `max_part`
+    """
+    max_part, max_parts = _get_bounds(number, max_part, max_parts)
+    return _count(int(number), 1, max_part, max_parts)
+
+
+def iter_partitions(number, max_part=None, max_parts=None):
+    """
+    Lazily yield all the partitions of `number`, with at most `max_parts`
+    parts of size at most `max_part`, in lexicographic order
+    """
+    number = int(number)
+    max_part, max_parts = _get_bounds(number, max_part, max_parts)
+
+    def _iter(remaining, min_part, parts_left, prefix):
+        if remaining == 0:
+            yield tuple(prefix)
+            return
+
+        for part in range(min_part, min(remaining, max_part) + 1):
+            if _count(remaining - part, part, max_part, parts_left - 1) == 0:
+                continue
+            prefix.append(part)
+            yield from _iter(remaining - part, part, parts_left - 1, prefix)
+            prefix.pop()
+
+    yield from _iter(number, 1, max_parts, [])
+
+
+def get_partition(number, index, max_part=None, max_parts=None):
+    """
+    Get the `index`-th partition of `number` (in the order of
+    `iter_partitions`) without enumerating the ones before it
+    """
+    number = int(number)
+    max_part, max_parts = _get_bounds(number, max_part, max_parts)
+    num_partitions = _count(number, 1, max_part, max_parts)
+    if index < 0 or index >= num_partitions:
+        raise RuntimeError(
+            "Partition index out of range (index: {} - num. partitions of "
+            "{}: {})".format(index, number, num_partitions)
+        )
+
+    parts = []
+    remaining = number
+    min_part = 1
+    parts_left = max_parts
+    while remaining > 0:
+        for part in range(min_part, min(remaining, max_part) + 1):
+            count = _count(remaining - part, part, max_part, parts_left - 1)
+            if index < count:
+                break
+            index -= count
+
+        parts.append(part)
+        remaining -= part
+        min_part = part
+        parts_left -= 1
+
+    return tuple(parts)
+
+
+def sample_partitions(number, num_samples, max_part=None, max_parts=None):
+    """
+    Sample (uniformly, without replacement) `num_samples` partitions of
+    `number`, returned in the order of `iter_partitions`. If there are not
+    more partitions than samples, return them all
+    """
+    num_partitions = count_partitions(number, max_part, max_parts)
+    if num_partitions <= num_samples:
+        return list(iter_partitions(number, max_part, max_parts))
+
+    return [
+        get_partition(number, index, max_part, max_parts)
+        for index in sorted(sample(range(num_partitions), num_samples))
+    ]
@@ -0,0 +1,194 @@
+from ast import literal_eval
+from glob import glob
+from numpy import asarray, sqrt
+from numpy.linalg import lstsq
+from os.path import basename, join
+from tasks.util.env import RESULTS_DIR
+from tasks.util.migration import MIGRATION_RESULTS_DIR
+from tasks.util.openmpi import OPENMPI_RESULTS_DIR
+from tasks.util.planner import get_xvm_links_from_part
+from tasks.util.results_cache import cached_results
+
+"""
+Placement performance model: runtime as a function of the world size and
+the partition of the ranks across VMs, fitted (per workload) from the oracle
+experiments' results:
+- migration.oracle: `migration_oracle_<workload>_<size>.csv`
+- openmpi.run: `openmpi_oracle_<baseline>.csv` (workload `openmpi-<baseline>`)
+- motivation.ideal: `ideal_crossvm_times_<size>.csv` (workload `ideal`, only
+    the rows that record their partition)
+
+We fit, with least squares:
+    time = a + b / size + c * xvm_links + d * (num_vms - 1)
+i.e. a strong-scaling compute term, a term proportional to the number of
+cross-VM links (the pairs of ranks in different VMs), and a per-VM overhead.
+"""
+
+MOTIVATION_RESULTS_DIR = join(RESULTS_DIR, "motivation")
+
+PLACEMENT_MODEL_FEATURES = ["intercept", "inv-size", "xvm-links", "extra-vms"]
+
+# Same default as the migration oracle
+PLACEMENT_MODEL_DEFAULT_WORKLOAD = "very-network"
+
+
+def get_placement_features(partition):
+    """
+    Features of a partition (the number of ranks in each VM) for the model
+    """
+    size = sum(partition)
+    num_vms = len([p for p in partition if p > 0])
+    return [
+        1.0,
+        1.0 / size,
+        float(get_xvm_links_from_part(partition)),
+        float(num_vms - 1),
+    ]
+
+
+def _parse_partition_line(line):
+    """
+    Parse a `<partition>,<xvm links>,<time>` line, where the partition is a
+    python tuple or list (with commas in it)
+    """
+    part_str, _, time_str = line.strip().rsplit(",", 2)
+    return tuple(literal_eval(part_str.strip('"'))), float(time_str)
+
+
+def _read_partition_csvs(glob_str):
+    samples = []
+    for csv in glob(glob_str):
+        with open(csv, "r") as fh:
+            # Skip the header
+            next(fh, None)
+            for line in fh:
+                if line.strip():
+                    samples.append(_parse_partition_line(line))
+
+    return samples
+
+
+def _read_ideal_csvs():
+    samples = []
+    for csv in glob(join(MOTIVATION_RESULTS_DIR, "ideal_crossvm_times_*.csv")):
+        with open(csv, "r") as fh:
+            header = next(fh, "").strip().split(",")
+            if "Partition" not in header:
+                continue
+
+            part_ind = header.index("Partition")
+            time_ind = header.index("ExecutionTimeSecs")
+            for line in fh:
+                if not line.strip():
+                    continue
+                row = line.strip().split(",")
+                part = tuple(int(p) for p in row[part_ind].split("-"))
+                samples.append((part, float(row[time_ind])))
+
+    return samples
+
+
+def read_placement_samples(workload):
+    """
+    Return a list of (partition, execution time) samples for a workload
+    """
+    if workload == "ideal":
+        return _read_ideal_csvs()
+
+    if workload.startswith("openmpi-"):
+        return _read_partition_csvs(
+            join(
+                OPENMPI_RESULTS_DIR,
+                "openmpi_oracle_{}.csv".format(workload[len("openmpi-") :]),
+            )
+        )
+
+    return _read_partition_csvs(
+        join(
+            MIGRATION_RESULTS_DIR, "migration_oracle_{}_*.csv".format(workload)
+        )
+    )
+
+
+def get_placement_workloads():
+    """
+    All the workloads we have oracle results for
+    """
+    workloads = set()
+    for csv in glob(join(MIGRATION_RESULTS_DIR, "migration_oracle_*.csv")):
+        workloads.add("_".join(basename(csv).split("_")[2:-1]))
+    for csv in glob(join(OPENMPI_RESULTS_DIR, "openmpi_oracle_*.csv")):
+        workloads.add(
+            "openmpi-{}".format(basename(csv)[len("openmpi_oracle_") : -4])
+        )
+    if len(_read_ideal_csvs()) > 0:
+        workloads.add("ideal")
+
+    return sorted(workloads)
+
+
+@cached_results(
+    MIGRATION_RESULTS_DIR, OPENMPI_RESULTS_DIR, MOTIVATION_RESULTS_DIR
+)
+def fit_placement_model(workload):
+    """
+    Fit the placement model for a workload. Returns a dictionary with the
+    coefficient of each feature (in PLACEMENT_MODEL_FEATURES), the root mean
+    squared error of the fit, and the number of samples
+    """
+    samples = read_placement_samples(workload)
+    if len(samples) == 0:
+        raise RuntimeError(
+            "No oracle results to fit the placement model for workload: "
+            "{} (have: {})".format(workload, get_placement_workloads())
+        )
+
+    features = asarray([get_placement_features(part) for part, _ in samples])
+    times = asarray([exec_time for _, exec_time in samples])
+    coeffs, _, _, _ = lstsq(features, times, rcond=None)
+    residuals = times - features @ coeffs
+
+    return {
+        "workload": workload,
+        "coeffs": dict(zip(PLACEMENT_MODEL_FEATURES, coeffs.tolist())),
+        "rmse": float(sqrt((residuals**2).mean())),
+        "num-samples": len(samples),
+    }
+
+
+def predict_runtime(
+    size, partition, workload=PLACEMENT_MODEL_DEFAULT_WORKLOAD, model=None
+):
+    """
+    Predict the runtime (in seconds) of running `size` ranks of a workload
+    with a partition (the number of ranks in each VM)
+    """
+    if sum(partition) != int(size):
+        raise RuntimeError(
+            "Partition {} does not add up to the world size ({})".format(
+                partition, size
+            )
+        )
+
+    if model is None:
+        model = fit_placement_model(workload)
+
+    features = get_placement_features(partition)
+    coeffs = [model["coeffs"][feature] for feature in PLACEMENT_MODEL_FEATURES]
+    return max(sum(f * c for f, c in zip(features, coeffs)), 0)
+
+
+def predict_migration_benefit(
+    size,
+    old_partition,
+    new_partition,
+    workload=PLACEMENT_MODEL_DEFAULT_WORKLOAD,
+):
+    """
+    Predicted reduction in runtime (in seconds, negative if it is slower)
+    from migrating an application from one partition to another
+    """
+    model = fit_placement_model(workload)
+    return predict_runtime(
+        size, old_partition, workload, model=model
+    ) - predict_runtime(size, new_partition, workload, model=model)
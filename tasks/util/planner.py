@@ -3,6 +3,21 @@ from faasmctl.util.planner import (
     get_in_fligh_apps as planner_get_in_fligh_apps,
 )
 from math import ceil
+from tasks.util.fragmentation import (
+    DEFAULT_ADMISSION_POLICY,
+    should_admit_task,
+)
+from tasks.util.mapping import (
+    get_comm_aware_mapping,
+    get_host_list_from_mapping,
+)
+from tasks.util.occupancy import (
+    get_idle_cpus,
+    get_idle_vms,
+    get_occupancy_matrix_from_in_flight_apps,
+    get_xvm_links,
+)
+from tasks.util.topology import FLAT_TOPOLOGY, get_link_cost, get_num_links
 from time import sleep
 
 
@@ -10,20 +25,10 @@ from time import sleep
 def get_num_idle_cpus_from_in_flight_apps(
     num_vms, num_cpus_per_vm, in_flight_apps
 ):
-    total_cpus = int(num_vms) * int(num_cpus_per_vm)
+    occupancy, _ = get_occupancy_matrix_from_in_flight_apps(in_flight_apps)
 
-    worker_occupation = {}
-    total_used_cpus = 0
-    for app in in_flight_apps.apps:
-        for ip in app.hostIps:
-            if ip not in worker_occupation:
-                worker_occupation[ip] = 0
-
-            worker_occupation[ip] += 1
-            total_used_cpus += 1
-
-    num_idle_vms = int(num_vms) - len(worker_occupation.keys())
-    num_idle_cpus = total_cpus - total_used_cpus
+    num_idle_vms = int(get_idle_vms(occupancy, num_vms))
+    num_idle_cpus = int(get_idle_cpus(occupancy, num_vms, num_cpus_per_vm))
 
     return num_idle_vms, num_idle_cpus
 
@@ -38,6 +43,8 @@ def get_num_available_slots_from_in_flight_apps(
     next_task_size=None,
     # Used to make Granny behave like batch (for `mpi-locality`)
     batch=False,
+    # Policy to decide whether to admit the next task (for `mpi-locality`)
+    admission_policy=None,
 ):
     """
     For Granny baselines, we cannot use static knowledge of the
@@ -193,17 +200,26 @@ def get_num_available_slots_from_in_flight_apps(
             sleep(short_sleep_secs)
             continue
 
-        # TODO: decide on the percentage, 10% or 5% ?
-        # with 10% we almost always have perfect locality
-        pctg = 0.05
-        if (
-            next_task_size is not None
-            and not batch
-            and (num_available_slots - next_task_size)
-            < int(num_vms * num_cpus_per_vm * pctg)
-        ):
-            sleep(long_sleep_secs)
-            continue
+        # Decide whether to admit the next task based on the fragmentation
+        # of the cluster (e.g. leave some slack CPUs to help de-fragment)
+        if next_task_size is not None and not batch:
+            if admission_policy is None:
+                admission_policy = DEFAULT_ADMISSION_POLICY
+
+            free_per_host = [
+                num_cpus_per_vm - worker_occupation[ip]
+                for ip in worker_occupation
+            ] + [num_cpus_per_vm] * (
+                num_vms - len(list(worker_occupation.keys()))
+            )
+            if not should_admit_task(
+                admission_policy,
+                free_per_host,
+                next_task_size,
+                num_cpus_per_vm,
+            ):
+                sleep(long_sleep_secs)
+                continue
 
         # If we have made it this far, we are done
         break
@@ -226,35 +242,35 @@ def get_xvm_links_from_part(part):
     Calculate the number of cross-VM links for a given partition
 
     The number of cross-VM links is the sum for each process of all the
-    non-local processes divided by two.
+    non-local processes divided by two (see `tasks.util.topology`)
     """
-    if len(part) == 1:
-        return 0
+    return int(get_num_links(part))
 
-    count = 0
-    for ind in range(len(part)):
-        count += sum(part[0:ind] + part[ind + 1 :]) * part[ind]
 
-    return int(count / 2)
+def get_link_cost_from_part(part, topology=FLAT_TOPOLOGY):
+    """
+    Calculate the cost of the links of a given partition, where part i runs
+    in host i, weighting each link by the highest level of the topology it
+    crosses (with the flat topology, it is the number of cross-VM links)
+    """
+    return float(get_link_cost(part, topology))
 
 
 def get_num_xvm_links_from_in_flight_apps(in_flight_apps):
-    total_xvm_links = 0
-
-    for app in in_flight_apps.apps:
-        app_ocupation = {}
-        for ip in app.hostIps:
-            if ip not in app_ocupation:
-                app_ocupation[ip] = 0
-            app_ocupation[ip] += 1
-
-        part = list(app_ocupation.values())
-        # TODO: delete me
-        #    print("DEBUG - App: {} - Occupation: {} - Part: {} - Links: {}".format(
-        #               app.appId,
-        #               app_ocupation,
-        #               part,
-        #               get_xvm_links_from_part(part)))
-        total_xvm_links += get_xvm_links_from_part(part)
-
-    return total_xvm_links
+    occupancy, _ = get_occupancy_matrix_from_in_flight_apps(in_flight_apps)
+
+    return int(get_xvm_links(occupancy))
+
+
+def get_comm_aware_host_list(comm_matrix):
+    """
+    Get a host list (to pre-load a scheduling decision in the planner) that
+    places the ranks in the communication matrix to minimise the cross-host
+    messages, given the free slots in each available host
+    """
+    avail_hosts = planner_get_available_hosts()
+    host_ips = [host.ip for host in avail_hosts.hosts]
+    free_slots = [host.slots - host.usedSlots for host in avail_hosts.hosts]
+
+    rank_to_host = get_comm_aware_mapping(comm_matrix, free_slots)
+    return get_host_list_from_mapping(rank_to_host, host_ips)
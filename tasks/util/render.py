@@ -0,0 +1,174 @@
+from dataclasses import dataclass, field
+from hashlib import sha256
+from inspect import getsourcefile
+from matplotlib.patches import Patch
+from multiprocessing import cpu_count, get_context
+from os import makedirs, stat
+from os.path import exists, join
+from pickle import HIGHEST_PROTOCOL, dumps as pickle_dumps
+from tasks.util.plot import (
+    DOUBLE_COL_FIGSIZE_THIRD,
+    get_color_for_baseline,
+    get_label_for_baseline,
+    save_plot,
+)
+from typing import Callable, Optional
+
+"""
+Rendering pipeline for plot tasks that draw many figures out of the same
+results. Each figure is declared as an independent job, and we render the
+jobs in a pool of processes (with the non-interactive Agg backend), sharing
+the results with the workers. Lines with many points (e.g. per-second
+time-series) are rasterised to keep the PDFs small and fast to write, and we
+skip figures whose inputs have not changed since we last rendered them.
+"""
+
+# Lines with more points than this are rasterised
+RASTERIZE_MIN_POINTS = 2000
+
+# We store the signature of the inputs of each figure in a hidden file next
+# to the figure itself
+_SIGNATURE_FILE_FORMAT = ".{}.sig"
+
+# Results shared with the worker processes (set in the pool initializer)
+_RENDER_RESULTS = None
+
+
+@dataclass
+class FigureJob:
+    """
+    One figure with one or more panels. Each panel is a pair of
+    (plot_name, kwargs) passed to `plot_fn(plot_name, results, ax, **kwargs)`,
+    and panels are laid out in one row. The legend, if set, is a dictionary
+    with a `workload` and a list of `baselines`, and any other keyword
+    arguments to `fig.legend`
+    """
+
+    plot_name: str
+    plot_fn: Callable
+    panels: list
+    plot_dir: str
+    figsize: Optional[tuple] = DOUBLE_COL_FIGSIZE_THIRD
+    legend: Optional[dict] = field(default=None)
+
+
+def _get_job_signature(job, results_signature):
+    # Also re-render if the code drawing the figure has changed
+    plot_fn_stat = stat(getsourcefile(job.plot_fn))
+    return sha256(
+        "{}:{}:{}:{}:{}:{}:{}".format(
+            results_signature,
+            job.plot_fn.__module__,
+            job.plot_fn.__name__,
+            plot_fn_stat.st_mtime_ns,
+            repr(job.panels),
+            repr(job.figsize),
+            repr(job.legend),
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def _is_job_up_to_date(job, signature):
+    sig_file = join(job.plot_dir, _SIGNATURE_FILE_FORMAT.format(job.plot_name))
+    if not exists(sig_file):
+        return False
+
+    for plot_format in ["png", "pdf"]:
+        plot_file = join(
+            job.plot_dir, "{}.{}".format(job.plot_name, plot_format)
+        )
+        if not exists(plot_file):
+            return False
+
+    with open(sig_file, "r") as fh:
+        return fh.read().strip() == signature
+
+
+def _rasterize_dense_lines(ax):
+    for line in ax.get_lines():
+        if len(line.get_xdata()) > RASTERIZE_MIN_POINTS:
+            line.set_rasterized(True)
+
+
+def _init_render_worker(results):
+    global _RENDER_RESULTS
+    _RENDER_RESULTS = results
+
+    # Workers never show figures, so use the non-interactive backend
+    from matplotlib import use as mpl_use
+
+    mpl_use("Agg")
+
+
+def _render_figure(job, signature):
+    from matplotlib.pyplot import close, subplots
+
+    if job.figsize is None:
+        fig, axes = subplots(nrows=1, ncols=len(job.panels), squeeze=False)
+    else:
+        fig, axes = subplots(
+            nrows=1, ncols=len(job.panels), figsize=job.figsize, squeeze=False
+        )
+
+    for ax, (plot_name, kwargs) in zip(axes[0], job.panels):
+        job.plot_fn(plot_name, _RENDER_RESULTS, ax, **kwargs)
+        _rasterize_dense_lines(ax)
+
+    if job.legend is not None:
+        legend_kwargs = dict(job.legend)
+        workload = legend_kwargs.pop("workload")
+        baselines = legend_kwargs.pop("baselines")
+        legend_entries = [
+            Patch(
+                color=get_color_for_baseline(workload, baseline),
+                label=get_label_for_baseline(workload, baseline),
+            )
+            for baseline in baselines
+        ]
+        fig.legend(handles=legend_entries, **legend_kwargs)
+
+    makedirs(job.plot_dir, exist_ok=True)
+    save_plot(fig, job.plot_dir, job.plot_name)
+    close(fig)
+
+    sig_file = join(job.plot_dir, _SIGNATURE_FILE_FORMAT.format(job.plot_name))
+    with open(sig_file, "w") as fh:
+        fh.write(signature)
+
+    return job.plot_name
+
+
+def render_figures(jobs, results, num_procs=None, force=False):
+    """
+    Render a list of FigureJobs that draw out of the same results. Set
+    `force` to re-render figures even if their inputs have not changed
+    """
+    results_signature = sha256(
+        pickle_dumps(results, protocol=HIGHEST_PROTOCOL)
+    ).hexdigest()
+
+    pending = []
+    for job in jobs:
+        signature = _get_job_signature(job, results_signature)
+        if not force and _is_job_up_to_date(job, signature):
+            print("Skipping up-to-date plot: {}".format(job.plot_name))
+            continue
+        pending.append((job, signature))
+
+    if len(pending) == 0:
+        return
+
+    if num_procs is None:
+        num_procs = min(len(pending), cpu_count())
+
+    if int(num_procs) <= 1:
+        _init_render_worker(results)
+        for job, signature in pending:
+            _render_figure(job, signature)
+        return
+
+    # Fork so that the workers inherit the results without pickling them
+    with get_context("fork").Pool(
+        int(num_procs), initializer=_init_render_worker, initargs=(results,)
+    ) as pool:
+        pool.starmap(_render_figure, pending)
@@ -0,0 +1,214 @@
+from copy import deepcopy
+from functools import wraps
+from glob import glob
+from hashlib import sha256
+from inspect import getsourcefile
+from numpy import load as np_load, nan, savez
+from os import makedirs, remove, stat
+from os.path import basename, exists, isdir, join
+from pandas import DataFrame, read_csv
+from pickle import HIGHEST_PROTOCOL, dump as pickle_dump, load as pickle_load
+from sys import modules
+from tasks.util.env import RESULTS_DIR
+
+"""
+On-disk cache for the plotting scripts. Reading the raw results (and
+building the time-series out of them) is the slowest part of generating a
+plot, and it is the same every time we only change the style of a figure.
+We cache at two levels:
+- Raw CSV files are parsed once into an `.npz` file with one array per
+    column, keyed by the file's path, size, and modification time
+- The output of a results reader (e.g. read_locality_results) is cached
+    keyed by the reader's arguments, and the size and modification time of
+    all the files in its input directories, and of its source code (and that
+    of the helpers it calls). If any input file changes (or a new one
+    appears), or we edit the reader, we re-run it
+
+Both levels are also memoised in-process, so that plotting tasks that read
+the same results more than once only parse them once.
+"""
+
+RESULTS_CACHE_DIR = join(RESULTS_DIR, ".cache")
+
+# Bump this if the format of the cached artifacts changes in a
+# backwards-incompatible way
+RESULTS_CACHE_VERSION = 2
+
+_IN_PROCESS_CACHE = {}
+
+
+def _get_files_signature(file_paths):
+    """
+    Cheap signature of a set of files, from their path, size and modification
+    time (i.e. without reading them)
+    """
+    signature = sha256()
+    for file_path in sorted(file_paths):
+        file_stat = stat(file_path)
+        signature.update(
+            "{}:{}:{}".format(
+                file_path, file_stat.st_size, file_stat.st_mtime_ns
+            ).encode("utf-8")
+        )
+
+    return signature.hexdigest()
+
+
+def _get_dirs_signature(dir_paths):
+    file_paths = []
+    for dir_path in dir_paths:
+        if isdir(dir_path):
+            file_paths += glob(join(dir_path, "*"))
+
+    return _get_files_signature(file_paths)
+
+
+def _get_code_names(code):
+    """
+    Global names a code object uses, including those in its nested code
+    objects (e.g. comprehensions and inner functions)
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, "co_names"):
+            names |= _get_code_names(const)
+
+    return names
+
+
+def _get_source_files(reader):
+    """
+    Source files of a reader, and of the modules (in this repo) of the
+    functions and classes it references (transitively through the
+    functions), so that editing the reader or any of its helpers invalidates
+    its cached outputs
+    """
+    source_files = set()
+    visited = set()
+    to_visit = [reader]
+    while len(to_visit) > 0:
+        func = to_visit.pop()
+        if func in visited:
+            continue
+        visited.add(func)
+        source_files.add(getsourcefile(func))
+
+        for name in _get_code_names(func.__code__):
+            obj = func.__globals__.get(name)
+            module_name = getattr(obj, "__module__", None)
+            if module_name is None or not module_name.startswith("tasks."):
+                continue
+
+            # Functions wrapped by our decorators keep the original
+            obj = getattr(obj, "__wrapped__", obj)
+            if hasattr(obj, "__code__"):
+                to_visit.append(obj)
+            elif getattr(modules.get(module_name), "__file__", None):
+                source_files.add(modules[module_name].__file__)
+
+    return source_files
+
+
+def _get_cache_file(name, key, extension):
+    makedirs(RESULTS_CACHE_DIR, exist_ok=True)
+    return join(
+        RESULTS_CACHE_DIR,
+        "{}_{}.{}".format(name, key[:32], extension),
+    )
+
+
+def read_csv_cached(csv_file):
+    """
+    Drop-in replacement for pandas.read_csv for our (rectangular) results
+    files, that only parses each version of a file once
+    """
+    key = sha256(
+        "v{}:{}".format(
+            RESULTS_CACHE_VERSION, _get_files_signature([csv_file])
+        ).encode("utf-8")
+    ).hexdigest()
+    if key in _IN_PROCESS_CACHE:
+        return _IN_PROCESS_CACHE[key].copy()
+
+    cache_file = _get_cache_file(basename(csv_file), key, "npz")
+    if exists(cache_file):
+        with np_load(cache_file, allow_pickle=False) as npz:
+            columns = list(npz["__columns__"])
+            data = {}
+            for col in columns:
+                array = npz[col]
+                null_key = "__null__{}".format(col)
+                if null_key in npz.files:
+                    array = array.astype(object)
+                    array[npz[null_key]] = nan
+                data[col] = array
+            data_frame = DataFrame(data)
+    else:
+        data_frame = read_csv(csv_file)
+        columns = [str(col) for col in data_frame.columns]
+        arrays = {}
+        for col in data_frame.columns:
+            array = data_frame[col].to_numpy()
+            # Strings are stored as object arrays, which npz can not store
+            # without pickling. We also store which values are missing, as
+            # they would otherwise become the string "nan"
+            if array.dtype == object:
+                arrays["__null__{}".format(col)] = data_frame[col].isna()
+                array = data_frame[col].fillna("").to_numpy().astype(str)
+            arrays[str(col)] = array
+        savez(cache_file, __columns__=columns, **arrays)
+
+    _IN_PROCESS_CACHE[key] = data_frame
+    return data_frame.copy()
+
+
+def cached_results(*input_dirs):
+    """
+    Decorator to cache the output of a results reader on disk. The reader's
+    arguments must have a stable string representation, and its output must
+    be picklable. The cache is invalidated whenever any file in any of the
+    input directories changes, or the reader's (or its helpers') source
+    changes
+    """
+
+    def decorator(reader):
+        source_files = _get_source_files(reader)
+
+        @wraps(reader)
+        def wrapper(*args, **kwargs):
+            key = sha256(
+                "v{}:{}:{}:{}:{}:{}".format(
+                    RESULTS_CACHE_VERSION,
+                    reader.__module__,
+                    reader.__name__,
+                    repr((args, sorted(kwargs.items()))),
+                    _get_dirs_signature(input_dirs),
+                    _get_files_signature(source_files),
+                ).encode("utf-8")
+            ).hexdigest()
+            # Readers return mutable dictionaries, so we always return a
+            # copy of the cached result
+            if key in _IN_PROCESS_CACHE:
+                return deepcopy(_IN_PROCESS_CACHE[key])
+
+            cache_file = _get_cache_file(reader.__name__, key, "pkl")
+            if exists(cache_file):
+                with open(cache_file, "rb") as fh:
+                    result = pickle_load(fh)
+            else:
+                result = reader(*args, **kwargs)
+                with open(cache_file, "wb") as fh:
+                    pickle_dump(result, fh, protocol=HIGHEST_PROTOCOL)
+
+            _IN_PROCESS_CACHE[key] = result
+            return deepcopy(result)
+
+        return wrapper
+
+    return decorator
+
+
+def clear_results_cache():
+    _IN_PROCESS_CACHE.clear()
+    for cache_file in glob(join(RESULTS_CACHE_DIR, "*")):
+        remove(cache_file)
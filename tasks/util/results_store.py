@@ -0,0 +1,301 @@
+from contextlib import closing
+from os import makedirs
+from os.path import exists, getmtime, join
+from pandas import DataFrame, read_csv
+from sqlite3 import connect
+from tasks.util.env import RESULTS_DIR, get_version
+from time import time
+
+"""
+Results store shared by all the experiments. Each repetition of a benchmark
+is a run, with the experiment, baseline, workload, size (e.g. number of
+processes or threads), and version (of this repo, which pins the images we
+run) it ran with. Runs have any number of (string) parameters and (numeric)
+measurements.
+
+The store is an SQLite database in WAL mode, so that we can read results
+while an experiment is writing them. Every run also records the CSV file we
+write it to (its source), so that re-initialising a CSV file drops its runs,
+and CSV files written before we had the store (or copied from another
+machine) can be imported with `sync_csv_results`.
+
+As an example, cross-experiment queries look like:
+    SELECT r.experiment, r.baseline, r.size, AVG(m.value)
+    FROM runs r JOIN measurements m ON m.run_id = r.run_id
+    WHERE m.name = 'Time' GROUP BY r.experiment, r.baseline, r.size
+"""
+
+RESULTS_STORE_FILE = join(RESULTS_DIR, "results.db")
+
+# Columns of the runs table we can query by
+RUN_COLUMNS = ["experiment", "baseline", "workload", "size", "version"]
+# Column with the version in CSV files we import (if they have it)
+CSV_VERSION_COL = "Version"
+
+_RESULTS_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    baseline TEXT,
+    workload TEXT,
+    size INTEGER,
+    version TEXT,
+    source TEXT,
+    timestamp REAL
+);
+CREATE INDEX IF NOT EXISTS runs_by_params ON runs (
+    experiment, baseline, size, version
+);
+CREATE INDEX IF NOT EXISTS runs_by_source ON runs (source);
+CREATE TABLE IF NOT EXISTS parameters (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS measurements (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE INDEX IF NOT EXISTS measurements_by_name ON measurements (name);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime REAL
+);
+"""
+
+
+def _get_connection(store_file=RESULTS_STORE_FILE):
+    makedirs(RESULTS_DIR, exist_ok=True)
+    conn = connect(store_file)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(_RESULTS_STORE_SCHEMA)
+    return conn
+
+
+def _update_source(conn, source):
+    if source is None or not exists(source):
+        return
+
+    conn.execute(
+        "INSERT OR REPLACE INTO sources (path, mtime) VALUES (?, ?)",
+        (source, getmtime(source)),
+    )
+
+
+def _delete_source_runs(conn, source):
+    conn.execute("DELETE FROM runs WHERE source = ?", (source,))
+
+
+def _prune_missing_sources(conn):
+    """
+    Drop the runs (and sources) recorded from CSV files that no longer exist
+    """
+    paths = conn.execute(
+        "SELECT path FROM sources UNION "
+        "SELECT DISTINCT source FROM runs WHERE source IS NOT NULL"
+    ).fetchall()
+    for (path,) in paths:
+        if not exists(path):
+            _delete_source_runs(conn, path)
+            conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+
+
+def _insert_runs(conn, runs):
+    """
+    Bulk insert a list of runs (as dictionaries with the RUN_COLUMNS, and
+    optionally a `source`, and `params` and `measurements` dictionaries)
+    """
+    now = time()
+    for run in runs:
+        cursor = conn.execute(
+            "INSERT INTO runs ({}, source, timestamp) VALUES ({})".format(
+                ", ".join(RUN_COLUMNS),
+                ", ".join(["?"] * (len(RUN_COLUMNS) + 2)),
+            ),
+            [run.get(col) for col in RUN_COLUMNS] + [run.get("source"), now],
+        )
+        run_id = cursor.lastrowid
+
+        conn.executemany(
+            "INSERT INTO parameters (run_id, name, value) VALUES (?, ?, ?)",
+            [
+                (run_id, name, str(value))
+                for name, value in run.get("params", {}).items()
+                if value is not None
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO measurements (run_id, name, value) VALUES (?, ?, ?)",
+            [
+                (run_id, name, float(value))
+                for name, value in run.get("measurements", {}).items()
+            ],
+        )
+
+
+def init_results(source, store_file=RESULTS_STORE_FILE):
+    """
+    Drop all the runs recorded from a CSV file. Call it whenever we
+    (re-)initialise the file
+    """
+    with closing(_get_connection(store_file)) as conn, conn:
+        _delete_source_runs(conn, source)
+        _update_source(conn, source)
+
+
+def record_runs(runs, store_file=RESULTS_STORE_FILE):
+    """
+    Record a list of runs in one transaction. Each run is a dictionary with
+    an `experiment`, and optionally any other of the RUN_COLUMNS, a `source`
+    CSV file, and `params` and `measurements` dictionaries. Runs with no
+    version get the current one
+    """
+    for run in runs:
+        if "experiment" not in run:
+            raise RuntimeError("Run without experiment: {}".format(run))
+        if run.get("version") is None:
+            run["version"] = get_version()
+
+    with closing(_get_connection(store_file)) as conn, conn:
+        _insert_runs(conn, runs)
+        for source in set(run.get("source") for run in runs):
+            _update_source(conn, source)
+
+
+def record_run(
+    experiment,
+    baseline,
+    measurements,
+    workload=None,
+    size=None,
+    params=None,
+    source=None,
+    version=None,
+    store_file=RESULTS_STORE_FILE,
+):
+    """
+    Record one run (i.e. one row in an experiment's CSV file)
+    """
+    record_runs(
+        [
+            {
+                "experiment": experiment,
+                "baseline": baseline,
+                "workload": workload,
+                "size": None if size is None else int(size),
+                "version": version,
+                "source": source,
+                "params": params or {},
+                "measurements": measurements,
+            }
+        ],
+        store_file=store_file,
+    )
+
+
+def sync_csv_results(
+    csv_file,
+    experiment,
+    baseline,
+    measurement_cols,
+    workload=None,
+    size_col=None,
+    version=None,
+    store_file=RESULTS_STORE_FILE,
+):
+    """
+    Import the rows of an experiment's CSV file as runs, if the file has
+    changed since we last recorded it. Columns in `measurement_cols` are
+    measurements, `size_col` (if any) is the run size, and all other columns
+    are parameters. We take the version from the CSV's `Version` column, if
+    it has one, or else from `version` (unknown, i.e. NULL, if None), but
+    never the current one, as we do not know which version wrote the file.
+    We also drop the runs of CSV files that no longer exist
+    """
+    with closing(_get_connection(store_file)) as conn, conn:
+        _prune_missing_sources(conn)
+
+        row = conn.execute(
+            "SELECT mtime FROM sources WHERE path = ?", (csv_file,)
+        ).fetchone()
+        if row is not None and row[0] == getmtime(csv_file):
+            return
+
+        results = read_csv(csv_file)
+        param_cols = [
+            col
+            for col in results.columns
+            if col not in measurement_cols
+            and col != size_col
+            and col != CSV_VERSION_COL
+        ]
+        runs = [
+            {
+                "experiment": experiment,
+                "baseline": baseline,
+                "workload": workload,
+                "size": None if size_col is None else int(res[size_col]),
+                "version": res.get(CSV_VERSION_COL, version),
+                "source": csv_file,
+                "params": {col: res[col] for col in param_cols},
+                "measurements": {col: res[col] for col in measurement_cols},
+            }
+            for res in results.to_dict("records")
+        ]
+
+        _delete_source_runs(conn, csv_file)
+        _insert_runs(conn, runs)
+        _update_source(conn, csv_file)
+
+
+def query_runs(experiment, store_file=RESULTS_STORE_FILE, **params):
+    """
+    Get all the runs for an experiment matching the given RUN_COLUMNS, as a
+    dataframe with one row per run, the RUN_COLUMNS, and one column per
+    parameter and measurement. We get the runs for all versions unless
+    given one (e.g. `version=get_version()`), and never those recorded from
+    CSV files that no longer exist
+    """
+    conditions = ["r.experiment = ?"]
+    values = [experiment]
+    for key in params:
+        if key not in RUN_COLUMNS:
+            raise RuntimeError("Unrecognised run column: {}".format(key))
+        conditions.append("r.{} = ?".format(key))
+        values.append(params[key])
+    where = " AND ".join(conditions)
+
+    with closing(_get_connection(store_file)) as conn, conn:
+        _prune_missing_sources(conn)
+
+        runs = conn.execute(
+            "SELECT r.run_id, {} FROM runs r WHERE {} ORDER BY r.run_id".format(
+                ", ".join("r.{}".format(col) for col in RUN_COLUMNS), where
+            ),
+            values,
+        ).fetchall()
+        values_by_run = conn.execute(
+            """
+            SELECT r.run_id, p.name, p.value FROM runs r
+            JOIN parameters p ON p.run_id = r.run_id WHERE {where}
+            UNION ALL
+            SELECT r.run_id, m.name, m.value FROM runs r
+            JOIN measurements m ON m.run_id = r.run_id WHERE {where}
+            """.format(
+                where=where
+            ),
+            values + values,
+        ).fetchall()
+
+    rows = {run[0]: dict(zip(["run_id"] + RUN_COLUMNS, run)) for run in runs}
+    for run_id, name, value in values_by_run:
+        rows[run_id][name] = value
+
+    if len(rows) == 0:
+        return DataFrame(columns=["run_id"] + RUN_COLUMNS)
+
+    return DataFrame(list(rows.values()))
@@ -1,26 +1,33 @@
-from glob import glob
 from matplotlib.patches import Patch
+from numpy import linspace
 from os.path import join
-from pandas import read_csv
+from tasks.util.catalog import query_makespan_results
+from tasks.util.cost import (
+    get_cost_grid,
+    get_cost_vm_hours,
+    get_pareto_frontier,
+    get_recorded_eviction_rate,
+)
 from tasks.util.env import (
     PLOTS_ROOT,
     RESULTS_DIR,
 )
 from tasks.util.plot import get_color_for_baseline, get_label_for_baseline
+from tasks.util.results_cache import cached_results, read_csv_cached
+from tasks.util.trace import MAKESPAN_TRACES_DIR
 
 MAKESPAN_RESULTS_DIR = join(RESULTS_DIR, "makespan")
 MAKESPAN_PLOTS_DIR = join(PLOTS_ROOT, "makespan")
 
 
+@cached_results(MAKESPAN_RESULTS_DIR, MAKESPAN_TRACES_DIR)
 def read_spot_results(num_vms, num_tasks, num_cpus_per_vm):
     result_dict = {}
 
-    glob_str = "makespan_makespan_*_{}_mpi-spot_{}_{}.csv".format(
-        num_vms, num_tasks, num_cpus_per_vm
-    )
-    for csv in glob(join(MAKESPAN_RESULTS_DIR, glob_str)):
-        baseline = csv.split("_")[2]
-        results = read_csv(csv)
+    for baseline, csv in query_makespan_results(
+        "makespan", num_vms, "mpi-spot", num_tasks, num_cpus_per_vm
+    ):
+        results = read_csv_cached(csv)
         result_dict[baseline] = {}
 
         # -----
@@ -146,19 +153,26 @@ def _do_plot_cost(results, ax, **kwargs):
 
         for discount in discounts_pcnt:
             ys[discount] += [
-                (
-                    float(results[n_vms][baseline + "-ft"]["makespan"])
-                    * (1 - discount / 100)
-                    / 3600
+                float(
+                    get_cost_vm_hours(
+                        results[n_vms][baseline + "-ft"]["makespan"],
+                        n_vms,
+                        discount=discount / 100,
+                    )
                 )
-                * n_vms
                 for baseline in baselines
             ]
             if ind != len(num_vms) - 1:
                 ys[discount].append(0)
 
         nospot_ys += [
-            (results[n_vms][baseline]["makespan"] / 3600) * n_vms
+            float(
+                get_cost_vm_hours(
+                    results[n_vms][baseline]["makespan"],
+                    n_vms,
+                    spot_fraction=0,
+                )
+            )
             for baseline in baselines
         ]
         colors += [
@@ -232,10 +246,61 @@ def _do_plot_cost(results, ax, **kwargs):
         ax.set_xticks(xticks, labels=xticklabels)
 
 
+def _do_plot_pareto(results, ax, **kwargs):
+    """
+    Pareto frontier of (makespan, cost) for each baseline, when we can choose
+    which fraction of the cluster runs on spot VMs, for a given spot discount,
+    eviction rate, and billing granularity. By default, we use the eviction
+    rate of our fault-injection schedule and per-second billing
+    """
+    assert "num_vms" in kwargs, "num_vms not in kwargs!"
+    assert "discount" in kwargs, "discount not in kwargs!"
+    n_vms = kwargs["num_vms"]
+    discount = kwargs["discount"]
+    eviction_rate = kwargs.get(
+        "eviction_rate", get_recorded_eviction_rate(n_vms)
+    )
+    billing_granularity_secs = kwargs.get("billing_granularity_secs", 1)
+    spot_fractions = linspace(0, 1, 21)
+
+    baselines = ["slurm", "batch", "granny"]
+    for baseline in baselines:
+        grid = get_cost_grid(
+            results[n_vms][baseline]["makespan"],
+            results[n_vms][baseline + "-ft"]["makespan"],
+            n_vms,
+            discounts=[discount],
+            eviction_rates=[eviction_rate],
+            billing_granularities_secs=[billing_granularity_secs],
+            spot_fractions=spot_fractions,
+        )
+        frontier = get_pareto_frontier(grid["makespan"], grid["cost"])
+        ax.plot(
+            grid["makespan"].ravel()[frontier] / 3600,
+            grid["cost"].ravel()[frontier],
+            color=get_color_for_baseline("mpi-spot", baseline),
+            label=get_label_for_baseline("mpi-spot", baseline),
+            drawstyle="steps-post",
+            marker=".",
+        )
+
+    ax.set_xlabel("Makespan [h]")
+    ax.set_ylabel("Cost [VM Hours]")
+    ax.set_title(
+        "{} VMs - {}% off - {:.1f} evictions/VM-h".format(
+            n_vms, int(discount * 100), eviction_rate
+        ),
+        fontsize=8,
+    )
+    ax.legend(fontsize=6)
+
+
 def plot_spot_results(plot_name, results, ax, **kwargs):
     if plot_name == "makespan":
         _do_plot_makespan(results, ax, **kwargs)
     elif plot_name == "cost":
         _do_plot_cost(results, ax, **kwargs)
+    elif plot_name == "pareto":
+        _do_plot_pareto(results, ax, **kwargs)
     else:
         raise RuntimeError("Unrecognised plot name: {}".format(plot_name))
@@ -0,0 +1,148 @@
+from numpy import (
+    asarray,
+    mean as np_mean,
+    minimum,
+    quantile,
+    sqrt,
+)
+from numpy.random import default_rng
+
+"""
+Summary statistics with bootstrap confidence intervals for the repeated runs
+of our benchmarks. For each set of repeats we draw all the bootstrap resamples
+at once (as a num_resamples x num_repeats matrix), and compute each statistic
+along the rows, so the cost is a handful of vectorised numpy calls per group.
+
+Every summary carries its confidence interval (as a (low, high) tuple next to
+each statistic), and the raw samples, so that we can test whether the
+difference between two baselines is significant before acting on it.
+"""
+
+BOOTSTRAP_NUM_RESAMPLES = 2000
+BOOTSTRAP_CONFIDENCE = 0.95
+# Fixed seed so that the intervals (and the plots) are reproducible
+BOOTSTRAP_SEED = 1234
+
+# Statistics we compute for each set of repeats, as a quantile (None for the
+# mean)
+SUMMARY_STATISTICS = {"mean": None, "median": 0.5, "p99": 0.99}
+
+
+def _compute_statistic(samples, statistic):
+    """
+    Compute a statistic along the last axis of a (possibly 2-D) array
+    """
+    if statistic not in SUMMARY_STATISTICS:
+        raise RuntimeError("Unrecognised statistic: {}".format(statistic))
+
+    if SUMMARY_STATISTICS[statistic] is None:
+        return np_mean(samples, axis=-1)
+
+    return quantile(samples, SUMMARY_STATISTICS[statistic], axis=-1)
+
+
+def _resample(samples, num_resamples, rng):
+    idx = rng.integers(0, len(samples), size=(num_resamples, len(samples)))
+    return samples[idx]
+
+
+def _get_interval(bootstrap_stats, confidence):
+    alpha = (1 - confidence) / 2
+    low, high = quantile(bootstrap_stats, [alpha, 1 - alpha], axis=0)
+    return float(low), float(high)
+
+
+def summarise(
+    samples,
+    num_resamples=BOOTSTRAP_NUM_RESAMPLES,
+    confidence=BOOTSTRAP_CONFIDENCE,
+    seed=BOOTSTRAP_SEED,
+):
+    """
+    Summarise a set of repeats. Returns a dictionary with each statistic in
+    SUMMARY_STATISTICS, its bootstrap confidence interval (in `<stat>-ci`),
+    the standard error of the mean (in `sem`), the number of repeats, and the
+    raw samples
+    """
+    samples = asarray(samples, dtype=float)
+    if len(samples) == 0:
+        raise RuntimeError("Can not summarise an empty set of samples!")
+
+    rng = default_rng(seed)
+    resampled = _resample(samples, num_resamples, rng)
+
+    summary = {
+        "num-samples": len(samples),
+        "samples": samples.tolist(),
+        # Same as pandas' sem (i.e. with one degree of freedom), and NaN for
+        # a single sample
+        "sem": (
+            float(samples.std(ddof=1) / sqrt(len(samples)))
+            if len(samples) > 1
+            else float("nan")
+        ),
+    }
+    for statistic in SUMMARY_STATISTICS:
+        summary[statistic] = float(_compute_statistic(samples, statistic))
+        summary["{}-ci".format(statistic)] = _get_interval(
+            _compute_statistic(resampled, statistic), confidence
+        )
+
+    return summary
+
+
+def summarise_by(results, group_col, value_col, **kwargs):
+    """
+    Summarise the repeats in a results dataframe, grouped by one column.
+    Returns a dictionary of <group, summary> (see `summarise`)
+    """
+    summaries = {}
+    for group, group_results in results.groupby(group_col):
+        # Use python scalars as keys (as we get from `to_list()`)
+        if hasattr(group, "item"):
+            group = group.item()
+        summaries[group] = summarise(
+            group_results[value_col].to_numpy(), **kwargs
+        )
+
+    return summaries
+
+
+def compare(
+    samples_a,
+    samples_b,
+    statistic="mean",
+    num_resamples=BOOTSTRAP_NUM_RESAMPLES,
+    confidence=BOOTSTRAP_CONFIDENCE,
+    seed=BOOTSTRAP_SEED,
+):
+    """
+    Bootstrap test of whether a statistic differs between two sets of repeats
+    (e.g. the execution times of two baselines). Returns a dictionary with the
+    difference (b - a), its confidence interval, the relative difference
+    (b / a), the two-sided p-value, and whether the difference is significant
+    at the given confidence level (i.e. the interval does not contain zero)
+    """
+    samples_a = asarray(samples_a, dtype=float)
+    samples_b = asarray(samples_b, dtype=float)
+
+    rng = default_rng(seed)
+    diffs = _compute_statistic(
+        _resample(samples_b, num_resamples, rng), statistic
+    ) - _compute_statistic(_resample(samples_a, num_resamples, rng), statistic)
+
+    stat_a = float(_compute_statistic(samples_a, statistic))
+    stat_b = float(_compute_statistic(samples_b, statistic))
+    diff_ci = _get_interval(diffs, confidence)
+    p_value = float(
+        minimum(1, 2 * min(np_mean(diffs <= 0), np_mean(diffs >= 0)))
+    )
+
+    return {
+        "statistic": statistic,
+        "diff": stat_b - stat_a,
+        "diff-ci": diff_ci,
+        "ratio": stat_b / stat_a if stat_a != 0 else float("nan"),
+        "p-value": p_value,
+        "significant": diff_ci[0] > 0 or diff_ci[1] < 0,
+    }
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from faasmctl.util.planner import get_available_hosts
+from queue import Queue
+
+"""
+Concurrent parameter sweeps for single-host microbenchmarks. Instead of
+running each point of the sweep (e.g. a kernel and a number of threads) one
+after the other, we keep a pool with one worker per host, and each worker
+runs one point at a time pinned to its own host (with a pre-loaded
+scheduling decision). Points never share a host, so on a cluster with N
+hosts the sweep finishes (up to) N times faster, and each point's results
+record the host it ran in (i.e. the one we pin it to, see the `hosts` of
+`tasks.util.harness.run_benchmark`), so that we can control for it.
+
+All the repetitions of a point run in the same host (see
+`tasks.util.harness`), which also writes each result under a lock, as points
+finish concurrently.
+"""
+
+
+def get_sweep_hosts(min_slots=1):
+    """
+    Return the IPs of the hosts registered with the planner that have at
+    least `min_slots` slots
+    """
+    hosts = [
+        host.ip
+        for host in get_available_hosts().hosts
+        if host.slots >= min_slots
+    ]
+    if len(hosts) == 0:
+        raise RuntimeError(
+            "No registered hosts with at least {} slots!".format(min_slots)
+        )
+
+    return sorted(hosts)
+
+
+def run_sweep(points, run_point, hosts):
+    """
+    Run `run_point(point, host)` for each point, with at most one point
+    running in each host at any time. Returns the results in the order of
+    `points`, and re-raises the first error (if any)
+    """
+    free_hosts = Queue()
+    for host in hosts:
+        free_hosts.put(host)
+
+    def _run(point):
+        host = free_hosts.get()
+        try:
+            return run_point(point, host)
+        finally:
+            free_hosts.put(host)
+
+    print(
+        "Running {} sweep points concurrently in {} hosts".format(
+            len(points), len(hosts)
+        )
+    )
+    with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        return list(executor.map(_run, points))
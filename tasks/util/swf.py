@@ -0,0 +1,229 @@
+from gzip import open as gzip_open
+from numpy import (
+    arange,
+    argsort,
+    array,
+    asarray,
+    ceil,
+    clip,
+    diff,
+    insert,
+    rint,
+    zeros,
+)
+from tasks.util.trace import get_trace_config
+
+"""
+Importer for traces in the Standard Workload Format (SWF) used by the
+Parallel Workloads Archive:
+https://www.cs.huji.ac.il/labs/parallel/workload/swf.html
+
+Each non-comment line in an SWF file is a job with 18 whitespace-separated
+fields, where -1 means that the field is missing. We only care about a few
+of them (indexes are 0-based).
+"""
+
+SWF_JOB_ID_FIELD = 0
+SWF_SUBMIT_TIME_FIELD = 1
+SWF_RUN_TIME_FIELD = 3
+SWF_ALLOCATED_PROCS_FIELD = 4
+SWF_REQUESTED_PROCS_FIELD = 7
+SWF_STATUS_FIELD = 10
+SWF_NUM_FIELDS = 18
+
+# Header fields (in the comments) that tell us the size of the original
+# machine, in order of preference
+SWF_MACHINE_SIZE_HEADERS = ["MaxProcs", "MaxNodes"]
+
+# SWF job statuses that we consider: 1 is completed, -1 is unknown
+SWF_VALID_STATUSES = [1, -1]
+
+
+def _open_swf_file(swf_file):
+    if swf_file.endswith(".gz"):
+        return gzip_open(swf_file, "rt")
+
+    return open(swf_file, "r")
+
+
+def iter_swf_jobs(swf_file):
+    """
+    Stream an SWF file, yielding one (header, job) pair per job, where the
+    job is a tuple: (job_id, submit_time, run_time, num_procs). The header is
+    a dictionary with all the `; Key: Value` comments seen so far. We skip
+    jobs with missing size, run time, or with a non-completed status
+    """
+    header = {}
+    with _open_swf_file(swf_file) as fh:
+        for line in fh:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+
+            if line.startswith(";"):
+                tokens = line[1:].split(":", 1)
+                if len(tokens) == 2:
+                    header[tokens[0].strip()] = tokens[1].strip()
+                continue
+
+            fields = line.split()
+            if len(fields) != SWF_NUM_FIELDS:
+                print("WARNING: skipping malformed SWF line: {}".format(line))
+                continue
+
+            num_procs = int(fields[SWF_ALLOCATED_PROCS_FIELD])
+            if num_procs <= 0:
+                num_procs = int(fields[SWF_REQUESTED_PROCS_FIELD])
+            run_time = float(fields[SWF_RUN_TIME_FIELD])
+            status = int(fields[SWF_STATUS_FIELD])
+            if num_procs <= 0 or run_time <= 0:
+                continue
+            if status not in SWF_VALID_STATUSES:
+                continue
+
+            yield header, (
+                int(fields[SWF_JOB_ID_FIELD]),
+                float(fields[SWF_SUBMIT_TIME_FIELD]),
+                run_time,
+                num_procs,
+            )
+
+
+def get_machine_size_from_swf_header(header):
+    for key in SWF_MACHINE_SIZE_HEADERS:
+        if key in header and int(header[key]) > 0:
+            return int(header[key])
+
+    return None
+
+
+def read_swf_jobs(swf_file, num_tasks=None, skip_tasks=0):
+    """
+    Read (at most) `num_tasks` valid jobs from an SWF file, after skipping
+    the first `skip_tasks` ones. Returns the header, and a dictionary of
+    column arrays
+    """
+    header = {}
+    jobs = []
+    for idx, (header, job) in enumerate(iter_swf_jobs(swf_file)):
+        if idx < skip_tasks:
+            continue
+        if num_tasks is not None and len(jobs) == num_tasks:
+            break
+        jobs.append(job)
+
+    if len(jobs) == 0:
+        raise RuntimeError("No valid jobs found in {}".format(swf_file))
+
+    jobs = array(jobs, dtype=float)
+    return header, {
+        "job_id": jobs[:, 0].astype(int),
+        "submit_time": jobs[:, 1],
+        "run_time": jobs[:, 2],
+        "num_procs": jobs[:, 3].astype(int),
+    }
+
+
+def get_offered_load(sizes, run_times, arrival_times, num_slots):
+    """
+    Offered load of a trace: the CPU-seconds requested divided by the
+    CPU-seconds available over the arrival period
+    """
+    span = float(arrival_times[-1] - arrival_times[0])
+    if span <= 0:
+        return float("inf")
+
+    return float((asarray(sizes) * asarray(run_times)).sum()) / (
+        span * num_slots
+    )
+
+
+def rescale_swf_jobs(
+    swf_jobs,
+    workload,
+    num_vms,
+    num_cpus_per_vm,
+    machine_size,
+    target_load=None,
+    max_size=None,
+    run_time=None,
+):
+    """
+    Map the SWF jobs onto a task trace for our cluster:
+    - Sizes are rescaled proportionally from the original machine size to our
+        cluster size, and clipped to the [min, max) size range of the
+        workload (as in tasks.util.trace.get_trace_config), or to `max_size`
+        if set. OpenMP tasks can not be larger than one VM
+    - If the workload mixes OpenMP and MPI apps, jobs that fit in one VM
+        after rescaling become OpenMP jobs, and the rest MPI jobs
+    - If a target load is given, inter-arrival times are compressed or
+        stretched so that the offered load matches it
+
+    Our traces do not have run times: each task runs for as long as its
+    app takes. So the offered load is only as accurate as the run times we
+    compute it with. By default, we use the SWF run times, which are usually
+    much longer than our apps'. To calibrate the load to our workloads, pass
+    the expected `run_time` (in seconds) of our tasks, e.g. the mean
+    execution time of a previous run
+
+    Returns a dictionary of column arrays, as expected by
+    tasks.util.trace.dump_task_trace_arrays_to_file
+    """
+    trace_config = get_trace_config(workload, num_cpus_per_vm)
+
+    # SWF files are usually sorted by submit time, but make sure they are
+    order = argsort(swf_jobs["submit_time"], kind="stable")
+    swf_jobs = {key: val[order] for key, val in swf_jobs.items()}
+
+    num_slots = int(num_vms) * int(num_cpus_per_vm)
+    num_tasks = len(swf_jobs["job_id"])
+
+    # Rescale sizes
+    sizes = ceil(swf_jobs["num_procs"] * num_slots / machine_size).astype(int)
+
+    mpi_apps = [wl for wl in trace_config.workloads if wl.startswith("mpi")]
+    omp_apps = [
+        wl for wl in trace_config.workloads if not wl.startswith("mpi")
+    ]
+    if len(mpi_apps) > 0 and len(omp_apps) > 0:
+        is_mpi = sizes > int(num_cpus_per_vm)
+    else:
+        is_mpi = zeros(num_tasks, dtype=bool) + (len(mpi_apps) > 0)
+
+    mpi_max = (
+        trace_config.mpi_sizes[1] - 1 if max_size is None else int(max_size)
+    )
+    mpi_sizes = clip(sizes, trace_config.mpi_sizes[0], mpi_max)
+    omp_sizes = clip(sizes, 1, int(num_cpus_per_vm))
+    sizes = mpi_sizes * is_mpi + omp_sizes * (~is_mpi)
+    apps = array(
+        [mpi_apps[0] if mpi else omp_apps[0] for mpi in is_mpi.tolist()]
+    )
+
+    # Re-scale arrival times to hit the target load
+    arrival_times = swf_jobs["submit_time"] - swf_jobs["submit_time"].min()
+    if target_load is not None and arrival_times.max() > 0:
+        run_times = swf_jobs["run_time"]
+        if run_time is not None:
+            run_times = zeros(num_tasks) + float(run_time)
+        current_load = get_offered_load(
+            sizes, run_times, arrival_times, num_slots
+        )
+        arrival_times = arrival_times * current_load / float(target_load)
+        print(
+            "Re-scaled arrival times by {:.3f} (load {:.3f} -> {:.3f})".format(
+                current_load / float(target_load), current_load, target_load
+            )
+        )
+
+    # We store inter-arrival times rounded to seconds, so we round the
+    # arrival times first to prevent rounding errors from accumulating
+    arrival_times = rint(arrival_times).astype(int)
+    inter_arrival_times = insert(diff(arrival_times), 0, 0)
+
+    return {
+        "task_id": arange(num_tasks),
+        "app": apps,
+        "size": sizes,
+        "inter_arrival_time": inter_arrival_times,
+    }
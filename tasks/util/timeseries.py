@@ -0,0 +1,178 @@
+from numpy import (
+    add,
+    arange,
+    argsort,
+    asarray,
+    ceil,
+    concatenate,
+    cumsum,
+    flatnonzero,
+    floor,
+    lexsort,
+    maximum,
+    ones,
+    searchsorted,
+    zeros,
+)
+from tasks.util.results_cache import read_csv_cached
+
+"""
+Event-sweep engine to build time-series out of the (start, end) timestamps of
+the tasks we have executed. Instead of iterating over every time slot each
+task spans, we turn each task into two events (+value at start, -value at
+end), sort them, and integrate them with a cumulative sum. This takes
+O(n log n) for n tasks, independently of the duration of the experiment, and
+keeps the exact (sub-second) timestamps.
+
+Step functions are represented as a pair of arrays (times, levels), where
+levels[i] is the value in [times[i], times[i + 1]), and levels[-1] the value
+from times[-1] onwards.
+"""
+
+
+def _merge_events(times, deltas):
+    """
+    Sort the events by time, and aggregate all the events at the same time
+    (so that a task that ends exactly when another starts does not show as
+    a spurious spike)
+    """
+    order = argsort(times, kind="stable")
+    times = times[order]
+    deltas = deltas[order]
+
+    if len(times) == 0:
+        return times, deltas
+
+    is_new_time = concatenate([[True], times[1:] != times[:-1]])
+    first_idx = flatnonzero(is_new_time)
+    return times[first_idx], add.reduceat(deltas, first_idx)
+
+
+def get_step_function(start_ts, end_ts, values, initial_value=0):
+    """
+    Get the step function of the sum of the values of the tasks in-flight
+    over time. Each task contributes values[i] to [start_ts[i], end_ts[i])
+    """
+    start_ts = asarray(start_ts, dtype=float)
+    end_ts = asarray(end_ts, dtype=float)
+    values = asarray(values, dtype=float)
+
+    times, deltas = _merge_events(
+        concatenate([start_ts, end_ts]), concatenate([values, -values])
+    )
+
+    return times, initial_value + cumsum(deltas)
+
+
+def sample_step_function(times, levels, sample_ts, default=0):
+    """
+    Evaluate a step function at the given timestamps. Timestamps before the
+    first event take the default value
+    """
+    idx = searchsorted(times, asarray(sample_ts, dtype=float), side="right")
+    return concatenate([[default], levels])[idx]
+
+
+def round_to_whole_secs(start_ts, end_ts, origin_ts):
+    """
+    Be conservative, and round the start timestamps up and the end timestamps
+    down (to whole seconds from the origin timestamp) to prevent
+    double-counting a second in which one task finishes and another starts.
+    Tasks that do not span a whole second end when they start
+    """
+    start_ts = origin_ts + ceil(asarray(start_ts, dtype=float) - origin_ts)
+    end_ts = origin_ts + floor(asarray(end_ts, dtype=float) - origin_ts)
+
+    return start_ts, maximum(start_ts, end_ts)
+
+
+def get_idle_cpus_step_function(start_ts, end_ts, sizes, total_cpus):
+    return get_step_function(
+        start_ts, end_ts, -asarray(sizes, dtype=float), total_cpus
+    )
+
+
+def get_idle_vms_step_function(start_ts, end_ts, vms_per_task, num_vms):
+    """
+    Get the step function of the number of VMs with no task in-flight. Each
+    task is scheduled to the list of VM ids in vms_per_task[i]
+    """
+    num_vms_per_task = asarray([len(vms) for vms in vms_per_task], dtype=int)
+    task_idx = arange(len(vms_per_task)).repeat(num_vms_per_task)
+    vm_ids = asarray([vm for vms in vms_per_task for vm in vms], dtype=object)
+    if len(vm_ids) > 0:
+        # Map arbitrary VM identifiers to integers
+        vm_names = {vm: idx for idx, vm in enumerate(dict.fromkeys(vm_ids))}
+        vm_ids = asarray([vm_names[vm] for vm in vm_ids], dtype=int)
+    else:
+        vm_ids = zeros(0, dtype=int)
+
+    start_ts = asarray(start_ts, dtype=float)[task_idx]
+    end_ts = asarray(end_ts, dtype=float)[task_idx]
+
+    # First, sweep the events for each VM separately to get the number of
+    # tasks in each VM over time
+    vm_ids = concatenate([vm_ids, vm_ids])
+    times = concatenate([start_ts, end_ts])
+    deltas = concatenate(
+        [ones(len(start_ts), dtype=int), -ones(len(end_ts), dtype=int)]
+    )
+    order = lexsort((times, vm_ids))
+    vm_ids = vm_ids[order]
+    times = times[order]
+    deltas = deltas[order]
+
+    # Aggregate events for the same VM at the same time. Each VM's events add
+    # up to zero, so the global cumulative sum is also the per-VM one
+    is_last = concatenate(
+        [(vm_ids[1:] != vm_ids[:-1]) | (times[1:] != times[:-1]), [True]]
+    )
+    tasks_in_vm = cumsum(deltas)[is_last]
+    vm_ids = vm_ids[is_last]
+    times = times[is_last]
+    prev_tasks_in_vm = concatenate([[0], tasks_in_vm[:-1]])
+    prev_tasks_in_vm[concatenate([[True], vm_ids[1:] != vm_ids[:-1]])] = 0
+
+    # Second, a VM becomes busy when it goes from zero tasks to non-zero, and
+    # idle when it goes back to zero
+    busy_deltas = (tasks_in_vm > 0).astype(int) - (prev_tasks_in_vm > 0)
+    changed = busy_deltas != 0
+    times, busy_deltas = _merge_events(times[changed], busy_deltas[changed])
+
+    return times, num_vms - cumsum(busy_deltas)
+
+
+def get_step_function_per_second(times, levels, origin_ts, num_secs, default):
+    """
+    Sample a step function once per second, from the origin timestamp, and
+    return it as a dictionary of <second, value> (i.e. the format our plots
+    expect)
+    """
+    secs = arange(int(num_secs))
+    return dict(
+        zip(
+            secs.tolist(),
+            sample_step_function(
+                times, levels, origin_ts + secs, default=default
+            ).tolist(),
+        )
+    )
+
+
+def read_time_series_per_second(csv_file, columns, origin_ts, num_secs):
+    """
+    Read a time-series results file (with a TimeStampSecs column, and one
+    column per metric) where each row is the value of the metrics from that
+    timestamp onwards, and sample the requested columns once per second from
+    the origin timestamp. `columns` is a dictionary of <column, default> with
+    the value to use before the first row
+    """
+    results = read_csv_cached(csv_file)
+    times = results["TimeStampSecs"].to_numpy()
+
+    return {
+        col: get_step_function_per_second(
+            times, results[col].to_numpy(), origin_ts, num_secs, default
+        )
+        for col, default in columns.items()
+    }
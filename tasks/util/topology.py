@@ -0,0 +1,162 @@
+from dataclasses import dataclass, fields
+from json import load as json_load
+from numpy import arange, asarray, eye, int64
+
+"""
+Hierarchical topology of the cluster: hosts (VMs) are grouped in racks, and
+racks in availability zones. A link is a pair of processes of the same app,
+and we account for each link at the highest level it crosses: two processes
+in different hosts of the same rack form a cross-host link, in different
+racks of the same zone a cross-rack link, and in different zones a cross-zone
+link. Each level has a cost per link, so that we can penalise placements
+that spread an app across racks or zones more than ones that only spread it
+across hosts.
+
+All functions take an occupancy matrix (apps x hosts, with the number of
+processes of each app in each host, see `tasks.util.occupancy`), a single
+row (e.g. a partition), or any stack of them, and vectorise over the leading
+axes. With the default (flat) topology, all hosts are in the same rack and
+zone, and the link count is the number of cross-VM links.
+"""
+
+TOPOLOGY_LEVELS = ["host", "rack", "zone"]
+
+
+@dataclass
+class Topology:
+    """
+    Uniform hierarchical topology:
+    - num_hosts_per_rack: hosts in each rack (None for all in one rack)
+    - num_racks_per_zone: racks in each zone (None for all in one zone)
+    - <level>_link_cost: cost of each link that crosses hosts, racks, or
+        zones (at most)
+    Hosts are numbered in order, filling each rack, and each zone, first
+    """
+
+    num_hosts_per_rack: int = None
+    num_racks_per_zone: int = None
+    host_link_cost: float = 1.0
+    rack_link_cost: float = 2.0
+    zone_link_cost: float = 10.0
+
+    def get_group_ids(self, num_hosts, level):
+        """
+        Index of the host, rack, or zone each host belongs to
+        """
+        hosts = arange(num_hosts)
+        if level == "host":
+            return hosts
+
+        racks = (
+            hosts // self.num_hosts_per_rack
+            if self.num_hosts_per_rack is not None
+            else hosts * 0
+        )
+        if level == "rack":
+            return racks
+
+        if level == "zone":
+            return (
+                racks // self.num_racks_per_zone
+                if self.num_racks_per_zone is not None
+                else racks * 0
+            )
+
+        raise RuntimeError(
+            "Unrecognised topology level: {} (must be one in: {})".format(
+                level, TOPOLOGY_LEVELS
+            )
+        )
+
+    def get_link_costs(self):
+        return [self.host_link_cost, self.rack_link_cost, self.zone_link_cost]
+
+
+FLAT_TOPOLOGY = Topology()
+
+
+def load_topology(config_file=None):
+    """
+    Load a topology from a JSON file with (some of) the fields of Topology,
+    e.g. `{"num_hosts_per_rack": 4, "rack_link_cost": 3}`. Without a file,
+    return the flat topology
+    """
+    if config_file is None:
+        return FLAT_TOPOLOGY
+
+    with open(config_file, "r") as fh:
+        config = json_load(fh)
+
+    field_names = [f.name for f in fields(Topology)]
+    for key in config:
+        if key not in field_names:
+            raise RuntimeError(
+                "Unrecognised topology key: {} (must be one in: {})".format(
+                    key, field_names
+                )
+            )
+
+    return Topology(**config)
+
+
+def _get_cross_group_links(occupancy, group_ids=None):
+    """
+    Number of links between processes in different groups (hosts, racks, or
+    zones). If an app has n_g processes in group g, and N in total:
+        (N^2 - sum_g n_g^2) / 2
+    Without group ids, each host is its own group
+    """
+    per_group = occupancy
+    if group_ids is not None and len(group_ids) > 0:
+        # Aggregate the hosts' columns into their groups
+        per_group = (
+            occupancy @ eye(group_ids.max() + 1, dtype=int64)[group_ids]
+        )
+    total = occupancy.sum(axis=-1)
+    return (total * total - (per_group * per_group).sum(axis=-1)) // 2
+
+
+def get_links_per_level(occupancy, topology=FLAT_TOPOLOGY):
+    """
+    Return a dictionary of <level, number of links> with the links that
+    cross (at most) each level of the topology, per app
+    """
+    occupancy = asarray(occupancy, dtype=int64)
+    num_hosts = occupancy.shape[-1]
+
+    # Links that cross each level, or any level above it
+    crossing = [_get_cross_group_links(occupancy)] + [
+        _get_cross_group_links(
+            occupancy, topology.get_group_ids(num_hosts, level)
+        )
+        for level in TOPOLOGY_LEVELS[1:]
+    ]
+
+    links = {}
+    for ind, level in enumerate(TOPOLOGY_LEVELS):
+        if ind + 1 < len(TOPOLOGY_LEVELS):
+            links[level] = crossing[ind] - crossing[ind + 1]
+        else:
+            links[level] = crossing[ind]
+
+    return links
+
+
+def get_num_links(occupancy):
+    """
+    Total number of links between processes in different hosts, per app
+    (i.e. the sum over all levels, which does not depend on the topology)
+    """
+    return _get_cross_group_links(asarray(occupancy, dtype=int64))
+
+
+def get_link_cost(occupancy, topology=FLAT_TOPOLOGY):
+    """
+    Cost of the links of each app, weighting each link by the cost of the
+    highest level it crosses
+    """
+    links = get_links_per_level(occupancy, topology)
+    return sum(
+        cost * links[level]
+        for level, cost in zip(TOPOLOGY_LEVELS, topology.get_link_costs())
+    )
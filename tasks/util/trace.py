@@ -1,7 +1,25 @@
-from dataclasses import dataclass
-from os import makedirs
-from os.path import join
+from dataclasses import dataclass, field
+from json import dump as json_dump, load as json_load
+from numpy import (
+    arange,
+    asarray,
+    dtype,
+    empty,
+    load,
+    save,
+    unique,
+)
+from numpy.random import default_rng
+from os import makedirs, remove
+from os.path import exists, getmtime, join
+from pandas import DataFrame, read_csv
+from tasks.util.catalog import TRACE_KIND, register_file
+from tasks.util.distributions import (
+    sample_inter_arrival_times,
+    sample_sizes,
+)
 from tasks.util.env import PROJ_ROOT
+from typing import Dict, List, Tuple
 
 MAKESPAN_TRACES_DIR = join(PROJ_ROOT, "tasks", "makespan", "traces")
 
@@ -15,6 +33,19 @@ class TaskObject:
     inter_arrival_time: int
 
 
+def _register_trace_in_catalog(
+    task_file, workload, num_tasks, num_cores_per_vm
+):
+    register_file(
+        task_file,
+        TRACE_KIND,
+        experiment="makespan",
+        workload=workload,
+        num_tasks=int(num_tasks),
+        num_cpus_per_vm=int(num_cores_per_vm),
+    )
+
+
 def dump_task_trace_to_file(task_trace, workload, num_tasks, num_cores_per_vm):
     makedirs(MAKESPAN_TRACES_DIR, exist_ok=True)
     file_name = "trace_{}_{}_{}.csv".format(
@@ -29,21 +60,117 @@ def dump_task_trace_to_file(task_trace, workload, num_tasks, num_cores_per_vm):
                     t.task_id, t.app, t.size, t.inter_arrival_time
                 )
             )
+    _remove_binary_trace(workload, num_tasks, num_cores_per_vm)
+    _register_trace_in_catalog(
+        task_file, workload, num_tasks, num_cores_per_vm
+    )
     print(
         "Written trace with {} tasks to {}".format(len(task_trace), task_file)
     )
 
 
+def get_trace_file_name(workload, num_tasks, num_cores_per_vm):
+    return "trace_{}_{}_{}.csv".format(workload, num_tasks, num_cores_per_vm)
+
+
+def _remove_binary_trace(workload, num_tasks, num_cores_per_vm):
+    """
+    Remove the binary version of a trace (if any), as it is stale once we
+    rewrite the CSV one
+    """
+    for file_name in [
+        get_binary_trace_file_name(workload, num_tasks, num_cores_per_vm),
+        get_binary_trace_header_file_name(
+            workload, num_tasks, num_cores_per_vm
+        ),
+    ]:
+        file_path = join(MAKESPAN_TRACES_DIR, file_name)
+        if exists(file_path):
+            remove(file_path)
+
+
+def _has_up_to_date_binary_trace(workload, num_tasks, num_cores_per_vm):
+    """
+    Whether a trace is available in the binary format, and it is not older
+    than its CSV version (if any)
+    """
+    binary_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_binary_trace_file_name(workload, num_tasks, num_cores_per_vm),
+    )
+    if not exists(binary_file):
+        return False
+
+    csv_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_trace_file_name(workload, num_tasks, num_cores_per_vm),
+    )
+    if exists(csv_file) and getmtime(csv_file) > getmtime(binary_file):
+        print(
+            "WARNING: ignoring binary trace older than its CSV: {}".format(
+                binary_file
+            )
+        )
+        return False
+
+    return True
+
+
+def dump_task_trace_arrays_to_file(
+    trace_arrays, workload, num_tasks, num_cores_per_vm
+):
+    """
+    Bulk-write a trace given as a dictionary of column arrays (as returned by
+    `generate_task_trace_arrays`) in the same CSV format as above
+    """
+    makedirs(MAKESPAN_TRACES_DIR, exist_ok=True)
+    task_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_trace_file_name(workload, num_tasks, num_cores_per_vm),
+    )
+    DataFrame(
+        {
+            "TaskId": trace_arrays["task_id"],
+            "App": trace_arrays["app"],
+            "Size": trace_arrays["size"],
+            "InterArrivalTimeSecs": trace_arrays["inter_arrival_time"],
+        }
+    ).to_csv(task_file, index=False)
+    _remove_binary_trace(workload, num_tasks, num_cores_per_vm)
+    _register_trace_in_catalog(
+        task_file, workload, num_tasks, num_cores_per_vm
+    )
+    print(
+        "Written trace with {} tasks to {}".format(
+            len(trace_arrays["task_id"]), task_file
+        )
+    )
+
+
 def load_task_trace_from_file(workload, num_tasks, num_cores_per_vm):
-    file_name = "trace_{}_{}_{}.csv".format(
-        workload, num_tasks, num_cores_per_vm
+    """
+    Load the first `num_tasks` tasks of a trace. If the trace is available in
+    the columnar binary format (and it is not older than the CSV file) we
+    load it from there (without parsing the rest), otherwise we fall back to
+    parsing the CSV file
+    """
+    if _has_up_to_date_binary_trace(workload, num_tasks, num_cores_per_vm):
+        return list(
+            iter_task_trace_from_binary_file(
+                workload, num_tasks, num_cores_per_vm, num_tasks=num_tasks
+            )
+        )
+
+    task_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_trace_file_name(workload, num_tasks, num_cores_per_vm),
     )
-    task_file = join(MAKESPAN_TRACES_DIR, file_name)
     task_trace = []
     with open(task_file, "r") as in_file:
+        # Skip the header
+        next(in_file)
+
         for line in in_file:
-            if "TaskId" in line:
-                continue
             if len(task_trace) == num_tasks:
                 break
             tokens = line.rstrip().split(",")
@@ -56,3 +183,276 @@ def load_task_trace_from_file(workload, num_tasks, num_cores_per_vm):
                 )
             )
     return task_trace
+
+
+# ----------------------------
+# Columnar (binary) trace format
+# ----------------------------
+
+# In the binary format, a trace is a .npy file with a structured array (one
+# record per task) plus a JSON header file with the app name table and the
+# parameters used to generate the trace. Apps are stored as indexes into the
+# app name table to keep records small and fixed-size, so that we can
+# memory-map the file and slice it without parsing it
+TRACE_BINARY_DTYPE = dtype(
+    [
+        ("task_id", "<i8"),
+        ("app", "<u2"),
+        ("size", "<i4"),
+        ("inter_arrival_time", "<i8"),
+    ]
+)
+
+BINARY_TRACE_CHUNK_SIZE = 65536
+
+
+def get_binary_trace_file_name(workload, num_tasks, num_cores_per_vm):
+    return "trace_{}_{}_{}.npy".format(workload, num_tasks, num_cores_per_vm)
+
+
+def get_binary_trace_header_file_name(workload, num_tasks, num_cores_per_vm):
+    return "trace_{}_{}_{}.json".format(workload, num_tasks, num_cores_per_vm)
+
+
+def dump_task_trace_arrays_to_binary_file(
+    trace_arrays, workload, num_tasks, num_cores_per_vm, params=None
+):
+    """
+    Write a trace given as a dictionary of column arrays in the columnar
+    binary format. `params` is an optional dictionary with the generation
+    parameters to store in the header
+    """
+    makedirs(MAKESPAN_TRACES_DIR, exist_ok=True)
+
+    apps, app_idx = unique(asarray(trace_arrays["app"]), return_inverse=True)
+    records = empty(len(trace_arrays["task_id"]), dtype=TRACE_BINARY_DTYPE)
+    records["task_id"] = trace_arrays["task_id"]
+    records["app"] = app_idx
+    records["size"] = trace_arrays["size"]
+    records["inter_arrival_time"] = trace_arrays["inter_arrival_time"]
+
+    task_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_binary_trace_file_name(workload, num_tasks, num_cores_per_vm),
+    )
+    save(task_file, records)
+
+    header = {
+        "workload": workload,
+        "num_tasks": int(num_tasks),
+        "num_cores_per_vm": int(num_cores_per_vm),
+        "apps": [str(app) for app in apps],
+        "params": {} if params is None else params,
+    }
+    header_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_binary_trace_header_file_name(
+            workload, num_tasks, num_cores_per_vm
+        ),
+    )
+    with open(header_file, "w") as fh:
+        json_dump(header, fh, indent=2)
+    _register_trace_in_catalog(
+        task_file, workload, num_tasks, num_cores_per_vm
+    )
+
+    print(
+        "Written binary trace with {} tasks to {}".format(
+            len(records), task_file
+        )
+    )
+
+
+def load_task_trace_arrays_from_binary_file(
+    workload, trace_num_tasks, num_cores_per_vm, num_tasks=None
+):
+    """
+    Memory-map a binary trace and return the (header, records) pair. Records
+    is a read-only view over the first `num_tasks` tasks, so nothing is read
+    from disk until accessed
+    """
+    header_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_binary_trace_header_file_name(
+            workload, trace_num_tasks, num_cores_per_vm
+        ),
+    )
+    with open(header_file, "r") as fh:
+        header = json_load(fh)
+
+    records = load(
+        join(
+            MAKESPAN_TRACES_DIR,
+            get_binary_trace_file_name(
+                workload, trace_num_tasks, num_cores_per_vm
+            ),
+        ),
+        mmap_mode="r",
+    )
+    if num_tasks is not None:
+        records = records[: int(num_tasks)]
+
+    return header, records
+
+
+def iter_task_trace_from_binary_file(
+    workload, trace_num_tasks, num_cores_per_vm, num_tasks=None
+):
+    """
+    Lazily yield TaskObject's from a binary trace
+    """
+    header, records = load_task_trace_arrays_from_binary_file(
+        workload, trace_num_tasks, num_cores_per_vm, num_tasks=num_tasks
+    )
+    apps = header["apps"]
+
+    # Converting records one by one from numpy is slow, so we page through the
+    # memory-mapped array in chunks, and convert each chunk in one go
+    for chunk_start in range(0, len(records), BINARY_TRACE_CHUNK_SIZE):
+        chunk_end = chunk_start + BINARY_TRACE_CHUNK_SIZE
+        for task_id, app, size, iat in records[chunk_start:chunk_end].tolist():
+            yield TaskObject(task_id, apps[app], size, iat)
+
+
+def convert_csv_trace_to_binary(workload, num_tasks, num_cores_per_vm):
+    """
+    Convert an existing CSV trace to the binary format
+    """
+    task_file = join(
+        MAKESPAN_TRACES_DIR,
+        get_trace_file_name(workload, num_tasks, num_cores_per_vm),
+    )
+    results = read_csv(task_file)
+    dump_task_trace_arrays_to_binary_file(
+        {
+            "task_id": results["TaskId"].to_numpy(),
+            "app": results["App"].to_numpy(dtype=str),
+            "size": results["Size"].to_numpy(),
+            "inter_arrival_time": results["InterArrivalTimeSecs"].to_numpy(),
+        },
+        workload,
+        num_tasks,
+        num_cores_per_vm,
+    )
+
+
+# ----------------------------
+# Trace generation
+# ----------------------------
+
+
+@dataclass
+class TraceConfig:
+    """
+    Distribution parameters to generate a task trace:
+    - workloads/workload_weights: the workload mix. Each task's app is
+        sampled from `workloads` with probabilities `workload_weights`
+    - mpi_sizes/omp_sizes: [min, max) range of task sizes, sampled uniformly
+    - size_dist: distribution of sizes within each range (uniform if None),
+        see tasks.util.distributions.sample_sizes
+    - lmbd: arrival rate of the Poisson process (in tasks per second), so
+        that inter-arrival times are exponential with mean 1/lmbd
+    - arrival: arrival process (Poisson with rate lmbd if None), see
+        tasks.util.distributions.sample_arrival_times
+    - seed: seed for the random number generator, for reproducibility
+    """
+
+    workloads: List[str] = field(default_factory=lambda: ["mpi-locality"])
+    workload_weights: List[float] = None
+    mpi_sizes: Tuple[int, int] = (2, 16)
+    omp_sizes: Tuple[int, int] = (1, 8)
+    size_dist: Dict = None
+    lmbd: float = 0.1
+    arrival: Dict = None
+    seed: int = None
+
+
+def get_trace_config(workload, num_cores_per_vm, lmbd=0.1, seed=None):
+    """
+    Get the default trace configuration for each of our workloads
+    """
+    if workload == "mpi-locality":
+        possible_workloads = ["mpi-locality"]
+    elif workload == "mpi-evict":
+        possible_workloads = ["mpi-migrate"]
+    elif workload == "mpi-spot":
+        possible_workloads = ["mpi-migrate"]
+    elif workload == "omp-elastic":
+        possible_workloads = ["omp"]
+    else:
+        raise RuntimeError("Unrecognised workload: {}".format(workload))
+
+    # Work out the possible number of cores per VM
+    if workload == "mpi-evict" or workload == "mpi-spot":
+        mpi_sizes = (4, int(num_cores_per_vm * 2))
+    else:
+        mpi_sizes = (2, int(num_cores_per_vm * 2))
+
+    return TraceConfig(
+        workloads=possible_workloads,
+        mpi_sizes=mpi_sizes,
+        omp_sizes=(1, int(num_cores_per_vm)),
+        lmbd=float(lmbd),
+        seed=seed,
+    )
+
+
+def update_trace_config_from_file(trace_config, config_file):
+    """
+    Override the fields in a trace configuration with the ones in a JSON file
+    """
+    with open(config_file, "r") as fh:
+        overrides = json_load(fh)
+
+    for key in overrides:
+        if not hasattr(trace_config, key):
+            raise RuntimeError("Unrecognised trace config key: {}".format(key))
+        setattr(trace_config, key, overrides[key])
+
+    return trace_config
+
+
+def generate_task_trace_arrays(trace_config, num_tasks):
+    """
+    Generate a random task trace as a dictionary of column arrays. We sample
+    all tasks at once from a (seeded) numpy Generator, so this scales to
+    millions of tasks
+    """
+    num_tasks = int(num_tasks)
+    rng = default_rng(trace_config.seed)
+
+    # The lambda parameter regulates how frequently new tasks arrive. If we
+    # make lambda smaller, then tasks will be more far apart. Formally, the
+    # lambda parameter is the inverse of the expected inter-arrival time. We
+    # record inter-arrival times (wrt the previous task), and the first task
+    # always arrives at time zero
+    arrival_config = trace_config.arrival
+    if arrival_config is None:
+        arrival_config = {"type": "poisson", "lmbd": trace_config.lmbd}
+    inter_arrival_times = sample_inter_arrival_times(
+        rng, num_tasks, arrival_config
+    )
+
+    workloads = asarray(trace_config.workloads)
+    wl_idx = rng.choice(
+        len(workloads), size=num_tasks, p=trace_config.workload_weights
+    )
+    apps = workloads[wl_idx]
+
+    # Sample both size ranges for all tasks, and pick the right one depending
+    # on the workload (all our MPI workloads are prefixed with `mpi`)
+    is_mpi = asarray([wl.startswith("mpi") for wl in workloads])[wl_idx]
+    mpi_sizes = sample_sizes(
+        rng, num_tasks, *trace_config.mpi_sizes, trace_config.size_dist
+    )
+    omp_sizes = sample_sizes(
+        rng, num_tasks, *trace_config.omp_sizes, trace_config.size_dist
+    )
+    sizes = mpi_sizes * is_mpi + omp_sizes * (~is_mpi)
+
+    return {
+        "task_id": arange(num_tasks),
+        "app": apps,
+        "size": sizes,
+        "inter_arrival_time": inter_arrival_times,
+    }
@@ -0,0 +1,173 @@
+from numpy import asarray, concatenate, zeros
+from tasks.util.lammps import LAMMPS_SIM_WORKLOAD_CONFIGS
+
+"""
+Cross-host traffic estimator. The execution graph only records how many
+messages of each type each rank sends to each other rank (see
+`tasks.lammps.graph.get_mpi_comm_matrices`), but what we pay for is bytes and
+latency. We combine the per-type message counts with a per-type payload-size
+model (in bytes per message), and estimate the network time of a placement
+as a latency per cross-host message, plus the cross-host bytes over the
+link bandwidth. Messages between ranks in the same host go through shared
+memory, and we ignore them.
+
+Message types are the integer ids in `tasks.lammps.graph.MPI_MSG_TYPE_MAP`.
+"""
+
+# Header we add to every message, on top of its payload
+MPI_MSG_HEADER_BYTES = 64
+
+# Network between VMs (Standard_D8_v5 has 12.5 Gbps of bandwidth)
+XHOST_LATENCY_SECS = 50e-6
+XHOST_BANDWIDTH_BYTES_PER_SEC = 12.5e9 / 8
+
+# Payload sizes for the LAMMPS simulation. Point-to-point messages are the
+# halo exchanges (ghost atom positions and forces), and collectives move a
+# handful of doubles (e.g. thermo output). Barriers carry no payload
+LAMMPS_HALO_PAYLOAD_BYTES = 32 * 1024
+LAMMPS_COLLECTIVE_PAYLOAD_BYTES = 64
+# The network loops in the migration-net function send `chunk_size` doubles
+LAMMPS_NET_LOOP_ELEMENT_BYTES = 8
+
+MPI_P2P_MSG_TYPES = [0, 10]
+MPI_BARRIER_MSG_TYPES = [1, 2]
+MPI_COLLECTIVE_MSG_TYPES = [3, 4, 5, 6, 7, 8, 9, 11]
+
+
+def get_lammps_payload_model(num_net_loops=0, chunk_size=0):
+    """
+    Return a dictionary of <msg_type, payload bytes per message> for the
+    LAMMPS simulation. With network loops, they send many more point-to-point
+    messages than the halo exchanges, so we size point-to-point messages as
+    network loop messages
+    """
+    if int(num_net_loops) > 0:
+        p2p_bytes = int(chunk_size) * LAMMPS_NET_LOOP_ELEMENT_BYTES
+    else:
+        p2p_bytes = LAMMPS_HALO_PAYLOAD_BYTES
+
+    payload_model = {}
+    for m_type in MPI_P2P_MSG_TYPES:
+        payload_model[m_type] = p2p_bytes
+    for m_type in MPI_BARRIER_MSG_TYPES:
+        payload_model[m_type] = 0
+    for m_type in MPI_COLLECTIVE_MSG_TYPES:
+        payload_model[m_type] = LAMMPS_COLLECTIVE_PAYLOAD_BYTES
+
+    return payload_model
+
+
+def get_lammps_workload_payload_model(workload):
+    """
+    Payload model for one of the LAMMPS_SIM_WORKLOAD_CONFIGS
+    """
+    if workload not in LAMMPS_SIM_WORKLOAD_CONFIGS:
+        raise RuntimeError(
+            "Unrecognised LAMMPS workload: {} (must be one in: {})".format(
+                workload, list(LAMMPS_SIM_WORKLOAD_CONFIGS.keys())
+            )
+        )
+
+    workload_config = LAMMPS_SIM_WORKLOAD_CONFIGS[workload]
+    return get_lammps_payload_model(
+        num_net_loops=workload_config["num_net_loops"],
+        chunk_size=workload_config["chunk_size"],
+    )
+
+
+def get_network_time(num_msgs, num_bytes):
+    """
+    Estimated time (in seconds) to send a number of cross-host messages with
+    a total number of bytes
+    """
+    return (
+        num_msgs * XHOST_LATENCY_SECS
+        + num_bytes / XHOST_BANDWIDTH_BYTES_PER_SEC
+    )
+
+
+def _get_type_matrices(comm_matrices):
+    """
+    Per-type message count matrices. Graphs without the per-type breakdown
+    count all messages as point-to-point ones
+    """
+    if len(comm_matrices["msg_type"]) > 0:
+        return comm_matrices["msg_type"]
+
+    return {MPI_P2P_MSG_TYPES[0]: comm_matrices["msg_count"]}
+
+
+def get_cross_host_traffic(comm_matrices, payload_model, rank_to_host=None):
+    """
+    Estimate the cross-host traffic of a placement. By default, we use the
+    placement in the execution graph, but we can pass any other rank-to-host
+    mapping (e.g. to evaluate a candidate placement). Returns a dictionary
+    with the per-type message counts (`msg-count`), cross-host message counts
+    (`xhost-msg-count`) and cross-host bytes (`xhost-bytes`), and the totals
+    and estimated network time
+    """
+    if rank_to_host is None:
+        rank_to_host = comm_matrices["rank_to_host"]
+    rank_to_host = asarray(rank_to_host)
+
+    traffic = {"msg-count": {}, "xhost-msg-count": {}, "xhost-bytes": {}}
+    for m_type, matrix in _get_type_matrices(comm_matrices).items():
+        if m_type not in payload_model:
+            raise RuntimeError(
+                "No payload size for message type: {}".format(m_type)
+            )
+
+        coo = matrix.tocoo()
+        is_xhost = rank_to_host[coo.row] != rank_to_host[coo.col]
+        num_xhost_msgs = int(coo.data[is_xhost].sum())
+
+        traffic["msg-count"][m_type] = int(coo.data.sum())
+        traffic["xhost-msg-count"][m_type] = num_xhost_msgs
+        traffic["xhost-bytes"][m_type] = num_xhost_msgs * (
+            payload_model[m_type] + MPI_MSG_HEADER_BYTES
+        )
+
+    traffic["total-msgs"] = sum(traffic["msg-count"].values())
+    traffic["total-xhost-msgs"] = sum(traffic["xhost-msg-count"].values())
+    traffic["total-xhost-bytes"] = sum(traffic["xhost-bytes"].values())
+    traffic["network-time"] = get_network_time(
+        traffic["total-xhost-msgs"], traffic["total-xhost-bytes"]
+    )
+
+    return traffic
+
+
+def get_traffic_cost_function(comm_matrices, payload_model):
+    """
+    Return a function that, given a rank-to-host mapping, returns its
+    estimated network time (in seconds). We flatten all the per-type matrices
+    once, so that each evaluation is a couple of vectorised operations, and
+    we can use it to rank many candidate placements
+    """
+    send_ranks, recv_ranks, num_msgs, num_bytes = [], [], [], []
+    for m_type, matrix in _get_type_matrices(comm_matrices).items():
+        coo = matrix.tocoo()
+        send_ranks.append(coo.row)
+        recv_ranks.append(coo.col)
+        num_msgs.append(coo.data.astype(float))
+        num_bytes.append(
+            coo.data * float(payload_model[m_type] + MPI_MSG_HEADER_BYTES)
+        )
+
+    if len(send_ranks) == 0:
+        send_ranks = recv_ranks = zeros(0, dtype=int)
+        num_msgs = num_bytes = zeros(0)
+    else:
+        send_ranks = concatenate(send_ranks)
+        recv_ranks = concatenate(recv_ranks)
+        num_msgs = concatenate(num_msgs)
+        num_bytes = concatenate(num_bytes)
+
+    def cost(rank_to_host):
+        rank_to_host = asarray(rank_to_host)
+        is_xhost = rank_to_host[send_ranks] != rank_to_host[recv_ranks]
+        return get_network_time(
+            float(num_msgs[is_xhost].sum()), float(num_bytes[is_xhost].sum())
+        )
+
+    return cost